@@ -1,7 +1,11 @@
 from marketools.stock import *
 from marketools.wallet import Wallet
+from marketools.stqscraper.scrapers import get_last_quotes
+from marketools.stqscraper.snapshots import take_snapshot, open_snapshot, list_snapshots
 from marketools.analysis import *
-from marketools.stqscraper import store_data, get_storage_dir, get_storage_status
+from marketools.profiling import profile
+from marketools.stqscraper import store_data, get_storage_dir, get_storage_status, set_cache_limit, clear_cache, \
+    set_storage_backend
 
 
 __pdoc__ = dict()
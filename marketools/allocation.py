@@ -0,0 +1,382 @@
+"""
+Portfolio allocation - mean-variance and risk-parity weights of candidate
+stocks, and target volumes of wallet positions.
+
+Covariance of returns is estimated in rolling window with Ledoit-Wolf
+shrinkage towards scaled identity. For many rebalance dates, moments of the
+window are updated incrementally (only returns entering and leaving the
+window are processed) and every optimization starts from the solution for
+the previous date, so it usually converges in a few iterations.
+"""
+import numpy as np
+import pandas as pd
+from marketools.simulation import load_prices
+
+
+METHODS = ('risk_parity', 'mean_variance')
+
+
+def load_returns(tickers, start=None, end=None, interval: str = 'd') -> pd.DataFrame:
+    """Returns simple returns of close prices of given tickers, aligned by date."""
+    return load_prices(tickers, start=start, end=end, interval=interval).pct_change().dropna()
+
+
+def _shrink(cov, fourth_moment, window):
+    """
+    Ledoit-Wolf shrinkage of sample covariance (population, centered data)
+    towards mu * identity; fourth_moment is sum of ||x_i - mean||^4 over the
+    window.
+    """
+    n = len(cov)
+    mu = np.trace(cov) / n
+    cov_norm = np.einsum('ij,ij->', cov, cov)
+    d2 = cov_norm - n * mu**2  # ||S - mu * I||^2
+    b2 = max(fourth_moment - window * cov_norm, 0.0) / window**2
+    shrinkage = min(b2, d2) / d2 if d2 > 0 else 1.0
+    output = (1 - shrinkage) * cov
+    output.flat[::n + 1] += shrinkage * mu
+    return output, shrinkage
+
+
+def ledoit_wolf(returns):
+    """
+    Returns covariance matrix of returns shrunk towards scaled identity with
+    Ledoit-Wolf (2004) optimal shrinkage, and the shrinkage intensity.
+
+    Parameters
+    ----------
+    returns : numpy.ndarray or pandas.DataFrame
+        returns, shape (dates, tickers)
+
+    Returns
+    -------
+    tuple
+        (covariance matrix, shrinkage)
+    """
+    x = np.asarray(returns, dtype=np.float64)
+    x = x - x.mean(axis=0)
+    cov = x.T @ x / len(x)
+    fourth_moment = np.sum(np.einsum('ij,ij->i', x, x)**2)
+    return _shrink(cov, fourth_moment, len(x))
+
+
+class RollingMoments:
+    """
+    Moments of returns in rolling window, for covariance at many dates.
+    Sums of returns, squared norms and their products are kept as prefix
+    sums; the matrix of cross products is updated with returns entering and
+    leaving the window, and recalculated every refresh updates to avoid
+    accumulation of rounding errors.
+
+    Attributes
+    ----------
+    returns : numpy.ndarray
+        returns, shape (dates, tickers), without NaN values
+    window : int
+        number of returns in window
+    """
+
+    refresh = 256  # updates between full recalculations of cross products
+
+    def __init__(self, returns, window: int):
+        x = np.asarray(returns, dtype=np.float64)
+        if np.isnan(x).any():
+            raise ValueError('returns must not contain NaN values')
+        if not 2 <= window <= len(x):
+            raise ValueError('window must be between 2 and number of dates')
+        self.returns = x
+        self.window = window
+        norms = np.einsum('ij,ij->i', x, x)
+        zero = np.zeros((1, x.shape[1]))
+        self._sum = np.concatenate((zero, np.cumsum(x, axis=0)))
+        self._norms = np.concatenate(([0.0], np.cumsum(norms)))
+        self._norms2 = np.concatenate(([0.0], np.cumsum(norms**2)))
+        self._weighted = np.concatenate((zero, np.cumsum(norms[:, None] * x, axis=0)))
+        self._end = None
+        self._cross = None
+        self._updates = 0
+
+    def _move(self, end):
+        start = end - self.window
+        if self._end is None or self._updates >= self.refresh or end - self._end >= self.window or end < self._end:
+            block = self.returns[start:end]
+            self._cross = block.T @ block
+            self._updates = 0
+        elif end > self._end:
+            added = self.returns[self._end:end]
+            removed = self.returns[self._end - self.window:start]
+            self._cross += added.T @ added - removed.T @ removed
+            self._updates += 1
+        self._end = end
+
+    def mean(self, end: int):
+        """Returns mean returns in window ending before row end."""
+        return (self._sum[end] - self._sum[end - self.window]) / self.window
+
+    def covariance(self, end: int):
+        """
+        Returns Ledoit-Wolf shrunk covariance and shrinkage for window ending
+        before row end (rows end - window ... end - 1).
+        """
+        self._move(end)
+        w, start = self.window, end - self.window
+        mean = self.mean(end)
+        cov = self._cross / w - np.outer(mean, mean)
+        c = mean @ mean
+        fourth_moment = (self._norms2[end] - self._norms2[start]
+                         - 4 * mean @ (self._weighted[end] - self._weighted[start])
+                         + 2 * c * (self._norms[end] - self._norms[start])
+                         + 4 * mean @ self._cross @ mean
+                         - 3 * w * c**2)
+        return _shrink(cov, fourth_moment, w)
+
+
+def _capped_sums(values, sums, tau, max_weight):
+    """
+    Returns sums of clip(v - tau, 0, max_weight) for array of tau, and
+    numbers of v with 0 < v - tau < max_weight; values are sorted v, sums
+    are their suffix sums.
+    """
+    above = np.searchsorted(values, tau, side='right')
+    capped = np.searchsorted(values, tau + max_weight, side='left')
+    free = capped - above
+    return sums[above] - sums[capped] - free * tau + (len(values) - capped) * max_weight, free
+
+
+def _project(v, max_weight: float):
+    """
+    Euclidean projection onto {w: 0 <= w <= max_weight, sum(w) = 1}. The sum
+    of clipped values is piecewise linear in the shift, so the shift is found
+    exactly between its breakpoints (O(n log n)).
+    """
+    values = np.sort(v)
+    sums = np.concatenate((np.cumsum(values[::-1])[::-1], [0.0]))
+    breakpoints = np.sort(np.concatenate((values - max_weight, values)))
+    totals, _ = _capped_sums(values, sums, breakpoints, max_weight)
+    k = np.searchsorted(-totals, -1.0, side='right') - 1  # the last breakpoint with total >= 1
+    _, free = _capped_sums(values, sums, (breakpoints[k] + breakpoints[k + 1]) / 2, max_weight)
+    tau = breakpoints[k] + (totals[k] - 1) / free if free else breakpoints[k]
+    return np.clip(v - tau, 0, max_weight)
+
+
+def _largest_eigenvalue(cov, vector, iterations):
+    for _ in range(iterations):
+        vector = cov @ vector
+        vector /= np.linalg.norm(vector)
+    return vector @ cov @ vector, vector
+
+
+def mean_variance_weights(cov, expected_returns, risk_aversion: float = 5.0,
+                          max_weight: float = 1.0, start=None,
+                          tol: float = 1e-8, max_iter: int = 1000):
+    """
+    Returns long-only, fully invested weights maximizing
+    expected_returns @ w - risk_aversion / 2 * w @ cov @ w, found with
+    accelerated projected gradient (FISTA with adaptive restart).
+
+    Parameters
+    ----------
+    cov : numpy.ndarray
+        covariance matrix of returns
+    expected_returns : numpy.ndarray
+        expected returns
+    risk_aversion : float
+        weight of variance in the objective
+    max_weight : float
+        maximal weight of single position
+    start : numpy.ndarray or None
+        initial weights (warm start), equal weights if None
+    tol : float
+        tolerance - maximal change of weight in the last iteration
+    max_iter : int
+        maximal number of iterations
+
+    Returns
+    -------
+    tuple
+        (weights, number of iterations)
+    """
+    n = len(cov)
+    if max_weight * n < 1:
+        raise ValueError('max_weight too low - weights cannot sum up to 1')
+    mu = np.asarray(expected_returns, dtype=np.float64)
+    weights = np.full(n, 1 / n) if start is None else _project(np.asarray(start, dtype=np.float64), max_weight)
+    eigenvalue, _ = _largest_eigenvalue(cov, np.ones(n) / np.sqrt(n), 30)
+    step = 1 / (1.05 * risk_aversion * eigenvalue)
+
+    y, t = weights, 1.0
+    for iteration in range(1, max_iter + 1):
+        new_weights = _project(y - step * (risk_aversion * (cov @ y) - mu), max_weight)
+        if np.max(np.abs(new_weights - weights)) < tol:
+            return new_weights, iteration
+        if (y - new_weights) @ (new_weights - weights) > 0:
+            t = 1.0  # momentum goes uphill - restart
+        new_t = (1 + np.sqrt(1 + 4 * t**2)) / 2
+        y = new_weights + (t - 1) / new_t * (new_weights - weights)
+        weights, t = new_weights, new_t
+    return weights, max_iter
+
+
+def risk_parity_weights(cov, budgets=None, start=None,
+                        tol: float = 1e-10, max_iter: int = 100):
+    """
+    Returns weights with risk contributions w_i * (cov @ w)_i proportional
+    to budgets (equal risk contributions by default). Found with Newton's
+    method minimizing y @ cov @ y / 2 - budgets @ log(y), w = y / sum(y).
+
+    Parameters
+    ----------
+    cov : numpy.ndarray
+        covariance matrix of returns
+    budgets : numpy.ndarray or None
+        risk budgets (summing up to 1), equal if None
+    start : numpy.ndarray or None
+        initial weights (warm start), inverse volatility if None
+    tol : float
+        tolerance of gradient norm
+    max_iter : int
+        maximal number of iterations
+
+    Returns
+    -------
+    tuple
+        (weights, number of iterations)
+    """
+    n = len(cov)
+    budgets = np.full(n, 1 / n) if budgets is None else np.asarray(budgets, dtype=np.float64)
+    y = 1 / np.sqrt(np.diag(cov)) if start is None else np.maximum(np.asarray(start, dtype=np.float64), 1e-12)
+    y = y * np.sqrt(budgets.sum() / (y @ cov @ y))  # optimal scale of y
+
+    iteration = 0
+    for iteration in range(1, max_iter + 1):
+        gradient = cov @ y - budgets / y
+        if np.max(np.abs(gradient * y)) < tol:
+            break
+        hessian = cov.copy()
+        hessian.flat[::n + 1] += budgets / y**2
+        direction = np.linalg.solve(hessian, gradient)
+        alpha = 1.0
+        while np.any(y - alpha * direction <= 0):
+            alpha /= 2
+        y = y - alpha * direction
+    return y / y.sum(), iteration
+
+
+def optimize_weights(returns: pd.DataFrame, method: str = 'risk_parity',
+                     window: int = 250, rebalance=21,
+                     expected_returns: pd.DataFrame = None,
+                     risk_aversion: float = 5.0, max_weight: float = 1.0) -> pd.DataFrame:
+    """
+    Returns weights of tickers for every rebalance date. Covariance is
+    estimated from window returns up to the date (inclusively), with
+    Ledoit-Wolf shrinkage; the optimization is warm-started from the weights
+    for the previous date.
+
+    Parameters
+    ----------
+    returns : pandas.DataFrame
+        aligned returns of candidate tickers (column per ticker), e.g., from
+        load_returns
+    method : str
+        'risk_parity' (default) or 'mean_variance'
+    window : int
+        number of returns used for covariance (and mean) estimation
+    rebalance : int or list
+        rebalance period in dates, or list of rebalance dates
+    expected_returns : pandas.DataFrame
+        expected returns (same columns) for mean-variance, rolling mean of
+        returns in window if None
+    risk_aversion : float
+        weight of variance in mean-variance objective
+    max_weight : float
+        maximal weight of single position (mean-variance)
+
+    Returns
+    -------
+    pandas.DataFrame
+        weights indexed by rebalance date, column per ticker
+    """
+    if method not in METHODS:
+        raise ValueError(f'wrong value for method, must be one of {METHODS}')
+    moments = RollingMoments(returns.to_numpy(dtype=np.float64), window)
+    if np.ndim(rebalance):
+        ends = returns.index.get_indexer(pd.DatetimeIndex(rebalance)) + 1
+        if (ends < window).any():
+            raise ValueError('not enough returns (window) before rebalance dates, or dates not found')
+    else:
+        ends = np.arange(window, len(returns) + 1, rebalance)
+
+    weights = np.empty((len(ends), returns.shape[1]))
+    previous = None
+    for i, end in enumerate(ends):
+        cov, _ = moments.covariance(end)
+        if 'risk_parity' == method:
+            previous, _ = risk_parity_weights(cov, start=previous)
+        else:
+            mu = moments.mean(end) if expected_returns is None \
+                else expected_returns.loc[returns.index[end - 1], returns.columns].to_numpy(dtype=np.float64)
+            previous, _ = mean_variance_weights(cov, mu, risk_aversion, max_weight, start=previous)
+        weights[i] = previous
+
+    return pd.DataFrame(weights, index=returns.index[ends - 1], columns=returns.columns)
+
+
+def target_volumes(wallet, weights: pd.Series, prices: pd.Series) -> pd.Series:
+    """
+    Returns target volumes of positions for given weights. Positions smaller
+    than the minimal recommended investment are skipped (weights of the
+    others are scaled up), trades smaller than the minimal recommended
+    investment are not made (except closing position), and purchases are
+    reduced to fit wallet money after sales and commission.
+
+    Parameters
+    ----------
+    wallet : Wallet
+        wallet with money, owned stocks and commission model
+    weights : pandas.Series
+        ticker -> weight, e.g., row of optimize_weights output
+    prices : pandas.Series
+        ticker -> current price, for tickers in weights and owned tickers
+
+    Returns
+    -------
+    pandas.Series
+        ticker -> target volume (owned tickers not in weights get 0)
+    """
+    owned = wallet.stocks.groupby('Name')['Volume'].sum()
+    universe = list(weights.index) + [t for t in owned.index if t not in weights.index]
+    weights = weights.reindex(universe, fill_value=0.0).to_numpy(dtype=np.float64)
+    volume = owned.reindex(universe, fill_value=0).to_numpy(dtype=np.float64)
+    price = prices.reindex(universe).to_numpy(dtype=np.float64)
+    if np.isnan(price).any():
+        raise ValueError('prices missing for some tickers')
+
+    min_value = wallet.minimal_recommended_investment()
+    total_value = wallet.money + volume @ price
+    values = weights / weights.sum() * total_value
+    values[values < min_value] = 0.0
+    if values.sum() > 0:
+        values *= total_value / values.sum()
+
+    target = np.floor(values / price)
+    change = target - volume
+    small = (np.abs(change) * price < min_value) & (target > 0)
+    target[small] = volume[small]
+
+    sold = np.maximum(volume - target, 0) * price
+    money = wallet.money + sold.sum() - np.where(sold > 0, wallet(sold), 0.0).sum()
+    bought = np.maximum(target - volume, 0)
+    for _ in range(100):
+        value = bought * price
+        cost = value.sum() + np.where(value > 0, wallet(value), 0.0).sum()
+        if cost <= money:
+            break
+        bought = np.floor(bought * min(money / cost, 0.999))
+        bought[bought * price < min_value] = 0
+    target = np.minimum(target, volume) + bought
+
+    return pd.Series(target.astype(np.int64), index=universe, name='Volume')
+
+
+if __name__ == '__main__':
+    pass
@@ -7,6 +7,9 @@ from marketools.analysis.moving_average import exponential_moving_average as ema
 from marketools.analysis.price import simple_relative_price_change, price_change
 from marketools.analysis.volume import mean_volume_on_date, select_stocks_with_increased_volume
 from marketools.analysis.heikinashi import heikinashi
+from marketools.analysis.prefixsum import PrefixSumIndex
+from marketools.analysis.volatility import average_true_range as atr
+from marketools.analysis.volatility import bollinger_bands, stochastic_oscillator, donchian_channels, max_drawdown
 
 
 relative_price_change = simple_relative_price_change
@@ -0,0 +1,584 @@
+"""
+NumPy kernels for analysis functions.
+
+Kernels operate on float arrays of shape (time,) or (tickers, time) along the
+last (time) axis, so many tickers can be processed in one call without
+pandas. Every kernel accepts optional out buffer for the result - kernels
+with several outputs expect buffer of shape (outputs, ...) + input shape.
+
+Exponentially weighted kernels (ewm, ema, rsi, macd, atr) skip NaN values
+as pandas ewm does (ignore_na=False); series with NaN values are processed
+by pandas. Heikin-Ashi carries the open over bars without prices.
+
+Rolling kernels of volatility indicators (rolling_max, rolling_min,
+rolling_var, rolling_std, atr, bollinger, stochastic, donchian,
+max_drawdown) accept also sequence of windows - then the output gets
+leading axis with one result per window.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+_MAX_BLOCK_GROWTH = 100  # decimal exponent of maximal scaling in ewm blocks
+
+
+def _buffer(out, shape):
+    if out is None:
+        return np.empty(shape, dtype=np.float64)
+    if out.shape != shape:
+        raise ValueError(f'out must have shape {shape}, not {out.shape}')
+    return out
+
+
+def _linear_filter(x, beta, gain, init, out):
+    """
+    Calculates y[t] = beta * y[t-1] + gain * x[t] along the last axis, with
+    y[-1] = init. The recurrence is solved in closed form (with cumsum) in
+    blocks short enough to keep scaling factors within float range.
+    """
+    n = x.shape[-1]
+    if n == 0:
+        return out
+    if beta == 0:
+        np.multiply(x, gain, out=out)
+        return out
+
+    block = int(_MAX_BLOCK_GROWTH / -np.log10(beta))
+    block = max(1, min(n, block))
+    previous = np.asarray(init, dtype=np.float64)
+
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        decay = beta ** np.arange(stop - start)
+        chunk = out[..., start:stop]
+        np.cumsum(x[..., start:stop] / decay, axis=-1, out=chunk)
+        chunk *= gain * decay
+        chunk += (beta * decay) * previous[..., None]
+        previous = chunk[..., -1]
+
+    return out
+
+
+def _pandas_ewm(x, alpha, adjust, out):
+    """Exponentially weighted mean of data with NaN values, with pandas."""
+    rows = pd.DataFrame(x.reshape(-1, x.shape[-1]).T)
+    out[...] = rows.ewm(alpha=alpha, adjust=adjust).mean().to_numpy().T.reshape(x.shape)
+    return out
+
+
+def ewm(x, alpha: float, adjust: bool = False, out=None):
+    """
+    Exponentially weighted mean along the last axis, same as pandas
+    ewm(alpha=alpha, adjust=adjust).mean(). NaN values are skipped (the
+    mean is carried over them, and they count in the decay of older
+    values); such input is processed by pandas.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        input values, shape (time,) or (tickers, time)
+    alpha : float
+        smoothing factor, 0 < alpha <= 1
+    adjust : bool
+        if True, weights are normalized by their sum for every bar
+    out : numpy.ndarray
+        output buffer of the same shape as x
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _buffer(out, x.shape)
+    beta = 1 - alpha
+    if x.shape[-1] == 0:
+        return out
+    if np.isnan(x).any():
+        return _pandas_ewm(x, alpha, adjust, out)
+
+    if not adjust:
+        return _linear_filter(x, beta, alpha, x[..., 0], out)
+
+    _linear_filter(x, beta, 1.0, np.zeros(x.shape[:-1]), out)
+    if beta == 0:
+        return out
+    weights = (1 - beta ** np.arange(1, x.shape[-1] + 1)) / alpha
+    out /= weights
+    return out
+
+
+def ema(x, window: int = 15, out=None):
+    """Exponential moving average, alpha = 2/(window + 1)."""
+    return ewm(x, 2 / (window + 1), adjust=False, out=out)
+
+
+_MIN_BLOCK = 256  # minimal number of windows summed from one block of cumulative sums
+
+
+def _rolling_sums(x, window, weighted=False, squares=False):
+    """
+    Returns sums over moving window (weights 1...window if weighted), mask
+    of windows without NaN values and centers of the sums (sums are of
+    values minus center). With squares, returns sums, sums of squares (both
+    of values minus center) and the mask - for variance, which does not
+    depend on the center. Windows are split into blocks of at least
+    4*window windows; cumulative sums restart in every block, around its
+    mean, so rounding errors do not grow with the length of the series.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    nan = np.isnan(x)
+    windows = n - window + 1
+    block = max(4 * window, _MIN_BLOCK)
+    blocks = -(-windows // block)
+    length = block + window - 1  # bars of one block
+
+    padded = np.zeros(x.shape[:-1] + (blocks * block + window - 1,))
+    padded[..., :n] = np.where(nan, 0.0, x)
+    present = np.zeros(padded.shape)
+    present[..., :n] = ~nan
+    # (..., blocks, length) views, block k starts at bar k*block
+    segments = sliding_window_view(padded, length, axis=-1)[..., ::block, :]
+    present = sliding_window_view(present, length, axis=-1)[..., ::block, :]
+    counts = present.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center = np.where(counts > 0, segments.sum(axis=-1, keepdims=True) / counts, 0.0)
+    centered = (segments - center) * present
+
+    pad = [(0, 0)] * x.ndim + [(1, 0)]
+    s0 = np.pad(np.cumsum(centered, axis=-1), pad)
+    sums = s0[..., window:] - s0[..., :-window]
+
+    if weighted:
+        t = np.arange(length, dtype=np.float64)
+        s1 = np.pad(np.cumsum(centered * t, axis=-1), pad)
+        first = np.arange(block, dtype=np.float64)
+        # sum over window of (j - first + 1) * x[j]
+        sums = (s1[..., window:] - s1[..., :-window]) - (first - 1) * sums
+
+    def flat(values):
+        return values.reshape(x.shape[:-1] + (blocks * block,))[..., :windows]
+
+    center = np.broadcast_to(center, center.shape[:-1] + (block,))
+    if squares:
+        s2 = np.pad(np.cumsum(centered * centered, axis=-1), pad)
+        return flat(sums), flat(s2[..., window:] - s2[..., :-window]), _nan_free_windows(nan, window)
+    return flat(sums), _nan_free_windows(nan, window), flat(center)
+
+
+def sma(x, window: int = 15, out=None):
+    """
+    Simple moving average along the last axis. NaN is placed where there is
+    not enough previous data or window contains NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _buffer(out, x.shape)
+    out[...] = np.nan
+    if window <= x.shape[-1]:
+        sums, valid, center = _rolling_sums(x, window, weighted=False)
+        out[..., window - 1:] = np.where(valid, sums / window + center, np.nan)
+    return out
+
+
+def wma(x, window: int = 15, out=None):
+    """
+    Weighted moving average along the last axis, weights 1...window (the
+    most recent value has the highest weight). NaN is placed where there is
+    not enough previous data or window contains NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = _buffer(out, x.shape)
+    out[...] = np.nan
+    if window <= x.shape[-1]:
+        sums, valid, center = _rolling_sums(x, window, weighted=True)
+        total_weight = window * (window + 1) / 2
+        out[..., window - 1:] = np.where(valid, sums / total_weight + center, np.nan)
+    return out
+
+
+def rsi(close, window: int = 14, out=None):
+    """
+    Relative Strength Index along the last axis (smoothed moving averages of
+    upward and downward changes, alpha = 1/window).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    out = _buffer(out, close.shape)
+
+    change = np.empty_like(close)
+    change[..., :1] = close[..., :1]  # previous price for the first bar is 0
+    np.subtract(close[..., 1:], close[..., :-1], out=change[..., 1:])
+
+    up = ewm(np.maximum(change, 0), 1 / window)
+    down = ewm(np.maximum(-change, 0), 1 / window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(up, down, out=out)
+        out += 1
+        np.divide(-100, out, out=out)
+    out += 100
+    return out
+
+
+def macd(close, mid_const: int = 12, long_const: int = 26,
+         signal_const: int = 9, out=None):
+    """
+    MACD along the last axis. Returns array of shape (3,) + close.shape with
+    MACD, Signal and Histogram.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    out = _buffer(out, (3,) + close.shape)
+
+    ewm(close, 2 / (mid_const + 1), adjust=True, out=out[0])
+    out[0] -= ewm(close, 2 / (long_const + 1), adjust=True, out=out[2])
+    ewm(out[0], 2 / (signal_const + 1), adjust=True, out=out[1])
+    np.subtract(out[0], out[1], out=out[2])
+    return out
+
+
+def price_change(open_, close, shift: int = 0, relative: bool = False,
+                 percent: bool = False, out=None):
+    """
+    Price change along the last axis: Close-Open if shift is zero, otherwise
+    change in relation to close price shift bars before.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    out = _buffer(out, close.shape)
+
+    if shift:
+        reference = np.full_like(close, np.nan)
+        reference[..., shift:] = close[..., :-shift]
+    else:
+        reference = np.asarray(open_, dtype=np.float64)
+
+    np.subtract(close, reference, out=out)
+    if relative:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out /= reference
+        if percent:
+            out *= 100
+    return out
+
+
+def _heikinashi_nan(open_, high, low, close, ha_open, ha_close):
+    """
+    Heikin-Ashi close and open of data with NaN values: close is the mean of
+    available prices, and open is carried over bars without prices. Rows
+    with NaN values are processed run by run of bars with close.
+    """
+    prices = np.stack([open_, high, low, close])
+    available = ~np.isnan(prices)
+    with np.errstate(invalid='ignore'):
+        np.divide(np.where(available, prices, 0.0).sum(axis=0), available.sum(axis=0), out=ha_close)
+
+    n = ha_close.shape[-1]
+    for row in np.ndindex(ha_close.shape[:-1]):
+        c, o = ha_close[row], ha_open[row]
+        valid = np.concatenate(([False], ~np.isnan(c[:-1]), [False]))
+        edges = np.flatnonzero(valid[1:] != valid[:-1])  # run starts and ends
+        o[1:] = np.nan
+        start = 0
+        for first, last in zip(edges[::2], edges[1::2]):
+            o[start + 1:first + 1] = o[start]  # no close - open is carried over
+            _linear_filter(c[first:last], 0.5, 0.5, o[first], o[first + 1:last + 1])
+            start = last
+        o[start + 1:n] = o[start]
+
+
+def heikinashi(open_, high, low, close, first_open=None, out=None):
+    """
+    Heikin-Ashi along the last axis. Returns array of shape (4,) +
+    close.shape with Open, High, Low and Close. Close is the mean of
+    available prices and open is carried over bars without prices, as in
+    pandas mean and max/min skipping NaN.
+
+    Parameters
+    ----------
+    open_, high, low, close : numpy.ndarray
+        OHLC prices, shape (time,) or (tickers, time)
+    first_open : float or numpy.ndarray
+        Heikin-Ashi open for the first bar (open price if None), per ticker
+    out : numpy.ndarray
+        output buffer
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    open_, high, low, close = (np.asarray(a, dtype=np.float64)
+                               for a in (open_, high, low, close))
+    out = _buffer(out, (4,) + close.shape)
+    ha_open, ha_high, ha_low, ha_close = out
+    if close.shape[-1] == 0:
+        return out
+
+    np.add(open_, high, out=ha_close)
+    ha_close += low
+    ha_close += close
+    ha_close /= 4
+
+    ha_open[..., 0] = open_[..., 0] if first_open is None else first_open
+    nan = np.isnan(ha_close)
+    if nan.any():
+        _heikinashi_nan(open_, high, low, close, ha_open, ha_close)
+    else:
+        _linear_filter(ha_close[..., :-1], 0.5, 0.5, ha_open[..., 0], ha_open[..., 1:])
+
+    np.fmax(np.fmax(high, ha_open), ha_close, out=ha_high)
+    np.fmin(np.fmin(low, ha_open), ha_close, out=ha_low)
+    return out
+
+
+def _windows(window):
+    """Returns tuple of windows and True if window was given as sequence."""
+    if np.ndim(window):
+        windows = tuple(int(w) for w in window)
+        batched = True
+    else:
+        windows = (int(window),)
+        batched = False
+    if min(windows) < 1:
+        raise ValueError('window must be positive')
+    return windows, batched
+
+
+def _each_window(window, shape, out, compute):
+    """
+    Calls compute(window, buffer) for every window; buffer has given shape,
+    for sequence of windows it is part of output with leading windows axis.
+    """
+    windows, batched = _windows(window)
+    if not batched:
+        return compute(windows[0], _buffer(out, shape))
+    out = _buffer(out, (len(windows),) + shape)
+    for w, target in zip(windows, out):
+        compute(w, target)
+    return out
+
+
+def _nan_free_windows(nan, window):
+    """Returns mask of windows (ending at window-1 ... n-1) without NaN."""
+    pad = [(0, 0)] * (nan.ndim - 1) + [(1, 0)]
+    count = np.pad(np.cumsum(nan, axis=-1), pad)
+    return (count[..., window:] - count[..., :-window]) == 0
+
+
+def _rolling_extreme(x, window, ufunc, fill, out):
+    """
+    Rolling maximum (ufunc=np.maximum) or minimum along the last axis with
+    van Herk/Gil-Werman algorithm: the series is split into blocks of window
+    size, and extreme over every window is combined from suffix extreme of
+    one block and prefix extreme of the next one - O(n) for any window.
+    """
+    n = x.shape[-1]
+    out[...] = np.nan
+    if window > n:
+        return out
+
+    nan = np.isnan(x)
+    blocks = -(-n // window)
+    padded = np.full(x.shape[:-1] + (blocks * window,), fill)
+    padded[..., :n] = np.where(nan, fill, x)
+    shaped = padded.reshape(x.shape[:-1] + (blocks, window))
+
+    prefix = ufunc.accumulate(shaped, axis=-1).reshape(padded.shape)
+    suffix = ufunc.accumulate(shaped[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+
+    valid = _nan_free_windows(nan, window)
+    extreme = ufunc(suffix[..., :n - window + 1], prefix[..., window - 1:n])
+    out[..., window - 1:] = np.where(valid, extreme, np.nan)
+    return out
+
+
+def rolling_max(x, window: int = 20, out=None):
+    """
+    Rolling maximum along the last axis, O(n) for any window. NaN is placed
+    where there is not enough previous data or window contains NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    return _each_window(window, x.shape, out,
+                        lambda w, o: _rolling_extreme(x, w, np.maximum, -np.inf, o))
+
+
+def rolling_min(x, window: int = 20, out=None):
+    """
+    Rolling minimum along the last axis, O(n) for any window. NaN is placed
+    where there is not enough previous data or window contains NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    return _each_window(window, x.shape, out,
+                        lambda w, o: _rolling_extreme(x, w, np.minimum, np.inf, o))
+
+
+def rolling_var(x, window: int = 20, ddof: int = 0, out=None):
+    """
+    Rolling variance along the last axis, from sums of values and their
+    squares over every window (see _rolling_sums - cumulative sums restart
+    in blocks, around the local mean, so precision does not depend on the
+    length of the series). NaN is placed where there is not enough previous
+    data or window contains NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+
+    def compute(w, o):
+        o[...] = np.nan
+        if w > x.shape[-1] or w <= ddof:
+            return o
+        sums, squares, valid = _rolling_sums(x, w, squares=True)
+        var = np.maximum(squares - sums * sums / w, 0.0) / (w - ddof)
+        o[..., w - 1:] = np.where(valid, var, np.nan)
+        return o
+
+    return _each_window(window, x.shape, out, compute)
+
+
+def rolling_std(x, window: int = 20, ddof: int = 0, out=None):
+    """Rolling standard deviation along the last axis, see rolling_var."""
+    out = rolling_var(x, window, ddof, out=out)
+    np.sqrt(out, out=out)
+    return out
+
+
+def true_range(high, low, close, out=None):
+    """
+    True range along the last axis: the largest of high-low, |high-previous
+    close| and |low-previous close| (high-low for the first bar).
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    out = _buffer(out, close.shape)
+    np.subtract(high, low, out=out)
+    if close.shape[-1] > 1:
+        previous = close[..., :-1]
+        np.fmax(out[..., 1:], np.abs(high[..., 1:] - previous), out=out[..., 1:])
+        np.fmax(out[..., 1:], np.abs(low[..., 1:] - previous), out=out[..., 1:])
+    return out
+
+
+def atr(high, low, close, window: int = 14, out=None):
+    """
+    Average True Range along the last axis - smoothed moving average of true
+    range (alpha = 1/window), as in RSI.
+    """
+    tr = true_range(high, low, close)
+    return _each_window(window, tr.shape, out,
+                        lambda w, o: ewm(tr, 1 / w, adjust=False, out=o))
+
+
+def bollinger(close, window: int = 20, k: float = 2.0, ddof: int = 0, out=None):
+    """
+    Bollinger Bands along the last axis. Returns array of shape (3,) +
+    close.shape with Middle (SMA), Upper and Lower band (k standard
+    deviations from the middle).
+    """
+    close = np.asarray(close, dtype=np.float64)
+
+    def compute(w, o):
+        sma(close, w, out=o[0])
+        rolling_std(close, w, ddof, out=o[1])
+        o[1] *= k
+        np.subtract(o[0], o[1], out=o[2])
+        o[1] += o[0]
+        return o
+
+    return _each_window(window, (3,) + close.shape, out, compute)
+
+
+def stochastic(high, low, close, window: int = 14, smooth: int = 3, out=None):
+    """
+    Stochastic oscillator along the last axis. Returns array of shape (2,) +
+    close.shape with %K - position of close within high-low range of the
+    window (0-100), and %D - SMA of %K over smooth bars.
+    """
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+
+    def compute(w, o):
+        highest = rolling_max(high, w)
+        lowest = rolling_min(low, w)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(close - lowest, highest - lowest, out=o[0])
+        o[0] *= 100
+        sma(o[0], smooth, out=o[1])
+        return o
+
+    return _each_window(window, (2,) + close.shape, out, compute)
+
+
+def donchian(high, low, window: int = 20, out=None):
+    """
+    Donchian channels along the last axis. Returns array of shape (3,) +
+    high.shape with Middle, Upper (highest high) and Lower (lowest low).
+    """
+    high, low = np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64)
+
+    def compute(w, o):
+        rolling_max(high, w, out=o[1])
+        rolling_min(low, w, out=o[2])
+        np.add(o[1], o[2], out=o[0])
+        o[0] /= 2
+        return o
+
+    return _each_window(window, (3,) + high.shape, out, compute)
+
+
+def _rolling_drawdown(x, window, out):
+    """
+    Maximal drawdown within every window along the last axis (peak and
+    trough both inside the window), in O(n) for any window. As in
+    _rolling_extreme, the series is split into blocks of window size and
+    every window is a suffix of one block and a prefix of the next one; the
+    drawdown is the lowest of drawdowns within the suffix, within the
+    prefix, and from the suffix peak to the prefix trough.
+    """
+    n = x.shape[-1]
+    out[...] = np.nan
+    if window > n:
+        return out
+
+    nan = np.isnan(x)
+    blocks = -(-n // window)
+    padded = np.ones(x.shape[:-1] + (blocks * window,))
+    padded[..., :n] = np.where(nan, 1, x)
+    shaped = padded.reshape(x.shape[:-1] + (blocks, window))
+    reverse = shaped[..., ::-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prefix_min = np.minimum.accumulate(shaped, axis=-1)
+        prefix_drawdown = np.minimum.accumulate(shaped / np.maximum.accumulate(shaped, axis=-1), axis=-1)
+        suffix_max = np.maximum.accumulate(reverse, axis=-1)[..., ::-1]
+        suffix_drawdown = np.minimum.accumulate(np.minimum.accumulate(reverse, axis=-1) / reverse,
+                                                axis=-1)[..., ::-1]
+
+        first = slice(0, n - window + 1)  # first bar of the window
+        last = slice(window - 1, n)  # last bar of the window
+        suffix = suffix_drawdown.reshape(padded.shape)[..., first]
+        drawdown = np.minimum(suffix, prefix_drawdown.reshape(padded.shape)[..., last])
+        np.minimum(drawdown, prefix_min.reshape(padded.shape)[..., last]
+                   / suffix_max.reshape(padded.shape)[..., first], out=drawdown)
+
+    # window equal to one block - its suffix is the whole window
+    aligned = np.arange(n - window + 1) % window == 0
+    drawdown[..., aligned] = suffix[..., aligned]
+
+    valid = _nan_free_windows(nan, window)
+    out[..., window - 1:] = np.where(valid, drawdown - 1, np.nan)
+    return out
+
+
+def max_drawdown(x, window: int = None, out=None):
+    """
+    Maximal drawdown along the last axis, as negative fraction: the lowest
+    ratio of price to its running peak, minus one. With window, the peak and
+    the trough are both within the last window bars; without window, they
+    are taken over the whole history.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if window is None:
+        out = _buffer(out, x.shape)
+        peak = np.fmax.accumulate(x, axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(x, peak, out=out)
+        out -= 1
+        np.fmin.accumulate(out, axis=-1, out=out)
+        return out
+
+    return _each_window(window, x.shape, out, lambda w, o: _rolling_drawdown(x, w, o))
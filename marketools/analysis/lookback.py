@@ -0,0 +1,28 @@
+import math
+
+
+EWM_TOLERANCE = 1e-8  # relative weight of truncated history
+
+
+def ewm_lookback(alpha: float, tolerance: float = EWM_TOLERANCE) -> int:
+    """
+    Returns number of bars after which weight of values older than the
+    window, in exponentially weighted mean with given alpha, falls below
+    tolerance. Exponentially weighted indicators calculated over this number
+    of the most recent bars agree with indicators calculated over full
+    history up to the tolerance.
+
+    Parameters
+    ----------
+    alpha : float
+        smoothing factor, 0 < alpha <= 1
+    tolerance : float
+        maximal relative weight of truncated history
+
+    Returns
+    -------
+    int
+    """
+    if alpha >= 1:
+        return 1
+    return math.ceil(math.log(tolerance) / math.log(1 - alpha)) + 1
@@ -1,6 +1,11 @@
 import pandas as pd
+import numpy as np
+from marketools.analysis import kernels
+from marketools.analysis.lookback import ewm_lookback, EWM_TOLERANCE
+from marketools.profiling import profiled
 
 
+@profiled
 def macd(prices: pd.DataFrame, 
          mid_const: int = 12, 
          long_const: int = 26, 
@@ -24,21 +29,26 @@ def macd(prices: pd.DataFrame,
     pandas.DataFrame
     """
 
-    price = prices['Close']
-    output = pd.DataFrame(columns=['MACD', 'Signal', 'Histogram'])
+    # MACD line = price.emw(12) - price.emw(26), signal line = MACD.emw(9),
+    # histogram = MACD - signal
+    price = prices['Close'].to_numpy(dtype=np.float64)
+    values = kernels.macd(price, mid_const, long_const, signal_const)
+    output = pd.DataFrame(values.T, index=prices.index,
+                          columns=['MACD', 'Signal', 'Histogram'])
 
-    # calculate MACD line = price.emw(12) - price.emw(26)
-    ewm_mid = price.ewm(span=mid_const).mean()
-    ewm_long = price.ewm(span=long_const).mean()
-    output['MACD'] = ewm_mid - ewm_long
+    return output
 
-    # calculate signal line = MACD.emw(9)
-    output['Signal'] = output['MACD'].ewm(span=signal_const).mean()
 
-    # calculate histogram = MACD - signal
-    output['Histogram'] = output['MACD'] - output['Signal']
-    
-    return output
+def macd_lookback(mid_const: int = 12,
+                  long_const: int = 26,
+                  signal_const: int = 9,
+                  tolerance: float = EWM_TOLERANCE):
+    """Returns number of recent bars needed to calculate the last MACD values."""
+    return ewm_lookback(2 / (long_const + 1), tolerance) \
+        + ewm_lookback(2 / (signal_const + 1), tolerance)
+
+
+macd.lookback = macd_lookback
 
 
 if __name__=='__main__':
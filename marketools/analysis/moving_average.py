@@ -1,7 +1,11 @@
 import pandas as pd
 import numpy as np
+from marketools.analysis import kernels
+from marketools.analysis.lookback import ewm_lookback, EWM_TOLERANCE
+from marketools.profiling import profiled
 
 
+@profiled
 def simple_moving_average(ohlc: pd.DataFrame,
                           price: str = 'Close',
                           window: int = 15):
@@ -23,13 +27,16 @@ def simple_moving_average(ohlc: pd.DataFrame,
     pandas.Series
     """
 
-    # implement simple moving average
-    output = ohlc[price].rolling(window=window).mean()
-    output = output.rename(f'SMA{window}')
+    values = ohlc[price].to_numpy(dtype=np.float64)
+    output = pd.Series(kernels.sma(values, window), index=ohlc.index, name=f'SMA{window}')
 
     return output
 
 
+simple_moving_average.lookback = lambda price='Close', window=15: window
+
+
+@profiled
 def weighted_moving_average(ohlc: pd.DataFrame,
                             price: str = 'Close',
                             window: int = 15):
@@ -51,17 +58,16 @@ def weighted_moving_average(ohlc: pd.DataFrame,
     pandas.Series
     """
 
-    weights = np.arange(1, window + 1)
+    values = ohlc[price].to_numpy(dtype=np.float64)
+    output = pd.Series(kernels.wma(values, window), index=ohlc.index, name=f'WMA{window}')
 
-    # implement weighted moving average
-    output = ohlc[price].rolling(window=window)\
-        .apply(lambda prices: np.dot(prices, weights)/weights.sum(), raw=True)
+    return output
 
-    output = output.rename(f'WMA{window}')
 
-    return output
+weighted_moving_average.lookback = lambda price='Close', window=15: window
 
 
+@profiled
 def exponential_moving_average(ohlc: pd.DataFrame,
                                price: str = 'Close',
                                window: int = 15):
@@ -82,12 +88,21 @@ def exponential_moving_average(ohlc: pd.DataFrame,
     pandas.Series
     """
 
-    # implement exponential moving average
-    output = ohlc[price].ewm(span=window, adjust=False).mean()
-    output = output.rename(f'EMA{window}')
+    values = ohlc[price].to_numpy(dtype=np.float64)
+    output = pd.Series(kernels.ema(values, window), index=ohlc.index, name=f'EMA{window}')
 
     return output
 
 
+def exponential_moving_average_lookback(price: str = 'Close',
+                                        window: int = 15,
+                                        tolerance: float = EWM_TOLERANCE):
+    """Returns number of recent bars needed to calculate the last EMA value."""
+    return ewm_lookback(2 / (window + 1), tolerance)
+
+
+exponential_moving_average.lookback = exponential_moving_average_lookback
+
+
 if __name__ == '__main__':
     pass
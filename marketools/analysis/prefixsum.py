@@ -0,0 +1,136 @@
+import pandas as pd
+import numpy as np
+
+
+class PrefixSumIndex:
+    """
+    Index with cumulative sums of OHLCV columns. Sum and mean of a column
+    over any window of sessions ending at any date are calculated in O(1),
+    also for arrays of dates and windows at once. NaN values are skipped,
+    as in pandas.
+
+    Attributes
+    ----------
+    dates : numpy.ndarray
+        sorted dates of indexed rows (datetime64)
+    columns : list
+        names of indexed columns
+    """
+
+    def __init__(self, dates, sums: dict, counts: dict):
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.columns = list(sums)
+        self._sums = sums  # column -> cumulative sums, with leading zero
+        self._counts = counts  # column -> cumulative counts of not-NaN values
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def last_date(self):
+        """Returns date of the last indexed row, None if index is empty."""
+        return pd.Timestamp(self.dates[-1]) if len(self.dates) else None
+
+    @staticmethod
+    def _cumulate(values, initial_sum=0.0, initial_count=0):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        sums = np.cumsum(np.where(valid, values, 0.0)) + initial_sum
+        counts = np.cumsum(valid) + initial_count
+        return sums, counts
+
+    @classmethod
+    def from_ohlc(cls, ohlc: pd.DataFrame, columns=None) -> 'PrefixSumIndex':
+        """
+        Builds index for given OHLC data (sorted by date).
+
+        Parameters
+        ----------
+        ohlc : pandas.DataFrame
+            DataFrame with OHLC data
+        columns : list
+            columns to index, all columns if None
+
+        Returns
+        -------
+        PrefixSumIndex
+        """
+        columns = list(ohlc.columns) if columns is None else list(columns)
+        sums, counts = dict(), dict()
+        for column in columns:
+            s, c = cls._cumulate(ohlc[column].to_numpy())
+            sums[column] = np.concatenate(([0.0], s))
+            counts[column] = np.concatenate(([0], c))
+        return cls(ohlc.index.to_numpy(), sums, counts)
+
+    def extend(self, ohlc: pd.DataFrame) -> int:
+        """
+        Appends rows of OHLC data with dates after the last indexed date.
+        Cumulative sums are continued, existing rows are not recalculated.
+        Returns number of appended rows.
+        """
+        if self.last_date is not None:
+            ohlc = ohlc[ohlc.index > self.last_date]
+        if ohlc.empty:
+            return 0
+
+        for column in self.columns:
+            s, c = self._cumulate(ohlc[column].to_numpy(),
+                                  self._sums[column][-1], self._counts[column][-1])
+            self._sums[column] = np.concatenate((self._sums[column], s))
+            self._counts[column] = np.concatenate((self._counts[column], c))
+        self.dates = np.concatenate((self.dates, ohlc.index.to_numpy(dtype='datetime64[ns]')))
+        return len(ohlc)
+
+    def last_values(self) -> dict:
+        """Returns values of the last indexed row (NaN values as 0)."""
+        return {c: self._sums[c][-1] - self._sums[c][-2] for c in self.columns}
+
+    def _bounds(self, day, window):
+        day = pd.to_datetime(day)
+        day = day.to_numpy() if hasattr(day, 'to_numpy') else np.datetime64(day, 'ns')
+        end = np.searchsorted(self.dates, day, side='right')
+        begin = np.maximum(end - np.asarray(window), 0)
+        return begin, end
+
+    def sum(self, column: str, day, window):
+        """
+        Returns sum of column values over window of sessions ending at given
+        day (inclusively). Day and window may be arrays (broadcast together).
+        """
+        begin, end = self._bounds(day, window)
+        return self._sums[column][end] - self._sums[column][begin]
+
+    def count(self, column: str, day, window):
+        """Returns number of not-NaN column values in the window."""
+        begin, end = self._bounds(day, window)
+        return self._counts[column][end] - self._counts[column][begin]
+
+    def mean(self, column: str, day, window):
+        """
+        Returns mean of column values over window of sessions ending at given
+        day (inclusively), NaN if there are no values. Day and window may be
+        arrays (broadcast together).
+        """
+        begin, end = self._bounds(day, window)
+        sums = self._sums[column][end] - self._sums[column][begin]
+        counts = self._counts[column][end] - self._counts[column][begin]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            output = sums / counts
+        return output if np.ndim(output) else float(output)
+
+    def save(self, file_path) -> None:
+        """Saves index to NumPy file (.npz), given by path or file object."""
+        arrays = {f'sum_{c}': self._sums[c] for c in self.columns}
+        arrays.update({f'count_{c}': self._counts[c] for c in self.columns})
+        np.savez(file_path, dates=self.dates,
+                 columns=np.array(self.columns, dtype=str), **arrays)
+
+    @classmethod
+    def load(cls, file_path) -> 'PrefixSumIndex':
+        """Reads index saved with PrefixSumIndex.save."""
+        with np.load(file_path, allow_pickle=False) as data:
+            columns = data['columns'].tolist()
+            sums = {c: data[f'sum_{c}'] for c in columns}
+            counts = {c: data[f'count_{c}'] for c in columns}
+            return cls(data['dates'], sums, counts)
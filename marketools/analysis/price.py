@@ -1,6 +1,10 @@
 import pandas as pd
+import numpy as np
+from marketools.analysis import kernels
+from marketools.profiling import profiled
 
 
+@profiled
 def simple_relative_price_change(new_price: float, ref_price: float):
     """
     Calculates and returns relative price change.
@@ -21,6 +25,7 @@ def simple_relative_price_change(new_price: float, ref_price: float):
     return (new_price - ref_price) / ref_price
 
 
+@profiled
 def price_change(ohlc: pd.DataFrame, 
                  shift: int = 0,
                  relative: bool = False,
@@ -47,25 +52,22 @@ def price_change(ohlc: pd.DataFrame,
     pandas.Series
     """
 
-    if shift:
-        ref_price = ohlc['Close'].shift(shift)
-        name_str = f'({shift}d)'
-    else:
-        ref_price = ohlc['Open']
-        name_str = '(daily)'
-
-    change = ohlc['Close'] - ref_price
+    name_str = f'({shift}d)' if shift else '(daily)'
 
     if relative:
-        change = change / ref_price
         if percent:
-            change = 100 * change
             name_str = '%Change ' + name_str
         else:
             name_str = 'Relative change ' + name_str
     else:
         name_str = 'Change ' + name_str
 
-    change = change.rename(name_str)
+    values = kernels.price_change(ohlc['Open'].to_numpy(dtype=np.float64) if not shift else None,
+                                  ohlc['Close'].to_numpy(dtype=np.float64),
+                                  shift=shift, relative=relative, percent=percent)
+    change = pd.Series(values, index=ohlc.index, name=name_str)
 
     return change
+
+
+price_change.lookback = lambda shift=0, relative=False, percent=False: shift + 1
@@ -1,6 +1,11 @@
 import pandas as pd
+import numpy as np
+from marketools.analysis import kernels
+from marketools.analysis.lookback import ewm_lookback, EWM_TOLERANCE
+from marketools.profiling import profiled
 
 
+@profiled
 def relative_strength_index(prices: pd.DataFrame, window: int = 14):
     """
     Calculates Relative Strength Index (RSI).
@@ -17,25 +22,22 @@ def relative_strength_index(prices: pd.DataFrame, window: int = 14):
     pandas.Series
     """
     
-    price_now = prices['Close']
-    price_prev = prices['Close'].shift(periods=1, fill_value=0)  # assign to each day price from the previous day
+    # smoothed moving averages of upward and downward changes, alpha = 1/N (not 2/(N+1))
+    close = prices['Close'].to_numpy(dtype=np.float64)
+    output_rsi = pd.Series(kernels.rsi(close, window), index=prices.index, name='RSI')
 
-    price_changes = pd.DataFrame(columns=['Up', 'Down'])
-    price_changes['Up'] = price_now - price_prev  # upward changes
-    price_changes['Down'] = price_prev - price_now  # downward changes
-    price_changes[price_changes < 0] = 0
+    return output_rsi
 
-    smma = price_changes.ewm(alpha=1/window, adjust=False).mean()  # smoothed moving averages, alpha = 1/N (not 2/(N+1))
-    rs = smma['Up'] / smma['Down']
 
-    output_rsi = -100 / (rs+1)
-    output_rsi = output_rsi + 100
+def relative_strength_index_lookback(window: int = 14, tolerance: float = EWM_TOLERANCE):
+    """Returns number of recent bars needed to calculate the last RSI value."""
+    return ewm_lookback(1 / window, tolerance) + 1
 
-    output_rsi = output_rsi.rename('RSI')
 
-    return output_rsi
+relative_strength_index.lookback = relative_strength_index_lookback
 
 
+@profiled
 def rsi_cross_signals(rsi_values: pd.Series, 
                       cross_line: float, 
                       direction: str='rise'):
@@ -0,0 +1,195 @@
+import pandas as pd
+import numpy as np
+from marketools.analysis import kernels
+from marketools.analysis.lookback import ewm_lookback, EWM_TOLERANCE
+from marketools.profiling import profiled
+
+
+def _output(values, index, names, window):
+    """
+    Builds pandas output from kernel result. values has shape (outputs,
+    time), or (windows, outputs, time) if window is a sequence - then window
+    is appended to column names.
+    """
+    if np.ndim(window):
+        columns = {f'{name}{w}': v for w, window_values in zip(window, values)
+                   for name, v in zip(names, window_values)}
+        return pd.DataFrame(columns, index=index)
+    return pd.DataFrame(dict(zip(names, values)), index=index)
+
+
+def _max_window(window):
+    return int(np.max(window))
+
+
+@profiled
+def average_true_range(ohlc: pd.DataFrame, window: int = 14):
+    """
+    Returns Average True Range (ATR) - smoothed moving average (alpha =
+    1/window) of true range.
+
+    Parameters
+    ----------
+    ohlc : pandas.DataFrame
+        DataFrame with OHLC data
+    window : int or list
+        size of the moving window; for list of windows, ATR is calculated for
+        every window
+
+    Returns
+    -------
+    pandas.Series
+        DataFrame with column for every window, if window is list
+    """
+
+    high, low, close = (ohlc[c].to_numpy(dtype=np.float64) for c in ('High', 'Low', 'Close'))
+    values = kernels.atr(high, low, close, window)
+    if np.ndim(window):
+        return _output(values[:, None], ohlc.index, ['ATR'], window)
+    return pd.Series(values, index=ohlc.index, name=f'ATR{window}')
+
+
+def average_true_range_lookback(window: int = 14, tolerance: float = EWM_TOLERANCE):
+    """Returns number of recent bars needed to calculate the last ATR value."""
+    return ewm_lookback(1 / _max_window(window), tolerance) + 1
+
+
+average_true_range.lookback = average_true_range_lookback
+
+
+@profiled
+def bollinger_bands(ohlc: pd.DataFrame,
+                    price: str = 'Close',
+                    window: int = 20,
+                    k: float = 2.0):
+    """
+    Returns Pandas DataFrame with Bollinger Bands: Middle (SMA), Upper and
+    Lower (k population standard deviations from the middle).
+
+    Parameters
+    ----------
+    ohlc : pandas.DataFrame
+        DataFrame with OHLC data
+    price : str
+        the price on which bands will be calculated (Close by default)
+    window : int or list
+        size of the moving window; for list of windows, window is appended to
+        column names, e.g., 'Upper20'
+    k : float
+        width of the bands in standard deviations
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+
+    values = kernels.bollinger(ohlc[price].to_numpy(dtype=np.float64), window, k)
+    return _output(values, ohlc.index, ['Middle', 'Upper', 'Lower'], window)
+
+
+bollinger_bands.lookback = lambda price='Close', window=20, k=2.0: _max_window(window)
+
+
+@profiled
+def stochastic_oscillator(ohlc: pd.DataFrame,
+                          window: int = 14,
+                          smooth: int = 3):
+    """
+    Returns Pandas DataFrame with Stochastic oscillator: %K - position of
+    close price within high-low range of the window (0-100), and %D - simple
+    moving average of %K.
+
+    Parameters
+    ----------
+    ohlc : pandas.DataFrame
+        DataFrame with OHLC data
+    window : int or list
+        size of the moving window; for list of windows, window is appended to
+        column names, e.g., '%K14'
+    smooth : int
+        window of %D moving average
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+
+    high, low, close = (ohlc[c].to_numpy(dtype=np.float64) for c in ('High', 'Low', 'Close'))
+    values = kernels.stochastic(high, low, close, window, smooth)
+    return _output(values, ohlc.index, ['%K', '%D'], window)
+
+
+stochastic_oscillator.lookback = lambda window=14, smooth=3: _max_window(window) + smooth - 1
+
+
+@profiled
+def donchian_channels(ohlc: pd.DataFrame, window: int = 20):
+    """
+    Returns Pandas DataFrame with Donchian channels: Middle, Upper (highest
+    high of the window) and Lower (lowest low of the window).
+
+    Parameters
+    ----------
+    ohlc : pandas.DataFrame
+        DataFrame with OHLC data
+    window : int or list
+        size of the moving window; for list of windows, window is appended to
+        column names, e.g., 'Upper20'
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+
+    high, low = ohlc['High'].to_numpy(dtype=np.float64), ohlc['Low'].to_numpy(dtype=np.float64)
+    values = kernels.donchian(high, low, window)
+    return _output(values, ohlc.index, ['Middle', 'Upper', 'Lower'], window)
+
+
+donchian_channels.lookback = lambda window=20: _max_window(window)
+
+
+@profiled
+def max_drawdown(ohlc: pd.DataFrame,
+                 price: str = 'Close',
+                 window: int = None):
+    """
+    Returns maximal drawdown as negative fraction - the lowest ratio of price
+    to its running peak, minus one. With window, the peak and the trough are
+    both within the last window bars; without window, they are taken over
+    the whole history.
+
+    Parameters
+    ----------
+    ohlc : pandas.DataFrame
+        DataFrame with OHLC data
+    price : str
+        the price on which drawdown will be calculated (Close by default)
+    window : int, list or None
+        size of the moving window
+
+    Returns
+    -------
+    pandas.Series
+        DataFrame with column for every window, if window is list
+    """
+
+    values = kernels.max_drawdown(ohlc[price].to_numpy(dtype=np.float64), window)
+    if np.ndim(window):
+        return _output(values[:, None], ohlc.index, ['MaxDrawdown'], window)
+    name = 'MaxDrawdown' if window is None else f'MaxDrawdown{window}'
+    return pd.Series(values, index=ohlc.index, name=name)
+
+
+def max_drawdown_lookback(price: str = 'Close', window: int = None):
+    """Returns number of recent bars needed to calculate the last drawdown value."""
+    if window is None:
+        raise ValueError('max drawdown without window needs the whole history')
+    return _max_window(window)
+
+
+max_drawdown.lookback = max_drawdown_lookback
+
+
+if __name__ == '__main__':
+    pass
@@ -1,5 +1,8 @@
+from marketools.analysis.prefixsum import PrefixSumIndex
+from marketools.profiling import profiled
 
 
+@profiled
 def mean_volume_on_date(volume_data, day, window=90):
     """
     Returns mean volume over given number of sessions before given date 
@@ -7,8 +10,9 @@ def mean_volume_on_date(volume_data, day, window=90):
 
     Parameters
     ----------
-    volume_data : pandas.DataFrame
-        DataFrame with 'Volume' column
+    volume_data : pandas.DataFrame or PrefixSumIndex
+        DataFrame with 'Volume' column, or index with cumulative sums of
+        volume (O(1) calculation, day and window may be arrays)
     day : date 
         date the mean volume should be calculated for
     window : int
@@ -20,12 +24,16 @@ def mean_volume_on_date(volume_data, day, window=90):
     float
     """
     
+    if isinstance(volume_data, PrefixSumIndex):
+        return volume_data.mean('Volume', day, window)
+
     volume = volume_data[:day].tail(window)['Volume']
     output = volume.mean()
     
     return output
 
 
+@profiled
 def select_stocks_with_increased_volume(stocks_dict: dict, long: int = 90, factor: float = 3.3) -> dict:
 
     """
@@ -0,0 +1,252 @@
+"""
+Computation over universe of tickers split between worker processes or
+nodes. Tickers are partitioned into shards balanced by length of stored
+history; every worker loads OHLC data of its shard from the storage
+(local storage of the node, or shared storage backend) and returns only
+the results.
+
+Shards are run by a multi-process scheduler ('processes', default), in the
+current process ('serial'), or on Dask or Ray cluster ('dask', 'ray' -
+optional dependencies, not installed with marketools).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import os
+import numpy as np
+import pandas as pd
+import marketools.stqscraper as stqscraper
+from marketools.stqscraper.backends import from_description
+from marketools.stqscraper.intraday import INTRADAY_INTERVALS
+from marketools.stqscraper.manifest import get_manifest
+from marketools.stqscraper.stockquotes import StockQuotes
+from marketools.profiling import tag
+
+
+BACKENDS = ('processes', 'serial', 'dask', 'ray')
+
+
+def history_lengths(tickers, interval: str = 'd') -> pd.Series:
+    """
+    Returns number of stored rows of OHLC data for every ticker, read from
+    the storage manifest. Tickers without data get the median length (or 1
+    if nothing is stored).
+    """
+    tickers = list(tickers)
+    if not stqscraper.get_storage_status():
+        return pd.Series(1, index=tickers, dtype=np.int64)
+    if interval in INTRADAY_INTERVALS:
+        manifest = get_manifest()
+        rows = pd.Series([manifest.total_rows(t, interval, 'partition:') for t in tickers],
+                         index=tickers, dtype=np.float64).replace(0, np.nan)
+    else:
+        rows = get_manifest().lookup(tickers, interval=interval, dataset='ohlc')['Rows']
+        rows = rows.astype(np.float64)
+    fill = rows.median() if rows.notna().any() else 1
+    return rows.fillna(fill).clip(lower=1).astype(np.int64)
+
+
+def balance_shards(weights, n_shards: int) -> list:
+    """
+    Splits tickers into n_shards with similar sums of weights, with the
+    longest processing time first rule (the heaviest ticker goes to the
+    lightest shard).
+
+    Parameters
+    ----------
+    weights : pandas.Series or dict
+        ticker -> weight (e.g. length of history)
+    n_shards : int
+        number of shards
+
+    Returns
+    -------
+    list
+        list of shards (lists of tickers), empty shards are skipped
+    """
+    weights = pd.Series(weights, dtype=np.float64)
+    order = np.argsort(-weights.to_numpy(), kind='stable')
+    shards = [list() for _ in range(max(min(n_shards, len(weights)), 1))]
+    heap = [(0.0, i) for i in range(len(shards))]
+    for i in order:
+        load, shard = heapq.heappop(heap)
+        shards[shard].append(weights.index[i])
+        heapq.heappush(heap, (load + weights.iloc[i], shard))
+    return [s for s in shards if s]
+
+
+def _storage_settings() -> dict:
+    """
+    Returns storage settings of this process, to be applied in workers. The
+    backend is sent as its picklable description and recreated in workers.
+    """
+    backend = stqscraper.STORAGE_BACKEND
+    return dict(store=stqscraper.STORE_DWL_DATA,
+                directory=stqscraper.DWL_DATA_DIR,
+                backend=None if backend is None else backend.description(),
+                check_for_update=StockQuotes.check_for_update)
+
+
+def _configure(settings: dict) -> None:
+    stqscraper.STORE_DWL_DATA = settings['store']
+    stqscraper.DWL_DATA_DIR = settings['directory']
+    stqscraper.STORAGE_BACKEND = from_description(settings['backend'])
+    StockQuotes.check_for_update = settings['check_for_update']
+
+
+def _run_shard(task, tickers, settings=None) -> dict:
+    """Runs task for every ticker of the shard (in worker)."""
+    if settings is not None:
+        _configure(settings)
+    return {ticker: task(ticker) for ticker in tickers}
+
+
+class IndicatorTask:
+    """
+    Calculation of analysis function on OHLC data of a ticker. With last,
+    only the last value (row) is returned.
+    """
+
+    def __init__(self, indicator, params: dict = None, interval: str = 'd',
+                 start=None, end=None, tail=None, last: bool = False):
+        self.indicator = indicator
+        self.params = dict(params or {})
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.tail = tail
+        self.last = last
+
+    def __call__(self, ticker):
+        ohlc = StockQuotes(ticker).ohlc(interval=self.interval, start=self.start,
+                                        end=self.end, tail=self.tail)
+        if ohlc.empty:
+            return None
+        with tag(ticker):
+            output = self.indicator(ohlc, **self.params)
+        return output.iloc[-1] if self.last else output
+
+
+class ScanTask:
+    """Evaluation of Scanner conditions for a ticker."""
+
+    def __init__(self, scanner, end=None):
+        self.scanner = scanner
+        self.end = end
+
+    def __call__(self, ticker):
+        return self.scanner.evaluate(self.scanner.load(ticker, end=self.end))
+
+
+class Cluster:
+    """
+    Runner of computations over universe of tickers, split into shards
+    balanced by length of stored history.
+
+    Attributes
+    ----------
+    backend : str
+        'processes' - local worker processes (default), 'serial' - current
+        process, 'dask' - Dask cluster (client), 'ray' - Ray cluster
+    workers : int
+        number of worker processes (number of CPUs if None); for Dask and
+        Ray number of shards
+    client : object
+        dask.distributed.Client, the current client is used if None
+    """
+
+    def __init__(self, backend: str = 'processes', workers: int = None, client=None):
+        if backend not in BACKENDS:
+            raise ValueError(f'wrong value for backend, must be one of {BACKENDS}')
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.client = client
+
+    def shards(self, tickers, interval: str = 'd', tail: int = None) -> list:
+        """Returns tickers split into shards, one per worker."""
+        weights = history_lengths(tickers, interval=interval)
+        if tail is not None:
+            weights = weights.clip(upper=tail)  # only the tail is processed
+        return balance_shards(weights, self.workers)
+
+    def run(self, task, shards) -> dict:
+        """Runs task for tickers of all shards, returns dict ticker -> result."""
+        settings = None if 'serial' == self.backend else _storage_settings()
+        if 'serial' == self.backend:
+            results = [_run_shard(task, shard) for shard in shards]
+        elif 'processes' == self.backend:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(shards) or 1)) as executor:
+                futures = [executor.submit(_run_shard, task, shard, settings) for shard in shards]
+                results = [f.result() for f in futures]
+        elif 'dask' == self.backend:
+            try:
+                from dask.distributed import get_client
+            except ImportError:
+                raise ImportError("backend 'dask' requires dask.distributed (pip install 'dask[distributed]')")
+            client = self.client or get_client()
+            futures = [client.submit(_run_shard, task, shard, settings, pure=False) for shard in shards]
+            results = client.gather(futures)
+        else:
+            try:
+                import ray
+            except ImportError:
+                raise ImportError("backend 'ray' requires ray (pip install ray)")
+            remote = ray.remote(_run_shard)
+            results = ray.get([remote.remote(task, shard, settings) for shard in shards])
+
+        output = dict()
+        for result in results:
+            output.update(result)
+        return output
+
+    def map(self, indicator, tickers, params: dict = None, interval: str = 'd',
+            start=None, end=None, tail=None, last: bool = False):
+        """
+        Calculates analysis function for every ticker in workers.
+
+        Parameters
+        ----------
+        indicator : callable
+            function from marketools.analysis (or other function of OHLC
+            DataFrame, defined in importable module)
+        tickers : iterable
+            tickers
+        params : dict
+            keyword arguments passed to the indicator
+        interval : str
+            interval of OHLC data
+        start, end : date, str or None
+            bounds of OHLC data
+        tail : int or None
+            number of the most recent OHLC bars, e.g., indicator.lookback()
+        last : bool
+            if True, only the last value of indicator is returned
+
+        Returns
+        -------
+        dict or pandas.DataFrame
+            dict ticker -> indicator output; with last, DataFrame (Series for
+            single-column indicators) indexed by ticker
+        """
+        tickers = list(tickers)
+        task = IndicatorTask(indicator, params, interval, start, end, tail, last)
+        output = self.run(task, self.shards(tickers, interval=interval, tail=tail))
+        output = {t: output[t] for t in tickers}
+        if not last:
+            return output
+
+        values = {t: v for t, v in output.items() if v is not None}
+        if values and all(isinstance(v, pd.Series) for v in values.values()):
+            return pd.DataFrame(values).T.reindex(tickers)
+        return pd.Series(values, dtype=np.float64).reindex(tickers)
+
+    def scan(self, scanner, tickers, end=None) -> list:
+        """Returns list of tickers for which Scanner conditions are met."""
+        tickers = list(tickers)
+        task = ScanTask(scanner, end)
+        matches = self.run(task, self.shards(tickers, interval=scanner.interval,
+                                             tail=scanner.lookback))
+        return [t for t in tickers if matches[t]]
+
+
+if __name__ == '__main__':
+    pass
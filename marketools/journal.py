@@ -0,0 +1,224 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+
+BUY = 1
+SELL = -1
+_SIDES = {'buy': BUY, 'sell': SELL}
+
+
+class Journal:
+    """
+    Append-only, columnar journal of wallet transactions.
+
+    Every column is kept in its own NumPy array that grows geometrically, so
+    appending a transaction is amortized O(1). Tickers are stored as integer
+    codes into the list of names.
+
+    Attributes
+    ----------
+    names : list
+        list of tickers, position in the list is the ticker code
+    """
+
+    _dtypes = dict(ticker=np.int32,
+                   side=np.int8,
+                   volume=np.float64,
+                   price=np.float64,
+                   fee=np.float64,
+                   timestamp='datetime64[s]')
+
+    def __init__(self, capacity: int = 1024):
+        self.names = list()
+        self._codes = dict()
+        self._size = 0
+        self._columns = {k: np.empty(max(capacity, 1), dtype=v)
+                         for k, v in Journal._dtypes.items()}
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """Returns read-only view of given column."""
+        output = self._columns[column][:self._size]
+        output.flags.writeable = False
+        return output
+
+    def _code(self, ticker: str) -> int:
+        code = self._codes.get(ticker)
+        if code is None:
+            code = len(self.names)
+            self._codes[ticker] = code
+            self.names.append(ticker)
+        return code
+
+    def _grow(self):
+        for k, v in self._columns.items():
+            new_column = np.empty(2 * len(v), dtype=v.dtype)
+            new_column[:self._size] = v[:self._size]
+            self._columns[k] = new_column
+
+    def append(self, ticker: str, side: str, volume: float, price: float,
+               fee: float, timestamp=None) -> None:
+        """
+        Appends transaction to the journal.
+
+        Parameters
+        ----------
+        ticker : str
+            ticker of traded stock
+        side : str
+            'buy' or 'sell'
+        volume : float
+            number of traded shares
+        price : float
+            price of a single share
+        fee : float
+            commission paid for the transaction
+        timestamp : datetime, date or None
+            time of the transaction, now if None
+        """
+        if side not in _SIDES:
+            raise ValueError('wrong value for side, must be "buy" or "sell"')
+        if self._size == len(self._columns['side']):
+            self._grow()
+
+        i = self._size
+        self._columns['ticker'][i] = self._code(ticker)
+        self._columns['side'][i] = _SIDES[side]
+        self._columns['volume'][i] = volume
+        self._columns['price'][i] = price
+        self._columns['fee'][i] = fee
+        self._columns['timestamp'][i] = np.datetime64(
+            pd.Timestamp(datetime.now() if timestamp is None else timestamp), 's')
+        self._size += 1
+
+    def until(self, timestamp) -> 'Journal':
+        """
+        Returns new journal with transactions made not later than given time.
+        """
+        return self._select(self['timestamp'] <= np.datetime64(pd.Timestamp(timestamp), 's'))
+
+    def copy(self) -> 'Journal':
+        """Returns new journal with all transactions."""
+        return self._select(np.ones(self._size, dtype=bool))
+
+    def _select(self, mask) -> 'Journal':
+        output = Journal(capacity=int(mask.sum()))
+        output.names = list(self.names)
+        output._codes = dict(self._codes)
+        for k in Journal._dtypes:
+            selected = self[k][mask]
+            output._columns[k][:len(selected)] = selected
+        output._size = int(mask.sum())
+        return output
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns DataFrame with columns: 'Ticker', 'Side', 'Volume', 'Price',
+        'Fee', 'Timestamp'.
+        """
+        names = np.array(self.names, dtype=object)
+        sides = np.where(self['side'] == BUY, 'buy', 'sell')
+        return pd.DataFrame({'Ticker': names[self['ticker']],
+                             'Side': sides,
+                             'Volume': self['volume'],
+                             'Price': self['price'],
+                             'Fee': self['fee'],
+                             'Timestamp': self['timestamp']})
+
+    def save(self, file_path) -> None:
+        """Saves journal to compressed NumPy file (.npz)."""
+        columns = {k: self[k] for k in Journal._dtypes}
+        np.savez_compressed(file_path,
+                            names=np.array(self.names, dtype=str),
+                            **columns)
+
+    @classmethod
+    def load(cls, file_path) -> 'Journal':
+        """Reads journal saved with Journal.save."""
+        with np.load(file_path, allow_pickle=False) as data:
+            size = len(data['side'])
+            output = cls(capacity=size)
+            for name in data['names'].tolist():
+                output._code(name)
+            for k in Journal._dtypes:
+                output._columns[k][:size] = data[k]
+            output._size = size
+        return output
+
+
+def replay(journal: Journal, until=None):
+    """
+    Rebuilds wallet state from the journal. The calculations are vectorized
+    over all transactions - there is no Python loop over the journal.
+
+    Parameters
+    ----------
+    journal : Journal
+        journal with wallet transactions
+    until : datetime, date or None
+        if given, only transactions made not later than this time are
+        replayed
+
+    Returns
+    -------
+    tuple
+        (stocks, cash) - DataFrame with owned stocks (same columns as
+        Wallet.stocks) and net cash flow of all replayed transactions
+    """
+    if until is not None:
+        journal = journal.until(until)
+
+    columns = ['Name', 'Volume', 'Purchase price', 'Purchase date', 'Price']
+    if not len(journal):
+        return pd.DataFrame(columns=columns), 0.0
+
+    side = journal['side'].astype(np.float64)
+    volume = journal['volume']
+    price = journal['price']
+    value = volume * price
+    cash = float(np.sum(-side * value - journal['fee']))
+
+    trades = pd.DataFrame({'code': journal['ticker'],
+                           'signed': side * volume,
+                           'buy_value': np.where(side > 0, value, 0.0),
+                           'row': np.arange(len(journal))})
+    by_ticker = trades.groupby('code', sort=False)
+    position = by_ticker['signed'].cumsum()
+    previous = position - trades['signed']
+
+    # position segments - a segment ends when position is closed
+    closed = (position <= 0).astype(np.int64)
+    trades['segment'] = closed.groupby(trades['code']).cumsum() - closed
+
+    # cost basis follows C[k] = a[k] * C[k-1] + b[k], with a = 1 for buy
+    # and a = position/previous for sell (purchase price does not change)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(side > 0, 1.0, position / previous)
+    trades['a'] = np.where(np.isfinite(a), a, 0.0)
+    by_segment = trades.groupby(['code', 'segment'], sort=False)
+    trades['P'] = by_segment['a'].cumprod()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.where(trades['P'] > 0, trades['buy_value'] / trades['P'], 0.0)
+    trades['scaled'] = scaled
+    by_segment = trades.groupby(['code', 'segment'], sort=False)
+    cost = trades['P'] * by_segment['scaled'].cumsum()
+
+    trades['position'] = position
+    trades['cost'] = cost
+    opening = by_segment['row'].transform('first')
+
+    last = trades.groupby('code', sort=False).tail(1)
+    last = last[last['position'] > 0]
+    last = last.assign(opening=opening[last.index]).sort_values('opening')
+    rows = last['row'].to_numpy()
+
+    names = np.array(journal.names, dtype=object)
+    stocks = pd.DataFrame({'Name': names[last['code'].to_numpy()],
+                           'Volume': last['position'].to_numpy(),
+                           'Purchase price': (last['cost'] / last['position']).to_numpy(),
+                           'Purchase date': journal['timestamp'][last['opening'].to_numpy()],
+                           'Price': price[rows]})
+    return stocks, cash
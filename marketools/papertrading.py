@@ -0,0 +1,382 @@
+"""
+Event-driven paper trading of many strategies at once, with asyncio.
+
+A feed (replay_bars - stored bars replayed at chosen speed, live_quotes -
+last quotes polled from Stooq, or any async iterable of Tick) produces one
+Tick per timestamp with bars of all tickers. The engine dispatches every
+tick to all strategies, each with its own Wallet:
+
+    async def strategy(tick, account):
+        if tick.price('PKN') > 60 and not account.volume('PKN'):
+            account.buy('PKN', 10)
+
+    engine = PaperTradingEngine()
+    engine.add_strategy('pkn', strategy, wallet)
+    equity = asyncio.run(engine.run(replay_bars(['PKN', 'PZU'], interval='5')))
+
+Strategy is a coroutine function (or plain function) called with a tick
+and the Account of the strategy. Orders placed on a tick are collected and
+executed together when the strategy returns, at close prices of the tick
+(Wallet.execute - one commission call per tick). Every strategy consumes
+ticks from its own bounded queue, so fast strategies do not wait for slow
+ones, and the feed waits (backpressure) when the slowest strategy is
+queue_size ticks behind.
+"""
+import asyncio
+import inspect
+import time
+import numpy as np
+import pandas as pd
+from marketools.stqscraper.stockquotes import StockQuotes
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class Tick:
+    """
+    Bars of all tickers of the feed at one timestamp. Arrays are indexed as
+    tickers, with NaN for tickers without bar at the timestamp.
+
+    Attributes
+    ----------
+    time : pandas.Timestamp
+        timestamp of the bars
+    tickers : list
+        tickers of the feed (the same list in all ticks)
+    index : dict
+        ticker -> position in tickers
+    open, high, low, close, volume : numpy.ndarray
+        OHLCV values
+    """
+
+    __slots__ = ('time', 'tickers', 'index', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, time, tickers, index, open_, high, low, close, volume):
+        self.time = time
+        self.tickers = tickers
+        self.index = index
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __repr__(self):
+        return f'Tick({self.time}, {np.count_nonzero(~np.isnan(self.close))} bars)'
+
+    def price(self, ticker: str) -> float:
+        """Returns close price of ticker, NaN if there is no bar."""
+        return self.close[self.index[ticker]]
+
+    def bars(self) -> pd.DataFrame:
+        """Returns DataFrame with OHLCV columns indexed by ticker, only tickers with bars."""
+        output = pd.DataFrame({'Open': self.open, 'High': self.high, 'Low': self.low,
+                               'Close': self.close, 'Volume': self.volume},
+                              index=pd.Index(self.tickers, name='Ticker'))
+        return output[~np.isnan(self.close)]
+
+
+def _ticks(ohlc: dict):
+    """Yields ticks from dict ticker -> OHLC DataFrame, aligned on the union of timestamps."""
+    tickers = list(ohlc)
+    index = {t: i for i, t in enumerate(tickers)}
+    if not tickers:
+        return
+    frames = [ohlc[t].reindex(columns=OHLCV_COLUMNS) for t in tickers]
+    timestamps = frames[0].index
+    for frame in frames[1:]:
+        timestamps = timestamps.union(frame.index)
+    # (column, timestamp, ticker) - every tick is a view of one row
+    values = np.stack([f.reindex(timestamps).to_numpy(dtype=np.float64).T for f in frames], axis=2)
+    for i, timestamp in enumerate(timestamps):
+        yield Tick(timestamp, tickers, index, *values[:, i])
+
+
+async def replay_bars(tickers, interval: str = 'd', start=None, end=None, speed: float = None, ohlc: dict = None):
+    """
+    Replays stored bars of tickers as ticks, in order of time.
+
+    Parameters
+    ----------
+    tickers : list
+        tickers
+    interval : str
+        interval of OHLC data, e.g., 'd' or intraday '5'
+    start, end : date, str or None
+        bounds of replayed bars
+    speed : float or None
+        replay speed in relation to market time, e.g., 60 - one minute of
+        bars per second; as fast as possible if None
+    ohlc : dict or None
+        ticker -> OHLC DataFrame to replay instead of stored data
+
+    Yields
+    ------
+    Tick
+    """
+    if ohlc is None:
+        ohlc = {t: StockQuotes(t).ohlc(interval=interval, start=start, end=end) for t in tickers}
+    else:
+        ohlc = {t: ohlc[t].loc[start:end] for t in tickers}
+
+    first, wall_start = None, time.monotonic()
+    for tick in _ticks(ohlc):
+        if speed is None:
+            await asyncio.sleep(0)  # let strategies run
+        else:
+            first = tick.time if first is None else first
+            delay = wall_start + (tick.time - first).total_seconds() / speed - time.monotonic()
+            await asyncio.sleep(max(delay, 0))
+        yield tick
+
+
+async def live_quotes(tickers, period: float = 60.0, ticks: int = None):
+    """
+    Polls the last quotes of tickers from Stooq (get_last_quotes, in batch)
+    every period seconds and yields them as ticks stamped with time of the
+    poll.
+
+    Parameters
+    ----------
+    tickers : list
+        tickers
+    period : float
+        time between polls in seconds
+    ticks : int or None
+        number of ticks, infinite if None
+
+    Yields
+    ------
+    Tick
+    """
+    from marketools.stqscraper.scrapers import get_last_quotes
+
+    tickers = list(tickers)
+    index = {t: i for i, t in enumerate(tickers)}
+    count = 0
+    while ticks is None or count < ticks:
+        started = time.monotonic()
+        quotes = await asyncio.get_running_loop().run_in_executor(None, get_last_quotes, tickers)
+        values = quotes.reindex(tickers)[OHLCV_COLUMNS].to_numpy(dtype=np.float64).T
+        yield Tick(pd.Timestamp.now(), tickers, index, *values)
+        count += 1
+        await asyncio.sleep(max(period - (time.monotonic() - started), 0))
+
+
+class Account:
+    """
+    Wallet of a strategy in the engine. Orders are collected during the
+    tick and executed together after the strategy returns.
+
+    Attributes
+    ----------
+    name : str
+        name of the strategy
+    wallet : Wallet
+        wallet of the strategy
+    time : pandas.Timestamp
+        time of the current tick
+    equity : list
+        total value of the wallet after every tick
+    """
+
+    def __init__(self, name: str, wallet):
+        self.name = name
+        self.wallet = wallet
+        self.time = None
+        self.equity = list()
+        self._orders = list()
+        self._tickers = None
+        self._positions = None  # ticker -> position in tickers of the feed
+        self._last = None  # last known close prices
+        self._volume = None  # owned shares of tickers of the feed
+        self._other_value = 0.0  # value of owned stocks not in the feed
+
+    def _attach(self, tick):
+        """Prepares arrays for tickers of the feed."""
+        self._tickers = tick.tickers
+        self._positions = tick.index
+        self._last = np.full(len(tick.tickers), np.nan)
+        self._volume = np.zeros(len(tick.tickers))
+        self._other_value = 0.0
+        stocks = self.wallet.stocks
+        for name, volume, price in zip(stocks['Name'], stocks['Volume'], stocks['Price']):
+            if name in tick.index:
+                self._volume[tick.index[name]] = volume
+                self._last[tick.index[name]] = price
+            else:
+                self._other_value += volume * price
+
+    def _begin(self, tick):
+        if tick.tickers is not self._tickers:
+            self._attach(tick)
+        self.time = tick.time
+        np.copyto(self._last, tick.close, where=~np.isnan(tick.close))
+
+    @property
+    def money(self) -> float:
+        return self.wallet.money
+
+    @property
+    def total_value(self) -> float:
+        """Value of money and stocks at the last known prices."""
+        held = self._volume != 0
+        return self.wallet.money + self._other_value + float(np.dot(self._volume[held], self._last[held]))
+
+    def price(self, ticker: str) -> float:
+        """Returns the last known close price of ticker."""
+        return self._last[self._index(ticker)]
+
+    def volume(self, ticker: str) -> float:
+        """Returns number of owned shares of ticker (without pending orders)."""
+        return self._volume[self._index(ticker)]
+
+    def _index(self, ticker):
+        try:
+            return self._positions[ticker]
+        except KeyError:
+            raise KeyError(f'{ticker} is not in the feed')
+
+    def buy(self, ticker: str, volume: int, price: float = None) -> None:
+        """Places order to buy volume shares, at close price of the tick if price is None."""
+        self._orders.append((ticker, volume, price))
+
+    def sell(self, ticker: str, volume: int, price: float = None) -> None:
+        """Places order to sell volume shares, at close price of the tick if price is None."""
+        self._orders.append((ticker, -volume, price))
+
+    def sell_all(self, ticker: str, price: float = None) -> None:
+        """Places order to sell all owned shares of ticker."""
+        volume = self.volume(ticker)
+        if volume:
+            self.sell(ticker, volume, price)
+
+    def _execute(self, tick):
+        """Executes orders placed on the tick, returns boolean mask of executed orders."""
+        orders, self._orders = self._orders, list()
+        if not orders:
+            return np.zeros(0, dtype=bool)
+        names, volumes, prices = zip(*orders)
+        positions = np.array([tick.index.get(n, -1) for n in names])
+        if (positions < 0).any():
+            raise KeyError(f'orders for tickers not in the feed: {set(np.array(names)[positions < 0])}')
+        prices = np.array([np.nan if p is None else p for p in prices], dtype=np.float64)
+        prices = np.where(np.isnan(prices), self._last[positions], prices)
+        volumes = np.array(volumes)
+
+        valid = ~np.isnan(prices)  # no price yet - order is rejected
+        executed = np.zeros(len(orders), dtype=bool)
+        executed[valid] = self.wallet.execute([n for n, v in zip(names, valid) if v],
+                                              volumes[valid], prices[valid], tick.time)
+        np.add.at(self._volume, positions[executed], volumes[executed])
+        return executed
+
+
+async def _call(strategy, tick, account):
+    result = strategy(tick, account)
+    if inspect.isawaitable(result):
+        await result
+
+
+class PaperTradingEngine:
+    """
+    Engine dispatching ticks of a feed to many strategies.
+
+    Attributes
+    ----------
+    queue_size : int
+        maximal number of ticks waiting for a strategy; the feed waits when
+        a queue is full
+    accounts : dict
+        strategy name -> Account
+    """
+
+    def __init__(self, queue_size: int = 256):
+        if queue_size < 1:
+            raise ValueError('queue_size has to be positive value')
+        self.queue_size = queue_size
+        self.accounts = dict()
+        self._strategies = dict()
+
+    def add_strategy(self, name: str, strategy, wallet) -> 'Account':
+        """
+        Adds strategy trading with its own wallet.
+
+        Parameters
+        ----------
+        name : str
+            name of the strategy
+        strategy : callable
+            coroutine function (or function) called with Tick and Account
+            on every tick
+        wallet : Wallet
+            wallet of the strategy
+
+        Returns
+        -------
+        Account
+        """
+        if name in self.accounts:
+            raise ValueError(f'strategy {name} already added')
+        self.accounts[name] = Account(name, wallet)
+        self._strategies[name] = strategy
+        return self.accounts[name]
+
+    @staticmethod
+    async def _dispatch(feed, queues):
+        async for tick in feed:
+            for queue in queues:
+                await queue.put(tick)  # waits for strategy, if its queue is full
+        for queue in queues:
+            await queue.put(None)  # end of the feed
+
+    async def _consume(self, name, queue):
+        account, strategy = self.accounts[name], self._strategies[name]
+        while True:
+            tick = await queue.get()
+            if tick is None:
+                break
+            account._begin(tick)
+            await _call(strategy, tick, account)
+            account._execute(tick)
+            account.equity.append((tick.time, account.total_value))
+
+        if account._tickers is not None:  # mark owned stocks to the last prices
+            account.wallet.update_prices({t: p for t, p in zip(account._tickers, account._last)
+                                          if not np.isnan(p)})
+
+    async def run(self, feed) -> pd.DataFrame:
+        """
+        Runs all strategies on ticks of the feed, until the feed ends.
+
+        Parameters
+        ----------
+        feed : async iterable
+            ticks, e.g., replay_bars or live_quotes
+
+        Returns
+        -------
+        pandas.DataFrame
+            total value of wallets after every tick, one column per strategy
+        """
+        for account in self.accounts.values():
+            account.equity = list()
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.accounts]
+        tasks = [asyncio.ensure_future(self._consume(name, queue))
+                 for name, queue in zip(self.accounts, queues)]
+        tasks.append(asyncio.ensure_future(self._dispatch(feed, queues)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        output = {name: pd.Series(dict(account.equity), dtype=np.float64)
+                  for name, account in self.accounts.items()}
+        output = pd.DataFrame(output)
+        output.index.name = 'Time'
+        return output
+
+
+if __name__ == '__main__':
+    pass
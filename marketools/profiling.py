@@ -0,0 +1,247 @@
+"""
+Opt-in per-call profiling of data and analysis paths, for finding outliers,
+e.g., a ticker whose data take 50x longer to load than the others:
+
+    import marketools
+
+    with marketools.profile() as p:
+        for ticker in tickers:
+            marketools.Stock(ticker).heikinashi
+
+    p.report().head(10)         # the slowest (function, ticker) pairs
+    p.save_folded('ohlc.txt')   # flamegraph.pl ohlc.txt > ohlc.svg
+
+Every call of StockQuotes and Fundamentals methods, scrapers and analysis
+functions is recorded with its wall time, number of rows processed and
+bytes read from storage or network, tagged by ticker (analysis functions
+inherit the ticker of the caller, see tag). When no profile is active,
+instrumented functions only check a module-level flag.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+import functools
+import numpy as np
+import pandas as pd
+
+
+_active = ()  # active profiles, profiling is disabled if empty
+_stack = ContextVar('marketools_profiling_stack', default=())
+_ticker = ContextVar('marketools_profiling_ticker', default=None)
+
+_COLUMNS = ['Stack', 'Function', 'Ticker', 'Time', 'Self time', 'Rows', 'Bytes', 'Self bytes']
+
+
+class _Frame:
+    __slots__ = ('function', 'ticker', 'child_time', 'bytes', 'child_bytes')
+
+    def __init__(self, function, ticker):
+        self.function = function
+        self.ticker = ticker
+        self.child_time = 0.0
+        self.bytes = 0
+        self.child_bytes = 0
+
+    @property
+    def label(self):
+        return f'{self.function} [{self.ticker}]' if self.ticker else self.function
+
+
+def _function_name(function) -> str:
+    module = function.__module__ or ''
+    if module.startswith('marketools.'):
+        module = module[len('marketools.'):]
+    return f'{module}.{function.__qualname__}'
+
+
+def _call_ticker(args):
+    """Returns ticker of the call: ticker attribute of self, or ticker given as the first argument."""
+    if args:
+        ticker = getattr(args[0], 'ticker', None)
+        if isinstance(ticker, str):
+            return ticker
+        if isinstance(args[0], str):
+            return args[0]
+    return None
+
+
+def _rows(result, args) -> int:
+    """Returns number of rows of the output, or of the input if the output is not a table."""
+    for value in (result, *args):
+        if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+            return len(value)
+    return 0
+
+
+def profiling_enabled() -> bool:
+    """Returns True if any profile is active."""
+    return bool(_active)
+
+
+def add_bytes(n: int) -> None:
+    """Adds number of bytes read from storage or network to the current call."""
+    if _active:
+        stack = _stack.get()
+        if stack:
+            stack[-1].bytes += n
+
+
+@contextmanager
+def tag(ticker: str):
+    """
+    Tags calls made in the block with ticker, e.g., analysis functions
+    called on OHLC data of the ticker.
+    """
+    token = _ticker.set(ticker)
+    try:
+        yield
+    finally:
+        _ticker.reset(token)
+
+
+def _profiled_call(function, name, args, kwargs):
+    stack = _stack.get()
+    ticker = _call_ticker(args) or (stack[-1].ticker if stack else _ticker.get())
+    frame = _Frame(name, ticker)
+    token = _stack.set(stack + (frame,))
+    result = None
+    start = perf_counter()
+    try:
+        result = function(*args, **kwargs)
+        return result
+    finally:
+        elapsed = perf_counter() - start
+        _stack.reset(token)
+        total_bytes = frame.bytes + frame.child_bytes
+        if stack:
+            stack[-1].child_time += elapsed
+            stack[-1].child_bytes += total_bytes
+        record = (tuple(f.label for f in stack + (frame,)), name, ticker or '',
+                  elapsed, max(elapsed - frame.child_time, 0.0), _rows(result, args),
+                  total_bytes, frame.bytes)
+        for profile_ in _active:
+            profile_.calls.append(record)
+
+
+def profiled(function):
+    """
+    Decorator recording calls of the function in active profiles. When
+    profiling is disabled, the function is called directly.
+    """
+    name = _function_name(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _active:
+            return function(*args, **kwargs)
+        return _profiled_call(function, name, args, kwargs)
+
+    return wrapper
+
+
+class Profile:
+    """
+    Calls recorded while the profile was active.
+
+    Attributes
+    ----------
+    calls : list
+        one tuple per call: stack (labels of the call and its callers),
+        function, ticker, time [s], self time (without instrumented
+        callees) [s], rows, bytes, self bytes
+    """
+
+    def __init__(self):
+        self.calls = list()
+
+    def records(self) -> pd.DataFrame:
+        """Returns DataFrame with one row per call."""
+        return pd.DataFrame(self.calls, columns=_COLUMNS)
+
+    def report(self, sort: str = 'Time', ascending: bool = False, per_ticker: bool = True) -> pd.DataFrame:
+        """
+        Returns summary of calls per function and ticker.
+
+        Parameters
+        ----------
+        sort : str
+            column to sort by: 'Calls', 'Time', 'Self time', 'Mean time',
+            'Relative', 'Rows' or 'Bytes'
+        ascending : bool
+            sort order, the largest values first by default
+        per_ticker : bool
+            if False, calls are summarized per function only
+
+        Returns
+        -------
+        pandas.DataFrame
+            columns 'Function', 'Ticker' (with per_ticker), 'Calls', 'Time',
+            'Self time', 'Rows', 'Bytes', 'Mean time' (per call) and
+            'Relative' (with per_ticker; mean time in relation to median of
+            mean times of the function for all tickers, outliers have large
+            values)
+        """
+        keys = ['Function', 'Ticker'] if per_ticker else ['Function']
+        grouped = self.records().groupby(keys, sort=False)
+        output = grouped.agg(Calls=('Time', 'size'), Time=('Time', 'sum'),
+                             SelfTime=('Self time', 'sum'), Rows=('Rows', 'sum'),
+                             Bytes=('Bytes', 'sum'))
+        output = output.rename(columns={'SelfTime': 'Self time'})
+        output['Mean time'] = output['Time'] / output['Calls']
+        if per_ticker:
+            median = output.groupby(level='Function')['Mean time'].transform('median')
+            output['Relative'] = output['Mean time'] / median
+        return output.reset_index().sort_values(sort, ascending=ascending, ignore_index=True)
+
+    def folded(self, value: str = 'time') -> str:
+        """
+        Returns calls in folded stacks format (one line 'caller;callee value'
+        per stack), input of flamegraph.pl, speedscope and other flame graph
+        tools. Frames are labeled 'function [ticker]'.
+
+        Parameters
+        ----------
+        value : str
+            'time' - self time in microseconds, 'bytes' - self bytes, or
+            'calls' - number of calls
+
+        Returns
+        -------
+        str
+        """
+        if value not in ('time', 'bytes', 'calls'):
+            raise ValueError('wrong value for value, must be "time", "bytes" or "calls"')
+        totals = dict()
+        for stack, _, _, _, self_time, _, _, self_bytes in self.calls:
+            amount = {'time': self_time * 1e6, 'bytes': self_bytes, 'calls': 1}[value]
+            totals[stack] = totals.get(stack, 0) + amount
+        lines = [f'{";".join(stack)} {int(round(amount))}' for stack, amount in totals.items()]
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def save_folded(self, file_path, value: str = 'time') -> None:
+        """Saves calls in folded stacks format (see folded)."""
+        with open(file_path, 'w') as f:
+            f.write(self.folded(value=value))
+
+
+@contextmanager
+def profile():
+    """
+    Records calls of data and analysis functions made in the block (in all
+    threads of the process).
+
+    Yields
+    ------
+    Profile
+    """
+    global _active
+    output = Profile()
+    _active = _active + (output,)
+    try:
+        yield output
+    finally:
+        _active = tuple(p for p in _active if p is not output)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,198 @@
+"""
+Lazy queries over stored OHLC data of the whole universe, with Polars
+(optional dependency: pip install polars).
+
+scan_store returns Polars LazyFrame with columns 'Ticker', 'Date', 'Open',
+'High', 'Low', 'Close', 'Volume' of all stored tickers, built directly on
+the CSV files. Nothing is read until the query is collected; then only the
+columns used by the query are parsed (projection pushdown), date filters
+are applied while reading (predicate pushdown), and files are processed by
+all cores. Indicators are expressions evaluated per ticker, e.g.:
+
+    import polars as pl
+    from marketools import query as q
+
+    result = (q.scan_store(start='2021-01-01')
+              .with_columns(q.mean_volume(20), q.mean_volume(90), q.rsi(14))
+              .with_columns(q.crossed('RSI', 30))
+              .pipe(q.last_bar)
+              .filter((pl.col('VolumeMean20') > 3 * pl.col('VolumeMean90'))
+                      & pl.col('RSI crossed 30'))
+              .select('Ticker')
+              .collect())
+"""
+import re
+import numpy as np
+import pandas as pd
+from marketools.stqscraper import get_storage_status, get_storage_backend
+from marketools.stqscraper.intraday import INTRADAY_INTERVALS
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+def _polars():
+    if pl is None:
+        raise ImportError('marketools.query requires polars (pip install polars)')
+    return pl
+
+
+def _schema():
+    return {'Date': pl.Date, 'Open': pl.Float64, 'High': pl.Float64,
+            'Low': pl.Float64, 'Close': pl.Float64, 'Volume': pl.Float64}
+
+
+def scan_store(tickers=None, interval: str = 'd', start=None, end=None):
+    """
+    Returns Polars LazyFrame with stored OHLC data of given tickers, sorted
+    by ticker and date.
+
+    Parameters
+    ----------
+    tickers : list or None
+        tickers, all stored tickers if None
+    interval : str
+        interval of OHLC data: d, w, m, q or y
+    start : date, str or None
+        first date (inclusively); indicators need history before the first
+        evaluated date, e.g., max of their lookback
+    end : date, str or None
+        last date (inclusively)
+
+    Returns
+    -------
+    polars.LazyFrame
+    """
+    _polars()
+    if interval in INTRADAY_INTERVALS:
+        raise ValueError('intraday intervals are not supported')
+    if not get_storage_status():
+        raise RuntimeError('data storage is disabled, see store_data')
+
+    backend = get_storage_backend()
+    suffix = f'_ohcl_{interval}.csv'
+    if tickers is None:
+        keys = [k for k in backend.keys(recursive=False) if k.endswith(suffix)]
+    else:
+        keys = [f'{t}{suffix}' for t in tickers]
+
+    paths, frames = list(), list()
+    for key in keys:
+        file_path = backend.local_path(key)
+        if file_path is not None:
+            paths.append(file_path)
+            continue
+        content = backend.read(key)  # backend without local files
+        if content is not None:
+            frames.append(pl.scan_csv(content, schema=_schema())
+                          .with_columns(pl.lit(key[:-len(suffix)]).alias('Ticker')))
+
+    if paths:
+        pattern = re.escape(suffix) + '$'
+        frames.insert(0, pl.scan_csv(paths, schema=_schema(), include_file_paths='Path')
+                      .with_columns(pl.col('Path').str.replace(r'^.*[/\\]', '')
+                                    .str.replace(pattern, '').alias('Ticker'))
+                      .drop('Path'))
+
+    if not frames:
+        output = pl.LazyFrame(schema=dict(Ticker=pl.String, **_schema()))
+    else:
+        output = pl.concat(frames, how='diagonal').select('Ticker', *_schema())
+    output = output.with_columns(pl.col('Ticker').cast(pl.Categorical))
+
+    if start is not None:
+        output = output.filter(pl.col('Date') >= pd.Timestamp(start).date())
+    if end is not None:
+        output = output.filter(pl.col('Date') <= pd.Timestamp(end).date())
+    return output
+
+
+def sma(window: int = 15, price: str = 'Close'):
+    """Simple moving average, column 'SMA{window}'."""
+    return _polars().col(price).rolling_mean(window).over('Ticker').alias(f'SMA{window}')
+
+
+def ema(window: int = 15, price: str = 'Close'):
+    """Exponential moving average (alpha = 2/(window + 1)), column 'EMA{window}'."""
+    return (_polars().col(price).ewm_mean(alpha=2 / (window + 1), adjust=False)
+            .over('Ticker').alias(f'EMA{window}'))
+
+
+def rsi(window: int = 14):
+    """
+    Relative Strength Index (smoothed moving averages of upward and downward
+    changes, alpha = 1/window), column 'RSI'.
+    """
+    close = _polars().col('Close')
+    change = close.diff().fill_null(close)  # previous price for the first bar is 0
+    up = change.clip(lower_bound=0).ewm_mean(alpha=1 / window, adjust=False)
+    down = (-change).clip(lower_bound=0).ewm_mean(alpha=1 / window, adjust=False)
+    return (100 - 100 / (1 + up / down)).over('Ticker').alias('RSI')
+
+
+def price_change(shift: int = 0, relative: bool = False, percent: bool = False):
+    """
+    Price change: Close-Open if shift is zero, otherwise change in relation
+    to close price shift bars before; column named as in
+    marketools.analysis.price_change.
+    """
+    close = _polars().col('Close')
+    reference = close.shift(shift).over('Ticker') if shift else pl.col('Open')
+    output = close - reference
+    name = f'({shift}d)' if shift else '(daily)'
+    if relative:
+        output = output / reference
+        if percent:
+            output = output * 100
+        name = ('%Change ' if percent else 'Relative change ') + name
+    else:
+        name = 'Change ' + name
+    return output.alias(name)
+
+
+def mean_volume(window: int = 90):
+    """Mean volume over window sessions, column 'VolumeMean{window}'."""
+    return _polars().col('Volume').rolling_mean(window).over('Ticker').alias(f'VolumeMean{window}')
+
+
+def crossed(column: str, level: float, direction: str = 'rise'):
+    """
+    True on bars on which indicator column crossed level, as in
+    rsi_cross_signals; column '{column} crossed {level}'.
+    """
+    if direction not in ('rise', 'fall'):
+        raise ValueError('wrong value for direction, must be "rise" or "fall"')
+    values = _polars().col(column)
+    previous = values.shift(1)
+    if 'rise' == direction:
+        output = (previous < level) & (values >= level)
+    else:
+        output = (previous > level) & (values <= level)
+    return output.fill_null(False).over('Ticker').alias(f'{column} crossed {level}')
+
+
+def last_bar(frame):
+    """Returns the most recent bar of every ticker."""
+    return frame.group_by('Ticker', maintain_order=True).last()
+
+
+def to_pandas(frame) -> pd.DataFrame:
+    """Converts Polars DataFrame (or collects LazyFrame) to pandas DataFrame, without pyarrow."""
+    if isinstance(frame, _polars().LazyFrame):
+        frame = frame.collect()
+    output = dict()
+    for name, dtype in frame.schema.items():
+        series = frame.get_column(name)
+        if dtype == pl.Date:
+            output[name] = pd.to_datetime(series.cast(pl.String).to_list())
+        elif dtype.is_numeric() or dtype == pl.Boolean:
+            output[name] = series.to_numpy()
+        else:
+            output[name] = np.array(series.cast(pl.String).to_list(), dtype=object)
+    return pd.DataFrame(output)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from marketools.stqscraper.stockquotes import StockQuotes
+from marketools.profiling import tag
+
+
+class Condition:
+    """
+    Condition evaluated on the most recent bar of an indicator calculated
+    with a function from marketools.analysis.
+
+    Attributes
+    ----------
+    indicator : callable
+        analysis function taking OHLC DataFrame as the first argument; it
+        must have attribute lookback - function returning number of recent
+        bars needed to calculate the last value for given parameters
+    params : dict
+        keyword arguments passed to the indicator
+    column : str
+        column of indicator output to use, if indicator returns DataFrame
+    """
+
+    bars = 1  # number of the most recent indicator values used by condition
+
+    def __init__(self, indicator, params: dict = None, column: str = None):
+        if not hasattr(indicator, 'lookback'):
+            raise ValueError(f'{indicator.__name__} does not report its lookback')
+        self.indicator = indicator
+        self.params = dict(params or {})
+        self.column = column
+
+    @property
+    def lookback(self) -> int:
+        """Returns number of recent OHLC bars needed to evaluate condition."""
+        return self.indicator.lookback(**self.params) + self.bars - 1
+
+    def values(self, ohlc: pd.DataFrame):
+        output = self.indicator(ohlc, **self.params)
+        return output if self.column is None else output[self.column]
+
+    def level(self, ohlc: pd.DataFrame, level):
+        """Returns level - number, or column of indicator output."""
+        if isinstance(level, str):
+            return self.indicator(ohlc, **self.params)[level]
+        return level
+
+    def __call__(self, ohlc: pd.DataFrame) -> bool:
+        raise NotImplementedError
+
+
+class Above(Condition):
+    """True if the last indicator value is above given level (number or
+    name of other column of indicator output)."""
+
+    def __init__(self, indicator, level, params: dict = None, column: str = None):
+        super().__init__(indicator, params, column)
+        self.threshold = level
+
+    def __call__(self, ohlc):
+        values = self.values(ohlc)
+        level = self.level(ohlc, self.threshold)
+        return bool((values > level).iloc[-1])
+
+
+class Below(Above):
+    """True if the last indicator value is below given level (number or
+    name of other column of indicator output)."""
+
+    def __call__(self, ohlc):
+        values = self.values(ohlc)
+        level = self.level(ohlc, self.threshold)
+        return bool((values < level).iloc[-1])
+
+
+class Crosses(Above):
+    """
+    True if indicator crossed given level (number or name of other column of
+    indicator output) on the last bar. For 'rise' the indicator must be below
+    level on the previous bar and not below it on the last bar ('fall' - the
+    other way round), as in rsi_cross_signals.
+    """
+
+    bars = 2
+
+    def __init__(self, indicator, level, direction: str = 'rise',
+                 params: dict = None, column: str = None):
+        if direction not in ('rise', 'fall'):
+            raise ValueError('wrong value for direction, must be "rise" or "fall"')
+        super().__init__(indicator, level, params, column)
+        self.direction = direction
+
+    def __call__(self, ohlc):
+        values = self.values(ohlc)
+        level = self.level(ohlc, self.threshold)
+        diff = (values - level).iloc[-2:]
+        if len(diff) < 2:
+            return False
+        if 'rise' == self.direction:
+            return bool(diff.iloc[0] < 0 <= diff.iloc[1])
+        return bool(diff.iloc[0] > 0 >= diff.iloc[1])
+
+
+class Scanner:
+    """
+    Scanner evaluating set of conditions over universe of tickers. For every
+    ticker only the most recent bars needed by the conditions are loaded and
+    processed.
+
+    Attributes
+    ----------
+    conditions : list
+        list of conditions (Above, Below, Crosses)
+    require : str
+        'all' - all conditions must be met (default), 'any' - at least one
+    interval : str
+        interval of OHLC data
+    """
+
+    def __init__(self, conditions, require: str = 'all', interval: str = 'd'):
+        if require not in ('all', 'any'):
+            raise ValueError('wrong value for require, must be "all" or "any"')
+        self.conditions = list(conditions)
+        self.require = require
+        self.interval = interval
+
+    @property
+    def lookback(self) -> int:
+        """Returns number of recent OHLC bars needed by the conditions."""
+        return max(c.lookback for c in self.conditions)
+
+    def evaluate(self, ohlc: pd.DataFrame) -> bool:
+        """Returns True if conditions are met on the last bar of OHLC data."""
+        if ohlc is None or ohlc.empty:
+            return False
+        ohlc = ohlc.tail(self.lookback)
+        results = (condition(ohlc) for condition in self.conditions)
+        return all(results) if 'all' == self.require else any(results)
+
+    def load(self, ticker: str, end=None) -> pd.DataFrame:
+        """Returns the most recent OHLC bars needed by the conditions."""
+        return StockQuotes(ticker).ohlc(interval=self.interval, end=end,
+                                        tail=self.lookback)
+
+    def scan(self, tickers, end=None, workers: int = 8) -> list:
+        """
+        Returns list of tickers for which conditions are met.
+
+        Parameters
+        ----------
+        tickers : iterable
+            tickers to scan
+        end : date, str or None
+            date of the bar the conditions are evaluated for, the most recent
+            bar if None
+        workers : int
+            number of worker threads
+
+        Returns
+        -------
+        list
+        """
+        tickers = list(tickers)
+
+        def check(ticker):
+            with tag(ticker):
+                return self.evaluate(self.load(ticker, end=end))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            matches = list(executor.map(check, tickers))
+
+        return [t for t, m in zip(tickers, matches) if m]
@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+from marketools.stqscraper.stockquotes import StockQuotes
+from marketools.analysis import kernels
+
+
+def load_prices(tickers, start=None, end=None, interval: str = 'd') -> pd.DataFrame:
+    """
+    Returns DataFrame with close prices of given tickers (one column per
+    ticker), limited to dates with prices for all tickers.
+    """
+    closes = {t: StockQuotes(t).ohlc(interval=interval, start=start, end=end)['Close']
+              for t in tickers}
+    return pd.DataFrame(closes).dropna()
+
+
+def bootstrap_returns(returns, n_paths: int, horizon: int, block: int = 1,
+                      chunk_paths: int = None, rng=None):
+    """
+    Generates bootstrapped gross returns (1 + return) in chunks of paths.
+    Whole rows (dates) of historical returns are resampled, so correlation
+    between tickers is kept; with block > 1 consecutive dates are resampled
+    in blocks (moving block bootstrap), which keeps also short-term
+    autocorrelation.
+
+    Parameters
+    ----------
+    returns : numpy.ndarray or pandas.DataFrame
+        historical simple returns, shape (dates, tickers)
+    n_paths : int
+        number of paths
+    horizon : int
+        number of simulated dates
+    block : int
+        length of resampled blocks
+    chunk_paths : int
+        number of paths in one chunk (all paths if None)
+    rng : numpy.random.Generator
+        random generator, new one if None
+
+    Yields
+    ------
+    numpy.ndarray
+        gross returns, shape (paths in chunk, horizon, tickers)
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.ndim != 2:
+        raise ValueError('returns must have shape (dates, tickers)')
+    if not 1 <= block <= len(returns):
+        raise ValueError('block must be between 1 and number of dates')
+    rng = rng or np.random.default_rng()
+    chunk_paths = chunk_paths or n_paths
+    blocks = -(-horizon // block)
+    offsets = np.arange(block)
+
+    for first in range(0, n_paths, chunk_paths):
+        paths = min(chunk_paths, n_paths - first)
+        starts = rng.integers(0, len(returns) - block + 1, (paths, blocks))
+        dates = (starts[..., None] + offsets).reshape(paths, -1)[:, :horizon]
+        yield 1 + returns[dates]
+
+
+def investment_value(total_value, money, max_positions: int, min_value: float):
+    """
+    Vectorized calculate_investment_value: value of a new position for
+    arrays of wallet total values and money.
+    """
+    total_value, money = np.asarray(total_value), np.asarray(money)
+    output = np.minimum(np.maximum(total_value / max_positions, min_value), money)
+    return np.where(money > min_value, output, 0.0)
+
+
+class SimulationResult:
+    """
+    Result of Monte Carlo simulation of a wallet.
+
+    Attributes
+    ----------
+    initial_value : float
+        total value of the wallet at the start
+    terminal_values : numpy.ndarray
+        value of the wallet at the end of every path, after selling all
+        positions (sale commission included)
+    max_drawdowns : numpy.ndarray
+        maximal drawdown of wallet value on every path (negative fraction)
+    """
+
+    def __init__(self, initial_value: float, terminal_values, max_drawdowns):
+        self.initial_value = initial_value
+        self.terminal_values = terminal_values
+        self.max_drawdowns = max_drawdowns
+
+    def __len__(self):
+        return len(self.terminal_values)
+
+    @property
+    def returns(self):
+        """Returns total return of every path (fraction)."""
+        return self.terminal_values / self.initial_value - 1
+
+    @property
+    def probability_of_loss(self) -> float:
+        return float(np.mean(self.terminal_values < self.initial_value))
+
+    def summary(self, percentiles=(5, 25, 50, 75, 95)) -> pd.DataFrame:
+        """
+        Returns DataFrame with mean and percentiles of distributions of
+        terminal value, total return and maximal drawdown.
+        """
+        data = {'Terminal value': self.terminal_values,
+                'Return': self.returns,
+                'Max drawdown': self.max_drawdowns}
+        output = pd.DataFrame({name: [np.mean(values)] + list(np.percentile(values, percentiles))
+                               for name, values in data.items()},
+                              index=['Mean'] + [f'{p}%' for p in percentiles]).T
+        return output
+
+
+def _fees(wallet, trade_values):
+    """Commission for array of trade values, zero where there is no trade."""
+    return np.where(trade_values > 0, wallet(trade_values), 0.0)
+
+
+def _rebalance(wallet, volume, money, prices, max_positions, min_value):
+    """
+    Trades every path towards equal positions of the first max_positions
+    tickers, sized as in calculate_investment_value. Trades smaller than
+    minimal recommended investment are skipped. Arrays are updated in place.
+    """
+    total_value = money + np.einsum('pt,pt->p', volume, prices)
+    target = np.zeros_like(volume)
+    target[:, :max_positions] = np.floor(
+        investment_value(total_value, total_value, max_positions, min_value)[:, None]
+        / prices[:, :max_positions])
+    change = target - volume
+    change[np.abs(change) * prices < min_value] = 0
+
+    # sales first, then purchases in order of tickers, within available money
+    sold = np.maximum(-change, 0) * prices
+    money += sold.sum(axis=1) - _fees(wallet, sold).sum(axis=1)
+    volume -= np.maximum(-change, 0)
+
+    for i in range(max_positions):
+        price = prices[:, i]
+        wanted = np.maximum(change[:, i], 0)
+        value = np.where(money > min_value, np.minimum(wanted * price, money), 0.0)
+        bought = np.floor((value - _fees(wallet, value)) / price)
+        cost = bought * price
+        fee = _fees(wallet, cost)
+        too_much = cost + fee > money
+        bought[too_much] = np.maximum(bought[too_much] - 1, 0)  # fee tier changed
+        cost = bought * price
+        money -= cost + _fees(wallet, cost)
+        volume[:, i] += bought
+
+
+def simulate_wallet(wallet, tickers, horizon: int = 252, n_paths: int = 10000,
+                    max_positions: int = None, rebalance: int = None,
+                    prices: pd.DataFrame = None, block: int = 1,
+                    seed=None, max_bytes: int = 64 * 2**20) -> SimulationResult:
+    """
+    Simulates wallet on bootstrapped return paths (Monte Carlo). Positions
+    of given tickers (after positions already owned in the wallet) are
+    opened at the start with size from calculate_investment_value, and
+    optionally rebalanced every rebalance dates; wallet commission is
+    charged on every trade. All paths of a chunk are processed at once,
+    chunks are limited to max_bytes of memory.
+
+    Parameters
+    ----------
+    wallet : Wallet
+        wallet with money, owned stocks and commission model
+    tickers : list
+        tickers to invest in
+    horizon : int
+        number of simulated dates
+    n_paths : int
+        number of paths
+    max_positions : int
+        maximal number of positions, all tickers if None
+    rebalance : int
+        rebalance period in dates, buy and hold if None
+    prices : pandas.DataFrame
+        historical close prices (column per ticker), loaded with
+        StockQuotes if None; the last row gives the starting prices
+    block : int
+        length of bootstrapped blocks of dates
+    seed : int
+        seed of random generator
+    max_bytes : int
+        memory budget for arrays of one chunk
+
+    Returns
+    -------
+    SimulationResult
+    """
+    owned = wallet.stocks.groupby('Name')['Volume'].sum()
+    universe = list(owned.index) + [t for t in tickers if t not in owned.index]
+    max_positions = min(max_positions or len(universe), len(universe))
+
+    if prices is None:
+        prices = load_prices(universe)
+    prices = prices[universe]
+    returns = prices.pct_change().dropna().to_numpy()
+    start_prices = prices.iloc[-1].to_numpy(dtype=np.float64)
+    start_volume = owned.reindex(universe, fill_value=0).to_numpy(dtype=np.float64)
+    initial_value = float(wallet.money + start_volume @ start_prices)
+    min_value = wallet.minimal_recommended_investment()
+
+    chunk_paths = max(1, max_bytes // (3 * 8 * horizon * len(universe)))
+    steps = list(range(0, horizon, rebalance or horizon))
+    rng = np.random.default_rng(seed)
+    terminal_values, max_drawdowns = list(), list()
+
+    for gross in bootstrap_returns(returns, n_paths, horizon, block, chunk_paths, rng):
+        paths = len(gross)
+        path_prices = start_prices * np.cumprod(gross, axis=1)  # (paths, horizon, tickers)
+        volume = np.tile(start_volume, (paths, 1))
+        money = np.full(paths, float(wallet.money))
+        values = np.empty((paths, horizon + 1))
+        values[:, 0] = initial_value
+
+        for first, last in zip(steps, steps[1:] + [horizon]):
+            trade_prices = start_prices[None, :] if first == 0 else path_prices[:, first - 1]
+            _rebalance(wallet, volume, money, np.broadcast_to(trade_prices, volume.shape).copy(),
+                       max_positions, min_value)
+            values[:, first + 1:last + 1] = money[:, None] \
+                + np.einsum('pht,pt->ph', path_prices[:, first:last], volume)
+
+        final = volume * path_prices[:, -1]
+        terminal_values.append(money + final.sum(axis=1) - _fees(wallet, final).sum(axis=1))
+        max_drawdowns.append(kernels.max_drawdown(values)[:, -1])
+
+    return SimulationResult(initial_value, np.concatenate(terminal_values),
+                            np.concatenate(max_drawdowns))
+
+
+if __name__ == '__main__':
+    pass
@@ -1,9 +1,14 @@
 from .stqscraper.fundamentals import Fundamentals
-from .stqscraper.stockquotes import StockQuotes
+from .stqscraper.stockquotes import StockQuotes, slice_ohlc
+from .stqscraper.intraday import INTRADAY_INTERVALS
 from .stqscraper.scrapers import scrap_summary_table
-from .stqscraper import get_storage_dir, get_storage_status
+from .stqscraper import get_storage_dir, get_storage_status, get_storage_backend
+from .stqscraper.locking import atomic_open, storage_lock
 from .analysis import heikinashi
+from .analysis.prefixsum import PrefixSumIndex
+from .profiling import profiled
 from datetime import datetime, timedelta
+from io import BytesIO
 import pandas as pd
 import numpy as np
 import os
@@ -20,32 +25,46 @@ class Stock:
         Polish stocks, e.g, 'AAPL.US'
     interval : str
         single letter defining the interval for OHLC data:
-        d - day (default), w - weekly, m - monthly, q - quarterly, y - yearly
+        d - day (default), w - weekly, m - monthly, q - quarterly, y - yearly;
+        or intraday interval in minutes: '5', '10', '15', '30', '60'
+    start : date, str or None
+        first date of OHLC data (inclusively), from the beginning if None
+    end : date, str or None
+        last date of OHLC data (inclusively), to the most recent if None
+    storage : StorageBackend or None
+        read-only storage, e.g., Snapshot - data are read only from it (never
+        downloaded or updated); the current storage if None
     _ohlc : pandas.DataFrame
         DataFrame with OHLC prices (open-high-low-close), and volume
     _fundamentals : dict
         dictionary with available fundamental information
     """
 
-    def __init__(self, ticker: str, interval: str = 'd'):
+    def __init__(self, ticker: str, interval: str = 'd', start=None, end=None,
+                 storage=None):
         self.ticker = ticker
         self.interval = interval
-        self._ohlc = StockQuotes(ticker)
-        self._fundamentals = Fundamentals(ticker)
+        self.start = start
+        self.end = end
+        self.storage = storage
+        self._ohlc = StockQuotes(ticker, storage=storage)
+        self._fundamentals = Fundamentals(ticker, storage=storage)
 
     @property
     def ohlc(self):
         """
         Returns DataFrame with OHLC prices (open-high-low-close), and volume.
         """
-        return self._ohlc.ohlc(interval=self.interval)
+        return self._ohlc.ohlc(interval=self.interval,
+                               start=self.start, end=self.end)
 
     @property
     def last_ohlc(self):
         """
         Returns the most recent OHLC prices (open-high-low-close), and volume.
         """
-        return self.ohlc.iloc[-1]
+        return self._ohlc.ohlc(interval=self.interval, start=self.start,
+                               end=self.end, tail=1).iloc[-1]
 
     @property
     def last(self):
@@ -95,6 +114,7 @@ class Stock:
         link = f'https://stooq.pl/q/a2/?s={self.ticker}'
         return link
 
+    @profiled
     def mean_volume(self, window: int):
         """
         Returns mean volume over given number of the most recent sessions.
@@ -109,45 +129,110 @@ class Stock:
         -------
         float
         """
-        volume = self.ohlc.tail(window)['Volume']
+        volume = self._ohlc.ohlc(interval=self.interval, start=self.start,
+                                 end=self.end, tail=window)['Volume']
         output = volume.mean()
         return output
 
     @property
+    @profiled
     def heikinashi(self):
-        # read from file
-        file_path = os.path.join(get_storage_dir(),
-                                 f'{self.ticker}_heikinashi_{self.interval}.csv')
+        """
+        Returns DataFrame with Heikin-Ashi candles. With data storage, candles
+        of the full daily (weekly, ...) history are stored and extended only
+        with new sessions; intraday candles are not stored.
+        """
+        if (not get_storage_status() or self.storage is not None
+                or self.interval in INTRADAY_INTERVALS):
+            return heikinashi(self.ohlc)
+        with storage_lock(self.ticker, self.interval, 'heikinashi'):
+            return slice_ohlc(self._stored_heikinashi(), self.start, self.end)
+
+    def _stored_heikinashi(self):
+        # stored candles cover the full history, regardless of start and end
+        ohlc = self._ohlc.ohlc(interval=self.interval)
+
+        # read from storage
+        key = f'{self.ticker}_heikinashi_{self.interval}.csv'
+        backend = get_storage_backend()
         use_storage = get_storage_status()
+        content = backend.read(key) if use_storage else None
 
-        if use_storage and os.path.exists(file_path):
+        if content is not None:
             # read csv
-            output = pd.read_csv(file_path,
+            output = pd.read_csv(BytesIO(content),
                                  index_col='Date',
                                  parse_dates=['Date'],
                                  date_parser=lambda x: datetime.strptime(x, '%Y-%m-%d'))
             output = output.astype(np.float64)
 
             # check is update needed
-            last_ohlc_date = self.ohlc.index[-1]
+            last_ohlc_date = ohlc.index[-1]
             last_ha_date = output.index[-1]
 
             if last_ohlc_date > last_ha_date:
                 first_open = (output.loc[last_ha_date, 'Open']
                               + output.loc[last_ha_date, 'Close']) / 2
-                new_ha = heikinashi(self.ohlc[last_ha_date+timedelta(days=1):],
+                new_ha = heikinashi(ohlc[ohlc.index > last_ha_date],
                                     first_open=first_open)
                 output = pd.concat([output, new_ha])
-                output.to_csv(file_path)
+                backend.write(key, output.to_csv().encode())
         else:
             # calculate Heikin-Ashi
-            output = heikinashi(self.ohlc)
+            output = heikinashi(ohlc)
 
             if use_storage:
-                output.to_csv(file_path)
+                backend.write(key, output.to_csv().encode())
 
         return output
 
+    @property
+    def prefix_index(self):
+        """
+        Returns PrefixSumIndex with cumulative sums of OHLCV columns, for O(1)
+        sums and means over any window. With data storage, the index is
+        stored next to the OHLC data and extended only with new sessions.
+        """
+        if not get_storage_status() or self.storage is not None:
+            return PrefixSumIndex.from_ohlc(self._ohlc.ohlc(interval=self.interval))
+        with storage_lock(self.ticker, self.interval, 'cumsum'):
+            return self._stored_prefix_index()
+
+    def _stored_prefix_index(self):
+        file_path = os.path.join(get_storage_dir(),
+                                 f'{self.ticker}_cumsum_{self.interval}.npz')
+        use_storage = get_storage_status()
+
+        if use_storage and os.path.exists(file_path):
+            output = PrefixSumIndex.load(file_path)
+            last_date = output.last_date
+
+            # history changed (e.g. adjusted for split) - rebuild index
+            last_row = pd.DataFrame()
+            if last_date is not None:
+                last_row = self._ohlc.ohlc(interval=self.interval, start=last_date, end=last_date)
+            if last_row.empty or not all(np.isclose(output.last_values()[c], np.nan_to_num(last_row[c].iloc[-1]))
+                                         for c in output.columns):
+                output = PrefixSumIndex.from_ohlc(self._ohlc.ohlc(interval=self.interval))
+                self._save_prefix_index(output, file_path)
+            else:
+                new_ohlc = self._ohlc.ohlc(interval=self.interval,
+                                           start=last_date + timedelta(days=1))
+                if output.extend(new_ohlc):
+                    self._save_prefix_index(output, file_path)
+        else:
+            output = PrefixSumIndex.from_ohlc(self._ohlc.ohlc(interval=self.interval))
+
+            if use_storage:
+                self._save_prefix_index(output, file_path)
+
+        return output
+
+    @staticmethod
+    def _save_prefix_index(index, file_path):
+        with atomic_open(file_path, 'wb') as f:
+            index.save(f)
+
 
 if __name__ == '__main__':
     pass
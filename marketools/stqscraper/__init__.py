@@ -1,8 +1,10 @@
 import os
+from .cache import ohlc_cache
 
 
 STORE_DWL_DATA = False
 DWL_DATA_DIR = os.path.join(os.path.expanduser('~'), '.marketools_data')
+STORAGE_BACKEND = None  # files in DWL_DATA_DIR if None
 
 
 def store_data():
@@ -24,3 +26,34 @@ def get_storage_status():
 def get_storage_dir():
     """Returns storage directory."""
     return DWL_DATA_DIR
+
+
+def set_storage_backend(backend):
+    """
+    Sets backend where downloaded data are stored (see stqscraper.backends),
+    and enables data storage. With None, data are stored in files in the
+    storage directory (default).
+    """
+    global STORAGE_BACKEND
+    STORAGE_BACKEND = backend
+    if backend is not None:
+        store_data()
+
+
+def get_storage_backend():
+    """Returns backend where downloaded data are stored."""
+    from .backends import LocalBackend  # imported here to avoid circular import
+    return STORAGE_BACKEND if STORAGE_BACKEND is not None else LocalBackend()
+
+
+def set_cache_limit(max_bytes: int):
+    """
+    Sets memory budget (in bytes) for OHLC data cached in memory and shared
+    by all Stock and StockQuotes instances. Zero disables caching.
+    """
+    ohlc_cache.max_bytes = max_bytes
+
+
+def clear_cache():
+    """Removes all OHLC data cached in memory."""
+    ohlc_cache.clear()
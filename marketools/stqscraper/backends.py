@@ -0,0 +1,385 @@
+"""
+Storage backends - where stored data (OHLC CSV files, fundamentals,
+Heikin-Ashi cache) are kept. Data are addressed by key, which is the file
+name used by the local storage, e.g., 'PKN_ohcl_d.csv'.
+
+The manifest, hit budget and lock files are always kept in the local
+storage directory (get_storage_dir); with remote backend, the local
+directory is a cache of the shared store.
+"""
+from . import get_storage_dir
+from .locking import atomic_write
+from ..profiling import add_bytes
+from contextlib import contextmanager
+from datetime import datetime
+import os
+import sqlite3
+
+
+class StorageBackend:
+    """
+    Interface of storage backend. Subclasses implement read, write,
+    modified, delete and keys; local_path and sync may be overridden by
+    backends which keep local copy of the data.
+    """
+
+    def read(self, key: str):
+        """Returns stored content (bytes), None if there is no such key."""
+        raise NotImplementedError
+
+    def write(self, key: str, content: bytes) -> None:
+        """Stores content under key, replacing previous content atomically."""
+        raise NotImplementedError
+
+    def modified(self, key: str):
+        """Returns time of the last write (POSIX timestamp), None if there is no such key."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Removes key, if exists."""
+        raise NotImplementedError
+
+    def keys(self, prefix: str = '', recursive: bool = True) -> list:
+        """
+        Returns sorted list of stored keys starting with prefix. Keys are
+        paths with '/' separator; without recursive, only keys without '/'
+        after the prefix are listed (e.g. top-level keys for empty prefix,
+        not intraday partitions or snapshot chunks).
+        """
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        return self.modified(key) is not None
+
+    def local_path(self, key: str):
+        """
+        Returns path to local file with content of key (for reading selected
+        rows without reading the whole content), None if the content is not
+        available as local file.
+        """
+        return None
+
+    def sync(self, key: str) -> bool:
+        """
+        Brings newer content of key from shared store, if backend has one.
+        Returns True if content was updated.
+        """
+        return False
+
+    def description(self) -> tuple:
+        """
+        Returns picklable description of the backend - class and arguments
+        of the constructor - to recreate it in other process (see
+        from_description), as the backend itself may hold objects which
+        cannot be pickled, e.g., client of object store.
+        """
+        raise NotImplementedError
+
+
+def _is_description(value) -> bool:
+    return (isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], type)
+            and issubclass(value[0], StorageBackend))
+
+
+def from_description(description):
+    """
+    Recreates backend from its description (see StorageBackend.description);
+    descriptions of nested backends (remote and local of CachedBackend) are
+    recreated as well. Returns None if description is None.
+    """
+    if description is None:
+        return None
+    backend_class, kwargs = description
+    kwargs = {k: from_description(v) if _is_description(v) else v for k, v in kwargs.items()}
+    return backend_class(**kwargs)
+
+
+class LocalBackend(StorageBackend):
+    """
+    Files in local directory; writes are atomic (temporary file + rename).
+
+    Attributes
+    ----------
+    directory : str or None
+        storage directory, current storage directory (get_storage_dir) if
+        None
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory or get_storage_dir(), key)
+
+    def read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        add_bytes(len(content))
+        return content
+
+    def write(self, key, content):
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        atomic_write(self._path(key), content)
+
+    def modified(self, key):
+        try:
+            return os.path.getmtime(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self, prefix='', recursive=True):
+        """Hidden files and directories are skipped."""
+        directory = self.directory or get_storage_dir()
+        output = list()
+        for root, dirs, files in os.walk(os.path.join(directory, prefix.rpartition('/')[0])):
+            dirs[:] = [d for d in dirs if not d.startswith('.')] if recursive else []
+            relative = os.path.relpath(root, directory).replace(os.sep, '/')
+            for name in files:
+                key = name if relative == '.' else f'{relative}/{name}'
+                if (key.startswith(prefix) and not name.startswith('.')
+                        and os.path.isfile(os.path.join(root, name))):
+                    output.append(key)
+        return sorted(output)
+
+    def local_path(self, key):
+        file_path = self._path(key)
+        return file_path if os.path.exists(file_path) else None
+
+    def description(self):
+        return LocalBackend, dict(directory=self.directory)
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY,
+    content BLOB NOT NULL,
+    modified REAL NOT NULL
+)
+'''
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Single SQLite database - one file instead of thousands of small files,
+    which can be placed on a shared (network) drive.
+
+    Attributes
+    ----------
+    file_path : str
+        path to SQLite database
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with self._connect() as connection:
+            connection.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.file_path, timeout=30)
+        try:
+            with connection:  # commits or rolls back the transaction
+                yield connection
+        finally:
+            connection.close()
+
+    def read(self, key):
+        with self._connect() as connection:
+            row = connection.execute('SELECT content FROM objects WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        add_bytes(len(row[0]))
+        return bytes(row[0])
+
+    def write(self, key, content):
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?)',
+                               (key, sqlite3.Binary(content), datetime.timestamp(datetime.now())))
+
+    def modified(self, key):
+        with self._connect() as connection:
+            row = connection.execute('SELECT modified FROM objects WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def delete(self, key):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM objects WHERE key = ?', (key,))
+
+    def keys(self, prefix='', recursive=True):
+        query = 'SELECT key FROM objects WHERE substr(key, 1, ?) = ?'
+        if not recursive:
+            query += " AND instr(substr(key, ? + 1), '/') = 0"
+        with self._connect() as connection:
+            rows = connection.execute(query + ' ORDER BY key',
+                                      (len(prefix), prefix) + (() if recursive else (len(prefix),))).fetchall()
+        return [row[0] for row in rows]
+
+    def description(self):
+        return SQLiteBackend, dict(file_path=self.file_path)
+
+
+def _is_missing(error) -> bool:
+    """Returns True if object store error means that there is no such key."""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return str(code) in ('404', 'NoSuchKey', 'NotFound')
+
+
+class S3Backend(StorageBackend):
+    """
+    S3-compatible object store (AWS S3, MinIO, Ceph), shared by many
+    machines. Any client with boto3 S3 client interface can be used, e.g.,
+    boto3.client('s3', endpoint_url='http://minio:9000').
+
+    The client cannot be sent to other processes (e.g. workers of
+    distributed computation); there the backend is recreated with
+    client_factory, e.g., functools.partial(boto3.client, 's3',
+    endpoint_url='http://minio:9000').
+
+    Attributes
+    ----------
+    client : object
+        S3 client (get_object, put_object, head_object, delete_object,
+        list_objects_v2), created with client_factory if None
+    bucket : str
+        name of the bucket
+    prefix : str
+        prefix of object keys, e.g., 'marketools/'
+    client_factory : callable or None
+        picklable function without arguments returning S3 client
+    """
+
+    def __init__(self, client, bucket: str, prefix: str = '', client_factory=None):
+        if client is None and client_factory is None:
+            raise ValueError('S3Backend requires client or client_factory')
+        self.client = client if client is not None else client_factory()
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client_factory = client_factory
+
+    def read(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as e:
+            if _is_missing(e):
+                return None
+            raise
+        content = response['Body'].read()
+        add_bytes(len(content))
+        return content
+
+    def write(self, key, content):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=content)
+
+    def modified(self, key):
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as e:
+            if _is_missing(e):
+                return None
+            raise
+        return response['LastModified'].timestamp()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def keys(self, prefix='', recursive=True):
+        output = list()
+        kwargs = dict(Bucket=self.bucket, Prefix=self.prefix + prefix)
+        if not recursive:
+            kwargs['Delimiter'] = '/'  # deeper keys are grouped into CommonPrefixes
+        while True:
+            response = self.client.list_objects_v2(**kwargs)
+            output.extend(item['Key'][len(self.prefix):] for item in response.get('Contents', []))
+            if not response.get('IsTruncated'):
+                return sorted(output)
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+    def description(self):
+        if self.client_factory is None:
+            raise ValueError('S3Backend without client_factory cannot be recreated in other process')
+        return S3Backend, dict(client=None, bucket=self.bucket, prefix=self.prefix,
+                               client_factory=self.client_factory)
+
+
+class CachedBackend(StorageBackend):
+    """
+    Remote (shared) backend with local read-through cache. Content is read
+    from the local copy and fetched from remote backend only if there is no
+    local copy; writes go to both backends. Stale local copies are brought
+    up to date with sync, e.g., before data are downloaded from Stooq, so
+    data downloaded by one machine are used by all the others.
+
+    Attributes
+    ----------
+    remote : StorageBackend
+        shared backend
+    local : StorageBackend
+        local cache, LocalBackend in storage directory if None
+    """
+
+    def __init__(self, remote: StorageBackend, local: StorageBackend = None):
+        self.remote = remote
+        self.local = local or LocalBackend()
+
+    def _fetch(self, key) -> bool:
+        content = self.remote.read(key)
+        if content is None:
+            return False
+        self.local.write(key, content)
+        return True
+
+    def read(self, key):
+        content = self.local.read(key)
+        if content is None and self._fetch(key):
+            content = self.local.read(key)
+        return content
+
+    def write(self, key, content):
+        self.remote.write(key, content)
+        self.local.write(key, content)
+
+    def modified(self, key):
+        """Returns time of the last write to the shared store (local copy if not there)."""
+        output = self.remote.modified(key)
+        return self.local.modified(key) if output is None else output
+
+    def delete(self, key):
+        self.remote.delete(key)
+        self.local.delete(key)
+
+    def keys(self, prefix='', recursive=True):
+        return sorted(set(self.remote.keys(prefix, recursive)) | set(self.local.keys(prefix, recursive)))
+
+    def exists(self, key):
+        return self.local.exists(key) or self.remote.exists(key)
+
+    def local_path(self, key):
+        output = self.local.local_path(key)
+        if output is None and self._fetch(key):
+            output = self.local.local_path(key)
+        return output
+
+    def sync(self, key):
+        remote_time = self.remote.modified(key)
+        if remote_time is None:
+            return False
+        local_time = self.local.modified(key)
+        if local_time is not None and local_time >= remote_time:
+            return False
+        return self._fetch(key)
+
+    def description(self):
+        return CachedBackend, dict(remote=self.remote.description(), local=self.local.description())
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,163 @@
+from . import get_storage_dir, get_storage_backend
+from .backends import LocalBackend
+from .cache import ohlc_cache
+from .intraday import IntradayStore, INTRADAY_INTERVALS
+from .stockquotes import ohlc_file_name
+from .manifest import get_manifest, checksum
+from .locking import storage_lock
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from io import BytesIO
+import argparse
+import os
+import zipfile
+import pandas as pd
+import numpy as np
+
+
+BULK_COLUMNS = {'<OPEN>': 'Open',
+                '<HIGH>': 'High',
+                '<LOW>': 'Low',
+                '<CLOSE>': 'Close',
+                '<VOL>': 'Volume'}
+
+_archive = None  # zip archive opened once in every worker process
+
+
+def parse_stooq_bulk_file(content: bytes) -> tuple:
+    """
+    Parses file from Stooq bulk archive (columns <TICKER>, <PER>, <DATE>,
+    <TIME>, <OPEN>, <HIGH>, <LOW>, <CLOSE>, <VOL>, <OPENINT>). Returns
+    ticker and dictionary with interval as key and DataFrame with OHLC data
+    as value. Dates are parsed vectorized, with fixed format. Intraday data
+    (<PER> 5, 10, 15, 30 or 60) are indexed by date and time ('Datetime').
+
+    Parameters
+    ----------
+    content : bytes
+        content of the file
+
+    Returns
+    -------
+    tuple
+        (ticker, dict)
+    """
+    raw = pd.read_csv(BytesIO(content),
+                      dtype={'<TICKER>': str, '<PER>': str, '<DATE>': str, '<TIME>': str})
+    if raw.empty:
+        return None, dict()
+
+    ticker = raw['<TICKER>'].iloc[0]
+
+    output = dict()
+    for period, data in raw.groupby('<PER>', sort=False):
+        interval = period.lower()
+        ohlc = data[list(BULK_COLUMNS)].rename(columns=BULK_COLUMNS)
+        if interval in INTRADAY_INTERVALS:
+            ohlc.index = pd.to_datetime(data['<DATE>'] + data['<TIME>'].str.zfill(6),
+                                        format='%Y%m%d%H%M%S')
+            ohlc.index.name = 'Datetime'
+        else:
+            ohlc.index = pd.to_datetime(data['<DATE>'], format='%Y%m%d')
+            ohlc.index.name = 'Date'
+        output[interval] = ohlc.astype(np.float64).sort_index()
+
+    return ticker, output
+
+
+def _open_archive(archive_path):
+    global _archive
+    _archive = zipfile.ZipFile(archive_path)
+
+
+def _ingest_member(member, storage_dir, backend_dir):
+    ticker, data = parse_stooq_bulk_file(_archive.read(member))
+    # storage backend is resolved in the worker, backends need not be picklable
+    backend = LocalBackend(backend_dir) if backend_dir is not None else get_storage_backend()
+    output = list()
+    for interval, ohlc in data.items():
+        with storage_lock(ticker, interval, 'ohlc', storage_dir=storage_dir):
+            if interval in INTRADAY_INTERVALS:
+                store = IntradayStore(ticker, interval, storage_dir=storage_dir)
+                store.append(ohlc)
+                output.append((ticker, interval, store.rows(), store.last_timestamp(), None))
+            else:
+                content = ohlc.to_csv().encode()
+                backend.write(ohlc_file_name(ticker, interval), content)
+                output.append((ticker, interval, len(ohlc), ohlc.index[-1], checksum(content)))
+    return output
+
+
+def ingest_stooq_archive(archive_path, workers: int = None,
+                         storage_dir: str = None) -> pd.DataFrame:
+    """
+    Ingests Stooq bulk archive (zip with CSV/TXT files) into marketools
+    storage. Member files are parsed in parallel processes; at most two
+    files per worker are in flight at once, so memory use does not depend
+    on the archive size. Daily (weekly, ...) data are written to the storage
+    backend, intraday data are appended to IntradayStore partitions.
+
+    Parameters
+    ----------
+    archive_path : str or os.path
+        path to zip archive
+    workers : int
+        number of worker processes (number of CPUs if None)
+    storage_dir : str or os.path
+        output directory, marketools storage (and its backend) if None
+
+    Returns
+    -------
+    pandas.DataFrame
+        DataFrame with columns 'Ticker', 'Interval', 'Rows' - one row for
+        every written file
+    """
+    backend_dir = storage_dir
+    storage_dir = storage_dir or get_storage_dir()
+    os.makedirs(storage_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [m.filename for m in archive.infolist()
+                   if not m.is_dir() and m.filename.lower().endswith(('.txt', '.csv'))]
+
+    written = list()
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_open_archive,
+                             initargs=(archive_path,)) as executor:
+        for member in members:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    written.extend(future.result())
+            pending.add(executor.submit(_ingest_member, member, storage_dir, backend_dir))
+        for future in wait(pending).done:
+            written.extend(future.result())
+
+    # manifest is updated in one transaction, by this process only
+    get_manifest(storage_dir).record_many(
+        [(ticker, interval, 'ohlc', last_date, rows, content_checksum, None)
+         for ticker, interval, rows, last_date, content_checksum in written])
+    for ticker, interval, *_ in written:
+        ohlc_cache.invalidate(ticker, interval)
+
+    return pd.DataFrame([w[:3] for w in written], columns=['Ticker', 'Interval', 'Rows'])
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Ingest Stooq bulk archive into marketools storage.')
+    parser.add_argument('archive', help='path to zip archive from Stooq')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--storage-dir', default=None,
+                        help='output directory (marketools storage by default)')
+    args = parser.parse_args(args)
+
+    output = ingest_stooq_archive(args.archive, workers=args.workers,
+                                  storage_dir=args.storage_dir)
+    print(f'{output["Ticker"].nunique()} tickers, {output["Rows"].sum()} rows ingested')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import time
+
+
+class OHLCCache:
+    """
+    Process-wide LRU cache for OHLC DataFrames, keyed by (ticker, interval).
+
+    The cache holds DataFrames up to the given memory budget; the least
+    recently used entries are evicted first. Loading is single-flight - when
+    many threads request the same key at once, only one of them runs the
+    loader and the others wait for its result.
+
+    Cached DataFrames are shared by all users of the cache, so they must not
+    be modified in place.
+
+    Attributes
+    ----------
+    max_bytes : int
+        memory budget in bytes
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self._entries = OrderedDict()  # key -> (DataFrame, size, load time)
+        self._loading = dict()  # key -> Future
+        self._lock = threading.Lock()
+        self._size = 0
+        self._max_bytes = max_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def size(self) -> int:
+        """Returns memory used by cached DataFrames, in bytes."""
+        return self._size
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        if value < 0:
+            raise ValueError('max_bytes has to be non-negative value')
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    def _evict(self):
+        while self._size > self._max_bytes and self._entries:
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._size -= size
+
+    def _store(self, key, data):
+        size = int(data.memory_usage(index=True, deep=True).sum())
+        if size > self._max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (data, size, time.monotonic())
+        self._size += size
+        self._evict()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+    def peek(self, ticker: str, interval: str, max_age: float = None):
+        """
+        Returns cached OHLC data for given ticker and interval, or None if
+        there are no (fresh enough) data in cache. Never loads data.
+        """
+        with self._lock:
+            entry = self._entries.get((ticker, interval))
+            if entry is None:
+                return None
+            if max_age is not None and time.monotonic() - entry[2] > max_age:
+                return None
+            self._entries.move_to_end((ticker, interval))
+            return entry[0]
+
+    def get(self, ticker: str, interval: str, loader, max_age: float = None):
+        """
+        Returns cached OHLC data for given ticker and interval. If there are
+        no data in cache (or data are older than max_age), calls loader and
+        caches its output. Empty DataFrames are returned, but not cached.
+
+        Parameters
+        ----------
+        ticker : str
+            ticker of a stock
+        interval : str
+            interval of OHLC data
+        loader : callable
+            function without arguments that returns pandas.DataFrame
+        max_age : float
+            maximal age of cached data in seconds, no limit if None
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        key = (ticker, interval)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if max_age is None or time.monotonic() - entry[2] <= max_age:
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                self._drop(key)
+
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            data = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if data is not None and not data.empty:
+                self._store(key, data)
+            del self._loading[key]
+        future.set_result(data)
+        return data
+
+    def invalidate(self, ticker: str, interval: str = None) -> None:
+        """
+        Removes data for given ticker from the cache (for all intervals if
+        interval is None).
+        """
+        with self._lock:
+            keys = [k for k in self._entries
+                    if k[0] == ticker and interval in (None, k[1])]
+            for k in keys:
+                self._drop(k)
+
+    def clear(self) -> None:
+        """Removes all data from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+ohlc_cache = OHLCCache()
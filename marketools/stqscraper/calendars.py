@@ -0,0 +1,283 @@
+"""
+Trading calendars of exchanges. Calendar knows sessions (trading days),
+holidays and early closes of exchange, and the hour (in time zone of the
+exchange) after which OHLC data of a session are available on Stooq.
+Naive times are taken as local time of the machine.
+
+Holidays and early closes are defined with rule functions - function taking
+year and returning list of dates. Sessions are precomputed into sorted
+table covering all years used so far, so session queries are binary
+searches.
+"""
+from datetime import date, datetime, timedelta
+from threading import Lock
+import numpy as np
+import pandas as pd
+
+
+# --- rule functions --------------------------------------------------------
+
+def easter_sunday(year: int) -> date:
+    """Returns date of Easter Sunday (Gregorian calendar)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def sunday_to_monday(day: date) -> date:
+    """Holiday falling on Sunday is observed on Monday."""
+    return day + timedelta(days=1) if 6 == day.weekday() else day
+
+
+def nearest_workday(day: date) -> date:
+    """Holiday falling on Saturday is observed on Friday, on Sunday - on Monday."""
+    if 5 == day.weekday():
+        return day - timedelta(days=1)
+    return sunday_to_monday(day)
+
+
+def fixed(month: int, day: int, observance=None, since: int = None, until: int = None):
+    """Rule for holiday on fixed day of year."""
+    def rule(year):
+        if (since and year < since) or (until and year > until):
+            return []
+        holiday = date(year, month, day)
+        return [observance(holiday) if observance else holiday]
+    return rule
+
+
+def easter(offset: int):
+    """Rule for holiday offset days from Easter Sunday (e.g., -2 - Good Friday)."""
+    def rule(year):
+        return [easter_sunday(year) + timedelta(days=offset)]
+    return rule
+
+
+def nth_weekday(month: int, weekday: int, n: int, since: int = None):
+    """Rule for n-th (-1 - last) weekday (0 - Monday) of month."""
+    def rule(year):
+        if since and year < since:
+            return []
+        if n > 0:
+            first = date(year, month, 1)
+            return [first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))]
+        last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+        return [last - timedelta(days=(last.weekday() - weekday) % 7)]
+    return rule
+
+
+def on_weekdays(rule, weekdays):
+    """Rule returning dates of other rule only if they fall on given weekdays."""
+    def filtered(year):
+        return [d for d in rule(year) if d.weekday() in weekdays]
+    return filtered
+
+
+def shifted(rule, days: int):
+    """Rule returning dates of other rule shifted by given number of days."""
+    def rule_shifted(year):
+        return [d + timedelta(days=days) for d in rule(year)]
+    return rule_shifted
+
+
+# --- calendar --------------------------------------------------------------
+
+class TradingCalendar:
+    """
+    Trading calendar of exchange.
+
+    Attributes
+    ----------
+    name : str
+        name of exchange
+    holiday_rules : list
+        rule functions returning holidays (days without session) in year
+    early_close_rules : list
+        rule functions returning days with shortened session in year
+    update_hour : int
+        hour (in timezone) after which data of a session are available
+    early_update_hour : int
+        as update_hour, for early close sessions (update_hour if None)
+    weekmask : str
+        weekdays with sessions, Monday first ('1111100' - Monday to Friday)
+    timezone : str
+        time zone of exchange (IANA name), in which sessions and update
+        hours are given
+    """
+
+    def __init__(self, name: str, holiday_rules=(), early_close_rules=(),
+                 update_hour: int = 20, early_update_hour: int = None,
+                 weekmask: str = '1111100', timezone: str = 'Europe/Warsaw'):
+        self.name = name
+        self.holiday_rules = list(holiday_rules)
+        self.early_close_rules = list(early_close_rules)
+        self.update_hour = update_hour
+        self.early_update_hour = update_hour if early_update_hour is None else early_update_hour
+        self.weekmask = weekmask
+        self.timezone = timezone
+        self._years = None  # (first, last) year covered by session table
+        self._sessions = np.array([], dtype='datetime64[D]')
+        self._early_closes = np.array([], dtype='datetime64[D]')
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f'TradingCalendar({self.name!r})'
+
+    def holidays(self, year: int) -> list:
+        """Returns sorted list of holidays (weekdays without session) in year."""
+        days = {d for rule in self.holiday_rules for d in rule(year)}
+        return sorted(d for d in days if d.year == year)
+
+    def _build(self, first: int, last: int):
+        holidays = [d for year in range(first, last + 1) for d in self.holidays(year)]
+        days = np.arange(np.datetime64(f'{first}-01-01'), np.datetime64(f'{last + 1}-01-01'))
+        sessions = days[np.is_busday(days, weekmask=self.weekmask,
+                                     holidays=np.array(holidays, dtype='datetime64[D]'))]
+        early = np.array([d for year in range(first, last + 1)
+                          for rule in self.early_close_rules for d in rule(year)],
+                         dtype='datetime64[D]')
+        early = np.unique(early[np.isin(early, sessions)])
+        return sessions, early
+
+    def _table(self, *years):
+        """Returns session table covering given years (with year before and after)."""
+        first, last = min(years) - 1, max(years) + 1
+        with self._lock:
+            if self._years is None or first < self._years[0] or last > self._years[1]:
+                if self._years is not None:
+                    first, last = min(first, self._years[0]), max(last, self._years[1])
+                self._sessions, self._early_closes = self._build(first, last)
+                self._years = (first, last)
+            return self._sessions, self._early_closes
+
+    @staticmethod
+    def _day(day):
+        return np.datetime64(day.date() if isinstance(day, datetime) else day, 'D')
+
+    def sessions(self, start, end) -> np.ndarray:
+        """Returns sessions between start and end (inclusively), datetime64[D]."""
+        start, end = self._day(start), self._day(end)
+        sessions, _ = self._table(start.astype(object).year, end.astype(object).year)
+        return sessions[np.searchsorted(sessions, start):np.searchsorted(sessions, end, side='right')]
+
+    def is_session(self, day) -> bool:
+        day = self._day(day)
+        sessions, _ = self._table(day.astype(object).year)
+        i = np.searchsorted(sessions, day)
+        return bool(i < len(sessions) and sessions[i] == day)
+
+    def is_early_close(self, day) -> bool:
+        day = self._day(day)
+        _, early = self._table(day.astype(object).year)
+        return bool(np.isin(day, early))
+
+    def previous_session(self, day) -> date:
+        """Returns the last session before given day."""
+        day = self._day(day)
+        sessions, _ = self._table(day.astype(object).year)
+        return sessions[np.searchsorted(sessions, day) - 1].astype(object)
+
+    def exchange_time(self, time_now: datetime = None) -> pd.Timestamp:
+        """
+        Returns given time (now if None) in time zone of the exchange; naive
+        time is taken as local time of the machine.
+        """
+        time_now = time_now or datetime.now()
+        if time_now.tzinfo is None:
+            time_now = time_now.astimezone()  # local time zone
+        return pd.Timestamp(time_now).tz_convert(self.timezone)
+
+    def publication_time(self, session, update_hour: int = None) -> pd.Timestamp:
+        """
+        Returns time (timezone-aware, in time zone of the exchange) after
+        which data of given session are available. update_hour overrides
+        hour of the calendar (also for early closes).
+        """
+        session = self._day(session).astype(object)
+        if update_hour is None:
+            update_hour = self.early_update_hour if self.is_early_close(session) else self.update_hour
+        return pd.Timestamp(session.year, session.month, session.day, update_hour).tz_localize(self.timezone)
+
+    def last_published_session(self, time_now: datetime = None, update_hour: int = None) -> date:
+        """
+        Returns the most recent session whose data are available at given
+        time (now if None), with the session day taken in time zone of the
+        exchange.
+        """
+        time_now = self.exchange_time(time_now)
+        today = time_now.date()
+        if self.is_session(today) and time_now >= self.publication_time(today, update_hour):
+            return today
+        return self.previous_session(today)
+
+
+# --- exchange calendars ----------------------------------------------------
+
+GPW = TradingCalendar('GPW', holiday_rules=[
+    fixed(1, 1),
+    fixed(1, 6, since=2011),
+    easter(-2),  # Good Friday
+    easter(1),  # Easter Monday
+    fixed(5, 1),
+    fixed(5, 3),
+    easter(60),  # Corpus Christi
+    fixed(8, 15),
+    fixed(11, 1),
+    fixed(11, 11),
+    fixed(12, 24),
+    fixed(12, 25),
+    fixed(12, 26),
+    fixed(12, 31),
+], update_hour=20)
+
+# NYSE closes at 16:00 ET (13:00 ET on early close days), data are available
+# on Stooq about an hour later
+NYSE = TradingCalendar('NYSE', holiday_rules=[
+    fixed(1, 1, sunday_to_monday),
+    nth_weekday(1, 0, 3, since=1998),  # Martin Luther King Jr. Day
+    nth_weekday(2, 0, 3),  # Washington's Birthday
+    easter(-2),  # Good Friday
+    nth_weekday(5, 0, -1),  # Memorial Day
+    fixed(6, 19, nearest_workday, since=2022),  # Juneteenth
+    fixed(7, 4, nearest_workday),  # Independence Day
+    nth_weekday(9, 0, 1),  # Labor Day
+    nth_weekday(11, 3, 4),  # Thanksgiving Day
+    fixed(12, 25, nearest_workday),
+], early_close_rules=[
+    on_weekdays(fixed(7, 3), (0, 1, 2, 3)),
+    shifted(nth_weekday(11, 3, 4), 1),  # day after Thanksgiving
+    on_weekdays(fixed(12, 24), (0, 1, 2, 3)),
+], update_hour=17, early_update_hour=14, timezone='America/New_York')
+
+WEEKDAYS = TradingCalendar('weekdays', update_hour=20)
+
+# ticker suffix -> calendar; tickers without suffix are GPW stocks
+CALENDARS = {'': GPW, '.US': NYSE}
+
+
+def register_calendar(suffix: str, calendar: TradingCalendar) -> None:
+    """Sets calendar for tickers with given suffix, e.g., '.UK'."""
+    CALENDARS[suffix.upper()] = calendar
+
+
+def get_calendar(ticker: str) -> TradingCalendar:
+    """
+    Returns calendar of exchange for given ticker, inferred from the ticker
+    suffix. Calendar with all weekdays as sessions is returned for unknown
+    suffixes.
+    """
+    ticker = ticker.upper()
+    suffix = ticker[ticker.rfind('.'):] if '.' in ticker else ''
+    return CALENDARS.get(suffix, WEEKDAYS)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,513 @@
+"""
+Local data daemon.
+
+The daemon is a long-running process which keeps OHLC data of a universe of
+tickers in memory, refreshes them on schedule (within the Stooq hit
+budget), and serves OHLC slices, fundamentals and indicators to other
+processes over a Unix socket. Messages are JSON objects prefixed with their
+length (4 bytes, big-endian). Large arrays are passed through shared memory
+blocks - the daemon creates the block and unlinks it when the client
+acknowledges that it copied the data, or after SHM_ACK_TIMEOUT.
+
+StockQuotes and Fundamentals read from the daemon transparently when it is
+running (socket exists in the storage directory); set
+StockQuotes.use_daemon = False to always read locally.
+"""
+from . import get_storage_dir, store_data, set_cache_limit
+from .manifest import get_manifest
+from contextlib import contextmanager
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:  # Python without shared memory support
+    shared_memory = None
+
+
+SOCKET_PATH = None  # path to daemon socket, daemon.sock in storage directory if None
+SHM_THRESHOLD = 64 * 1024  # arrays of at least this size (bytes) are sent through shared memory
+SHM_ACK_TIMEOUT = 30  # seconds the daemon waits for the client to copy data from shared memory
+RETRY_AFTER = 30  # seconds before next connection attempt, after daemon was not reachable
+CLIENT_TIMEOUT = 30  # seconds the client waits for the daemon, before it reads data locally
+
+_HEADER = struct.Struct('>I')
+_thread_state = threading.local()  # serving = True in daemon threads
+_created_blocks = set()  # names of shared memory blocks created by this process
+logger = logging.getLogger(__name__)
+
+
+class DaemonError(RuntimeError):
+    """Error raised by the daemon while handling request."""
+
+
+def get_socket_path() -> str:
+    return SOCKET_PATH or os.path.join(get_storage_dir(), 'daemon.sock')
+
+
+@contextmanager
+def _serving():
+    """Marks current thread as daemon thread - it reads data locally."""
+    previous = getattr(_thread_state, 'serving', False)
+    _thread_state.serving = True
+    try:
+        yield
+    finally:
+        _thread_state.serving = previous
+
+
+# --- protocol ----------------------------------------------------------------
+
+def _recv_exactly(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def send_message(sock, message: dict) -> None:
+    """Sends JSON message prefixed with its length."""
+    payload = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock) -> dict:
+    """Receives JSON message sent with send_message."""
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size))
+
+
+def pack_frame(data) -> dict:
+    """
+    Packs DataFrame or Series (with DatetimeIndex and float values) into
+    JSON-serializable dict. Arrays of SHM_THRESHOLD bytes or more are copied
+    to shared memory block, which must be released by the sender with
+    release_frame after the receiver unpacked it.
+    """
+    series = isinstance(data, pd.Series)
+    frame = data.to_frame() if series else data
+    index = frame.index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    values = np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+    output = dict(series=series, name=data.name if series else None,
+                  columns=[str(c) for c in frame.columns],
+                  index_name=frame.index.name, rows=len(frame))
+
+    size = index.nbytes + values.nbytes
+    if shared_memory is None or size < SHM_THRESHOLD:
+        output['index'] = index.tolist()
+        output['values'] = values.tolist()
+        return output
+
+    block = shared_memory.SharedMemory(create=True, size=size)
+    np.ndarray(index.shape, np.int64, block.buf)[:] = index
+    np.ndarray(values.shape, np.float64, block.buf, offset=index.nbytes)[:] = values
+    block.close()
+    _created_blocks.add(block.name)
+    output['shm'] = block.name
+    return output
+
+
+def release_frame(packed: dict) -> None:
+    """Unlinks shared memory block of frame packed with pack_frame, if any."""
+    if 'shm' not in packed:
+        return
+    _created_blocks.discard(packed['shm'])
+    try:
+        block = shared_memory.SharedMemory(name=packed['shm'])
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+def unpack_frame(packed: dict):
+    """Unpacks DataFrame or Series packed with pack_frame."""
+    rows, columns = packed['rows'], packed['columns']
+    if 'shm' in packed:
+        block = shared_memory.SharedMemory(name=packed['shm'])
+        if packed['shm'] not in _created_blocks:
+            # the sender owns the block - do not let resource tracker of this
+            # process remove it at exit
+            resource_tracker.unregister(block._name, 'shared_memory')
+        try:
+            index = np.ndarray((rows,), np.int64, block.buf).copy()
+            values = np.ndarray((rows, len(columns)), np.float64, block.buf,
+                                offset=index.nbytes).copy()
+        finally:
+            block.close()
+    else:
+        index = np.array(packed['index'], dtype=np.int64)
+        values = np.array(packed['values'], dtype=np.float64).reshape(rows, len(columns))
+
+    index = pd.DatetimeIndex(index.view('datetime64[ns]'), name=packed['index_name'])
+    if packed['series']:
+        return pd.Series(values[:, 0], index=index, name=packed['name'])
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+# --- server ------------------------------------------------------------------
+
+def _indicators():
+    from marketools import analysis
+    return {name: getattr(analysis, name) for name in dir(analysis)
+            if hasattr(getattr(analysis, name), 'lookback')}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def setup(self):
+        _thread_state.serving = True
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = self.server.daemon.handle(request)
+                response['ok'] = True
+            except Exception as e:
+                response = dict(ok=False, error=f'{type(e).__name__}: {e}')
+
+            packed = response.get('data')
+            shared = isinstance(packed, dict) and 'shm' in packed
+            acknowledged = False
+            try:
+                send_message(self.request, response)
+                acknowledged = not shared or self._wait_for_ack()
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                if shared:
+                    release_frame(packed)
+            if not acknowledged:
+                return  # client failed, or state of the connection is unknown
+
+    def _wait_for_ack(self) -> bool:
+        """Waits until the client copies data from shared memory."""
+        self.request.settimeout(SHM_ACK_TIMEOUT)
+        try:
+            return 'ack' == recv_message(self.request).get('op')
+        except (ConnectionError, OSError):  # also timeout
+            return False
+        finally:
+            self.request.settimeout(None)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class DataDaemon:
+    """
+    Daemon serving market data to local processes.
+
+    Attributes
+    ----------
+    tickers : list
+        universe kept in memory (all tickers in the storage manifest if None)
+    interval : str
+        interval of OHLC data kept in memory
+    refresh_every : float
+        period of scheduled refresh in seconds, no refresh if None
+    socket_path : str
+        path to Unix socket
+    """
+
+    def __init__(self, tickers=None, interval: str = 'd', refresh_every: float = 3600,
+                 socket_path: str = None):
+        self.tickers = list(tickers) if tickers is not None else None
+        self.interval = interval
+        self.refresh_every = refresh_every
+        self.socket_path = socket_path or get_socket_path()
+        self._server = None
+        self._stop = threading.Event()
+
+    def universe(self) -> list:
+        if self.tickers is not None:
+            return self.tickers
+        return list(get_manifest().lookup(None, interval=self.interval).index)
+
+    def load(self) -> None:
+        """Loads OHLC data of the universe into memory."""
+        from .stockquotes import StockQuotes  # imported here to avoid circular import
+        with _serving():
+            for ticker in self.universe():
+                StockQuotes(ticker).ohlc(interval=self.interval)
+
+    def refresh(self) -> pd.DataFrame:
+        """Refreshes universe within hit budget, reloads refreshed data."""
+        from .planner import RefreshPlanner
+        from .stockquotes import StockQuotes
+        with _serving():
+            output = RefreshPlanner(self.universe(), interval=self.interval).refresh()
+            for ticker in output.index[output['Action'] == 'refreshed']:
+                StockQuotes(ticker).ohlc(interval=self.interval)
+        return output
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_every):
+            try:
+                self.refresh()
+            except Exception:  # keep refreshing on schedule, e.g. after network error
+                logger.exception('scheduled refresh failed')
+
+    def handle(self, request: dict) -> dict:
+        """Returns response for request received from client."""
+        from .stockquotes import StockQuotes
+        from .fundamentals import Fundamentals
+
+        op = request.get('op')
+        if 'ping' == op:
+            return dict(pid=os.getpid())
+        if 'tickers' == op:
+            return dict(tickers=self.universe())
+        if 'ohlc' == op:
+            data = StockQuotes(request['ticker']).ohlc(
+                interval=request.get('interval', 'd'), start=request.get('start'),
+                end=request.get('end'), tail=request.get('tail'))
+            return dict(data=pack_frame(data))
+        if 'fundamentals' == op:
+            fundamentals = Fundamentals(request['ticker'])
+            fundamentals.get_fundamentals()
+            return dict(data=dict(fundamentals))
+        if 'indicator' == op:
+            indicator = _indicators()[request['name']]
+            params = request.get('params') or {}
+            ohlc = StockQuotes(request['ticker']).ohlc(
+                interval=request.get('interval', 'd'), start=request.get('start'),
+                end=request.get('end'), tail=request.get('tail'))
+            return dict(data=pack_frame(indicator(ohlc, **params)))
+        if 'refresh' == op:
+            return dict(actions=self.refresh()['Action'].to_dict())
+        raise ValueError(f'unknown operation {op!r}')
+
+    def start(self) -> None:
+        """Starts serving in background threads."""
+        if os.path.exists(self.socket_path):
+            if _connect(self.socket_path) is not None:
+                raise RuntimeError(f'daemon is already running at {self.socket_path}')
+            os.remove(self.socket_path)  # left by daemon which was killed
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        self._server = _Server(self.socket_path, _Handler)
+        self._server.daemon = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        if self.refresh_every:
+            threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def serve_forever(self) -> None:
+        """Loads the universe and serves until interrupted."""
+        self.load()
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+# --- client ------------------------------------------------------------------
+
+def _connect(socket_path, timeout: float = None):
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+class DaemonClient:
+    """
+    Client of the data daemon. Requests from many threads are serialized
+    over one connection.
+
+    Attributes
+    ----------
+    socket_path : str
+        path to Unix socket of the daemon
+    timeout : float
+        seconds to wait for the daemon (CLIENT_TIMEOUT if None); socket.timeout
+        (OSError) is raised if the daemon does not respond
+    """
+
+    def __init__(self, socket_path: str = None, timeout: float = None):
+        self.socket_path = socket_path or get_socket_path()
+        self.timeout = CLIENT_TIMEOUT if timeout is None else timeout
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> bool:
+        """Connects to the daemon, returns False if it is not running."""
+        with self._lock:
+            if self._sock is None:
+                self._sock = _connect(self.socket_path, self.timeout)
+            return self._sock is not None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def _exchange(self, message: dict, reply: bool = True, wait: bool = False):
+        """Sends message and receives reply, with the lock held; without timeout if wait."""
+        if self._sock is None:
+            self._sock = _connect(self.socket_path, self.timeout)
+            if self._sock is None:
+                raise ConnectionError(f'daemon is not running at {self.socket_path}')
+        try:
+            self._sock.settimeout(None if wait else self.timeout)
+            send_message(self._sock, message)
+            return recv_message(self._sock) if reply else None
+        except OSError:
+            self._sock.close()
+            self._sock = None
+            raise
+
+    def request(self, op: str, **kwargs) -> dict:
+        """
+        Sends request, returns response; raises ConnectionError if daemon is
+        not reachable and DaemonError if the daemon failed to handle it.
+        """
+        with self._lock:
+            response = self._exchange(dict(op=op, **kwargs))
+        return self._checked(response)
+
+    @staticmethod
+    def _checked(response: dict) -> dict:
+        if not response.pop('ok'):
+            raise DaemonError(response['error'])
+        return response
+
+    def _request_frame(self, op: str, **kwargs):
+        """Sends request, returns DataFrame or Series from the response."""
+        with self._lock:
+            response = self._checked(self._exchange(dict(op=op, **kwargs)))
+            try:
+                return unpack_frame(response['data'])
+            finally:
+                if 'shm' in response['data']:
+                    # the daemon unlinks shared memory after acknowledgement
+                    self._exchange(dict(op='ack'), reply=False)
+
+    def ping(self) -> bool:
+        try:
+            self.request('ping')
+            return True
+        except (ConnectionError, OSError):
+            return False
+
+    def ohlc(self, ticker: str, interval: str = 'd', start=None, end=None, tail=None) -> pd.DataFrame:
+        start, end = (None if d is None else str(d) for d in (start, end))
+        return self._request_frame('ohlc', ticker=ticker, interval=interval,
+                                   start=start, end=end, tail=tail)
+
+    def fundamentals(self, ticker: str) -> dict:
+        return self.request('fundamentals', ticker=ticker)['data']
+
+    def indicator(self, ticker: str, name: str, params: dict = None, interval: str = 'd',
+                  start=None, end=None, tail=None):
+        """Returns indicator (function from marketools.analysis, e.g. 'rsi') calculated by daemon."""
+        start, end = (None if d is None else str(d) for d in (start, end))
+        return self._request_frame('indicator', ticker=ticker, name=name, params=params,
+                                   interval=interval, start=start, end=end, tail=tail)
+
+    def tickers(self) -> list:
+        return self.request('tickers')['tickers']
+
+    def refresh(self) -> dict:
+        """Refreshes the universe in the daemon; waits for it without timeout."""
+        with self._lock:
+            response = self._exchange(dict(op='refresh'), wait=True)
+        return self._checked(response)['actions']
+
+
+_clients = dict()
+_unreachable = dict()  # socket path -> time of failed connection
+
+
+def get_daemon_client():
+    """
+    Returns client connected to running daemon, None if daemon is not
+    running (or this is a daemon thread).
+    """
+    if getattr(_thread_state, 'serving', False):
+        return None
+    socket_path = get_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+    if time.monotonic() - _unreachable.get(socket_path, -RETRY_AFTER) < RETRY_AFTER:
+        return None
+
+    client = _clients.get(socket_path)
+    if client is None:
+        client = _clients.setdefault(socket_path, DaemonClient(socket_path))
+    if not client.connect():
+        daemon_unreachable(socket_path)
+        return None
+    return client
+
+
+def daemon_unreachable(socket_path: str = None) -> None:
+    """Marks daemon as unreachable for RETRY_AFTER seconds (data are read locally)."""
+    socket_path = socket_path or get_socket_path()
+    _unreachable[socket_path] = time.monotonic()
+    client = _clients.pop(socket_path, None)
+    if client is not None:
+        client.close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Serve market data from memory to local processes.')
+    parser.add_argument('tickers', nargs='*',
+                        help='tickers kept in memory (all stored tickers by default)')
+    parser.add_argument('--interval', default='d', help='interval of OHLC data')
+    parser.add_argument('--refresh-every', type=float, default=3600,
+                        help='period of scheduled refresh in seconds (0 - no refresh)')
+    parser.add_argument('--socket', default=None,
+                        help='path to Unix socket (daemon.sock in storage by default)')
+    parser.add_argument('--cache-limit', type=int, default=4096,
+                        help='memory budget for OHLC data in MiB')
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    store_data()
+    set_cache_limit(args.cache_limit * 2**20)
+    daemon = DataDaemon(args.tickers or None, interval=args.interval,
+                        refresh_every=args.refresh_every or None, socket_path=args.socket)
+    print(f'serving at {daemon.socket_path}')
+    daemon.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
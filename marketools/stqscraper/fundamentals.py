@@ -1,8 +1,13 @@
-from . import get_storage_status, get_storage_dir
+from . import get_storage_status, get_storage_backend
+from contextlib import nullcontext
 from datetime import datetime
-import os
 import csv
+import io
 from .scrapers import scrap_summary_table
+from .manifest import get_manifest, checksum
+from .locking import storage_lock
+from .daemon import get_daemon_client, daemon_unreachable, DaemonError
+from ..profiling import profiled
 
 
 class Fundamentals(dict):
@@ -10,49 +15,105 @@ class Fundamentals(dict):
     Class Fundamentals
     """
 
-    def __init__(self, ticker):
+    def __init__(self, ticker, storage=None):
         super().__init__()
         self.ticker = ticker
+        self.storage = storage  # e.g. Snapshot - data read only from it, never updated
 
+    @profiled
     def get_fundamentals(self):
         """
         Scraps from Stooq.com fundamental information for given ticker.
+        Data are read from the data daemon, when it is running, or only from
+        storage given to the instance (e.g. Snapshot).
         """
+        from .stockquotes import StockQuotes  # imported here to avoid circular import
 
+        if self.storage is not None:
+            content = self.storage.read(f'{self.ticker}_indicators.csv')
+            if content is not None:
+                self._parse(content)
+            return
+
+        client = get_daemon_client() if StockQuotes.use_daemon else None
+        if client is not None:
+            try:
+                self.update(client.fundamentals(self.ticker))
+                return
+            except (ConnectionError, OSError):
+                daemon_unreachable()  # daemon stopped - read locally
+            except DaemonError:
+                pass  # daemon failed to handle the request - read locally
+
+        key = f'{self.ticker}_indicators.csv'
+        lock = storage_lock(self.ticker, 'fundamentals') if get_storage_status() else nullcontext()
+
+        if not self._read_stored(key):
+            with lock:
+                # other process (or machine sharing the storage backend)
+                # could update the data while this one was waiting
+                if not (self._read_stored(key) or self._sync_stored(key)):
+                    # data older than 24 hours - update
+                    self.update(scrap_summary_table(self.ticker))
+                    if get_storage_status():
+                        buffer = io.StringIO()
+                        writer = csv.DictWriter(buffer, self.keys())
+                        writer.writeheader()
+                        writer.writerow(self)
+                        content = buffer.getvalue().encode()
+                        get_storage_backend().write(key, content)
+                        get_manifest().record(self.ticker, '', 'fundamentals',
+                                              rows=1, checksum=checksum(content))
+
+        if bool(self) is False:
+            # no fundamental data (None or empty dict)
+            self.update()
+
+    @profiled
+    def _read_stored(self, key):
+        """Reads stored data if they are not older than 24 hours, returns True if read."""
         update_required = True  # assuming that update will be required
-        file_path = os.path.join(get_storage_dir(), f'{self.ticker}_indicators.csv')
+        backend = get_storage_backend() if get_storage_status() else None
 
-        if get_storage_status() and os.path.exists(file_path):
+        if backend is not None and backend.exists(key):
             timestamp_now = datetime.timestamp(datetime.now())
-            timestamp_up = os.path.getatime(file_path)  # CSV file modification time
+            entry = get_manifest().get(self.ticker, '', 'fundamentals')
+            # data stored before the manifest existed - use modification time
+            timestamp_up = backend.modified(key) if entry is None else entry.fetch_time
 
             if timestamp_now - timestamp_up < 24 * 3600:
                 # do not update more often than once in 24 hours
-                with open(file_path, 'r') as f:
-                    reader = csv.DictReader(f)
-                    try:
-                        self.update(next(reader))
-                    except StopIteration:
-                        pass
+                self._parse(backend.read(key))
                 update_required = False
-                # make sure that values are float
-                for k in self.keys():
-                    if self[k]:
-                        self[k] = float(self[k])
-
-        if update_required:
-            # data older than 24 hours - update
-            self.update(scrap_summary_table(self.ticker))
-            if get_storage_status():
-                with open(file_path, 'w') as f:
-                    writer = csv.DictWriter(f, self.keys())
-                    writer.writeheader()
-                    writer.writerow(self)
 
-        if bool(self) is False:
-            # no fundamental data (None or empty dict)
-            self.update()
+        return not update_required
+
+    def _parse(self, content):
+        """Reads data from stored CSV content."""
+        reader = csv.DictReader(io.StringIO(content.decode()))
+        try:
+            self.update(next(reader))
+        except StopIteration:
+            pass
+        # make sure that values are float
+        for k in self.keys():
+            if self[k]:
+                self[k] = float(self[k])
+
+    @profiled
+    def _sync_stored(self, key):
+        """
+        Brings newer data from shared storage backend (written by other
+        machine) and reads them, returns True if read.
+        """
+        backend = get_storage_backend()
+        if not (get_storage_status() and backend.sync(key)):
+            return False
+        get_manifest().record(self.ticker, '', 'fundamentals', rows=1,
+                              checksum=checksum(backend.read(key)),
+                              fetch_time=backend.modified(key))
+        return self._read_stored(key)
+
 
-    
 if __name__ == '__main__':
     pass
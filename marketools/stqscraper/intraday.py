@@ -0,0 +1,193 @@
+from . import get_storage_dir
+from .manifest import get_manifest, checksum
+from .locking import atomic_write
+from ..profiling import profiling_enabled, add_bytes
+from io import BytesIO
+import pandas as pd
+import numpy as np
+import os
+
+
+INTRADAY_INTERVALS = ('5', '10', '15', '30', '60')  # minutes
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+_KEY_FORMATS = dict(D='%Y-%m-%d', M='%Y-%m')
+
+
+def read_intraday_csv(file_path):
+    """
+    Reads intraday OHLCV data from CSV file downloaded from Stooq (columns
+    Date, Time, Open, High, Low, Close, Volume) or from partition of
+    IntradayStore (columns Datetime, Open, High, Low, Close, Volume).
+
+    Parameters
+    ----------
+    file_path : str, os.path or file-like object
+        path to CSV file, or buffer with CSV content
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if profiling_enabled() and isinstance(file_path, (str, os.PathLike)):
+        add_bytes(os.path.getsize(file_path))
+    raw = pd.read_csv(file_path, dtype={'Date': str, 'Time': str, 'Datetime': str})
+    if 'Datetime' in raw:
+        timestamps = raw.pop('Datetime')
+    else:
+        timestamps = raw.pop('Date') + ' ' + raw.pop('Time')
+    raw.index = pd.to_datetime(timestamps, format='%Y-%m-%d %H:%M:%S')
+    raw.index.name = 'Datetime'
+    return raw[OHLCV_COLUMNS].astype(np.float64)
+
+
+class IntradayStore:
+    """
+    Storage of intraday OHLCV data for one ticker and interval, partitioned
+    into CSV files by day or by month. Reads touch only the partitions
+    covering the requested time range and appends write only the
+    partitions whose content changes.
+
+    Attributes
+    ----------
+    ticker : str
+        ticker of a stock
+    interval : str
+        interval in minutes, one of INTRADAY_INTERVALS
+    partition : str
+        'D' - one file per day, 'M' - one file per month
+    storage_dir : str or None
+        storage directory, marketools storage directory if None
+    """
+
+    def __init__(self, ticker: str, interval: str, partition: str = 'M', storage_dir: str = None):
+        if interval not in INTRADAY_INTERVALS:
+            raise ValueError(f'interval must be one of {INTRADAY_INTERVALS}')
+        if partition not in _KEY_FORMATS:
+            raise ValueError('wrong value for partition, must be "D" or "M"')
+        self.ticker = ticker
+        self.interval = interval
+        self.partition = partition
+        self.storage_dir = storage_dir
+
+    @property
+    def directory(self):
+        return os.path.join(self.storage_dir or get_storage_dir(), f'{self.ticker}_ohcl_{self.interval}')
+
+    def _key(self, timestamp) -> str:
+        return pd.Timestamp(timestamp).strftime(_KEY_FORMATS[self.partition])
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, f'{key}.csv')
+
+    def partitions(self) -> list:
+        """Returns sorted list of stored partition keys."""
+        if not os.path.isdir(self.directory):
+            return list()
+        return sorted(f[:-4] for f in os.listdir(self.directory) if f.endswith('.csv'))
+
+    def append(self, data: pd.DataFrame) -> list:
+        """
+        Stores new bars. Bars already stored are replaced by the new ones
+        (e.g. revised last bar of a session), and only partitions whose
+        content changes are written; partitions which already contain the
+        same bars are left untouched, e.g., when a download overlaps the
+        stored history.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            intraday OHLCV data with DatetimeIndex
+
+        Returns
+        -------
+        list
+            keys of written partitions
+        """
+        if data.empty:
+            return list()
+        os.makedirs(self.directory, exist_ok=True)
+        stored = set(self.partitions())
+
+        keys = data.index.strftime(_KEY_FORMATS[self.partition])
+        written = list()
+        entries = list()
+        for key, new_bars in data.groupby(keys, sort=True):
+            old_content = None
+            if key in stored:
+                with open(self._path(key), 'rb') as f:
+                    old_content = f.read()
+                old_bars = read_intraday_csv(BytesIO(old_content))
+                old_bars = old_bars[~old_bars.index.isin(new_bars.index)]
+                new_bars = pd.concat([old_bars, new_bars])
+            new_bars = new_bars[OHLCV_COLUMNS].astype(np.float64).sort_index()
+            content = new_bars.to_csv(index_label='Datetime',
+                                      date_format='%Y-%m-%d %H:%M:%S').encode()
+            if content == old_content:
+                continue  # no new or revised bars
+            atomic_write(self._path(key), content)
+            written.append(key)
+            entries.append((self.ticker, self.interval, f'partition:{key}',
+                            new_bars.index[-1], len(new_bars), checksum(content), None))
+
+        get_manifest(self.storage_dir).record_many(entries)
+        return written
+
+    def rows(self) -> int:
+        """Returns number of stored bars (from the manifest)."""
+        return get_manifest(self.storage_dir).total_rows(self.ticker, self.interval, 'partition:')
+
+    def last_timestamp(self):
+        """Returns timestamp of the last stored bar, None if there are no data."""
+        keys = self.partitions()
+        if not keys:
+            return None
+        return read_intraday_csv(self._path(keys[-1])).index[-1]
+
+    def read(self, start=None, end=None, tail=None) -> pd.DataFrame:
+        """
+        Reads stored bars between start and end (inclusively), limited to tail
+        most recent bars. Only partitions overlapping the range are read, and
+        the output is assembled into preallocated arrays in one pass.
+
+        Parameters
+        ----------
+        start : datetime, str or None
+            first timestamp
+        end : datetime, str or None
+            last timestamp
+        tail : int or None
+            maximal number of the most recent bars (before end)
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        keys = self.partitions()
+        if start is not None:
+            keys = [k for k in keys if k >= self._key(start)]
+        if end is not None:
+            keys = [k for k in keys if k <= self._key(end)]
+
+        parts = list()
+        rows = 0
+        for key in reversed(keys):
+            part = read_intraday_csv(self._path(key)).loc[start:end]
+            parts.append(part)
+            rows += len(part)
+            if tail is not None and rows >= tail:
+                break
+        parts.reverse()
+
+        index = np.empty(rows, dtype='datetime64[ns]')
+        values = np.empty((rows, len(OHLCV_COLUMNS)), dtype=np.float64)
+        position = 0
+        for part in parts:
+            index[position:position + len(part)] = part.index.to_numpy()
+            values[position:position + len(part)] = part.to_numpy()
+            position += len(part)
+
+        output = pd.DataFrame(values, columns=OHLCV_COLUMNS,
+                              index=pd.DatetimeIndex(index, name='Datetime'))
+        if tail is not None:
+            output = output.tail(tail)
+        return output
@@ -0,0 +1,147 @@
+"""
+Helpers for storage directory shared by many processes.
+
+Every write to the storage goes to a temporary file in the same directory,
+which is then renamed over the target file (os.replace is atomic), so
+readers see either old or new content, never partially written file.
+Writers of the same dataset are serialized with advisory file locks
+(fcntl.flock on POSIX, msvcrt.locking on Windows) kept in .locks
+subdirectory of the storage.
+"""
+from . import get_storage_dir
+from contextlib import contextmanager
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_open(file_path, mode: str = 'wb'):
+    """
+    Opens temporary file for writing; on successful exit of the context it
+    replaces file_path, on error it is removed and file_path is not changed.
+
+    Parameters
+    ----------
+    file_path : str or os.path
+        path to target file
+    mode : str
+        'wb' or 'w'
+    """
+    directory, name = os.path.split(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{name}.', suffix='.tmp')
+    try:
+        os.chmod(tmp_path, 0o666 & ~_UMASK)  # as for files created with open
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write(file_path, content: bytes) -> None:
+    """Writes content to file atomically (write to temporary file, rename)."""
+    with atomic_open(file_path, 'wb') as f:
+        f.write(content)
+
+
+class FileLock:
+    """
+    Advisory lock on a file, shared between processes. Exclusive lock has
+    single holder; shared locks (many readers) exclude exclusive lock. On
+    Windows every lock is exclusive.
+
+    Attributes
+    ----------
+    file_path : str
+        path to lock file (created if it does not exist)
+    shared : bool
+        True - shared (read) lock, False - exclusive (write) lock
+    timeout : float or None
+        maximal waiting time in seconds, None - wait forever
+    """
+
+    poll_interval = 0.05  # seconds between attempts, if waiting with timeout
+
+    def __init__(self, file_path, shared: bool = False, timeout: float = None):
+        self.file_path = file_path
+        self.shared = shared
+        self.timeout = timeout
+        self._fd = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def _try_lock(self, fd, blocking):
+        if fcntl is not None:
+            operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+            try:
+                fcntl.flock(fd, operation if blocking else operation | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                return False
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self) -> None:
+        """Waits for the lock; raises TimeoutError after timeout."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+        fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT)
+        blocking = self.timeout is None and fcntl is not None
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock(fd, blocking):
+            if deadline is not None and time.monotonic() > deadline:
+                os.close(fd)
+                raise TimeoutError(f'lock {self.file_path} not acquired in {self.timeout} s')
+            time.sleep(self.poll_interval)
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def storage_lock(*key, shared: bool = False, timeout: float = None,
+                 storage_dir: str = None) -> FileLock:
+    """
+    Returns lock for dataset identified by key, e.g., storage_lock('PKN',
+    'd', 'ohlc'), in given storage directory (current if None).
+    """
+    name = '_'.join(str(k) for k in key if k != '')
+    return FileLock(os.path.join(storage_dir or get_storage_dir(), '.locks', f'{name}.lock'),
+                    shared=shared, timeout=timeout)
+
+
+if __name__ == '__main__':
+    pass
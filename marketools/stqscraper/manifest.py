@@ -0,0 +1,154 @@
+from . import get_storage_dir
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import os
+import sqlite3
+import pandas as pd
+
+
+ManifestEntry = namedtuple('ManifestEntry',
+                           ['ticker', 'interval', 'dataset', 'last_date',
+                            'fetch_time', 'rows', 'checksum'])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS manifest (
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    last_date TEXT,
+    fetch_time REAL NOT NULL,
+    rows INTEGER,
+    checksum TEXT,
+    PRIMARY KEY (ticker, interval, dataset)
+)
+'''
+
+
+def checksum(content: bytes) -> str:
+    """Returns checksum (SHA-1) of stored content."""
+    return hashlib.sha1(content).hexdigest()
+
+
+class Manifest:
+    """
+    Manifest of the data storage - SQLite table with the last bar date, fetch
+    time, row count and checksum of every stored dataset, keyed by (ticker,
+    interval, dataset). Freshness of stored data can be checked without
+    reading the data files, for single ticker or whole universe at once.
+
+    Attributes
+    ----------
+    file_path : str
+        path to SQLite database
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with self._connect() as connection:
+            connection.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.file_path, timeout=30)
+        try:
+            with connection:  # commits or rolls back the transaction
+                yield connection
+        finally:
+            connection.close()
+
+    def record(self, ticker: str, interval: str, dataset: str, last_date=None,
+               rows: int = None, checksum: str = None, fetch_time: float = None) -> None:
+        """
+        Records (inserts or replaces) entry for stored dataset.
+
+        Parameters
+        ----------
+        ticker : str
+            ticker of a stock
+        interval : str
+            interval of data ('' if not applicable)
+        dataset : str
+            name of dataset, e.g., 'ohlc', 'fundamentals'
+        last_date : datetime, date or None
+            date (timestamp) of the last bar
+        rows : int
+            number of rows
+        checksum : str
+            checksum of stored content
+        fetch_time : float
+            POSIX timestamp of data download, now if None
+        """
+        self.record_many([(ticker, interval, dataset, last_date, rows, checksum, fetch_time)])
+
+    def record_many(self, entries) -> None:
+        """
+        Records many entries in one transaction. Every entry is a tuple
+        (ticker, interval, dataset, last_date, rows, checksum, fetch_time).
+        """
+        now = datetime.now().timestamp()
+        values = [(t, i, d,
+                   None if last is None else pd.Timestamp(last).isoformat(),
+                   now if fetched is None else fetched,
+                   None if rows is None else int(rows),
+                   c)
+                  for t, i, d, last, rows, c, fetched in entries]
+        with self._connect() as connection:
+            connection.executemany('INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   values)
+
+    def get(self, ticker: str, interval: str, dataset: str):
+        """Returns ManifestEntry for given dataset, None if not recorded."""
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM manifest WHERE ticker = ? AND interval = ? AND dataset = ?',
+                                     (ticker, interval, dataset)).fetchone()
+        return None if row is None else self._entry(row)
+
+    def lookup(self, tickers=None, interval: str = 'd', dataset: str = 'ohlc') -> pd.DataFrame:
+        """
+        Returns DataFrame (indexed by ticker) with manifest entries for given
+        tickers (all tickers if None), interval and dataset. Columns:
+        'Last date', 'Fetch time', 'Rows', 'Checksum'.
+        """
+        query = 'SELECT * FROM manifest WHERE interval = ? AND dataset = ?'
+        with self._connect() as connection:
+            rows = connection.execute(query, (interval, dataset)).fetchall()
+        output = pd.DataFrame([self._entry(r) for r in rows], columns=ManifestEntry._fields)
+        output = output.set_index('ticker')[['last_date', 'fetch_time', 'rows', 'checksum']]
+        output.columns = ['Last date', 'Fetch time', 'Rows', 'Checksum']
+        if tickers is not None:
+            output = output.reindex(list(tickers))
+        return output
+
+    def total_rows(self, ticker: str, interval: str, prefix: str) -> int:
+        """Returns sum of rows of all datasets with names starting with prefix."""
+        with self._connect() as connection:
+            row = connection.execute('SELECT SUM(rows) FROM manifest WHERE ticker = ? AND interval = ? AND dataset LIKE ?',
+                                     (ticker, interval, prefix + '%')).fetchone()
+        return row[0] or 0
+
+    def remove(self, ticker: str, interval: str, dataset: str) -> None:
+        """Removes entry for given dataset."""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM manifest WHERE ticker = ? AND interval = ? AND dataset = ?',
+                               (ticker, interval, dataset))
+
+    @staticmethod
+    def _entry(row):
+        ticker, interval, dataset, last_date, fetch_time, rows, content_checksum = row
+        last_date = None if last_date is None else pd.Timestamp(last_date)
+        return ManifestEntry(ticker, interval, dataset, last_date, fetch_time, rows, content_checksum)
+
+
+_manifests = dict()
+
+
+def get_manifest(storage_dir: str = None) -> Manifest:
+    """Returns manifest of given storage directory (current if None)."""
+    storage_dir = storage_dir or get_storage_dir()
+    file_path = os.path.join(storage_dir, 'manifest.sqlite')
+    if file_path not in _manifests:
+        os.makedirs(storage_dir, exist_ok=True)
+        _manifests[file_path] = Manifest(file_path)
+    return _manifests[file_path]
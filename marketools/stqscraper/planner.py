@@ -0,0 +1,217 @@
+from . import get_storage_status, get_storage_dir
+from .cache import ohlc_cache
+from .calendars import get_calendar
+from .manifest import get_manifest
+from .locking import atomic_open, FileLock
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from threading import Lock
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+import requests
+
+
+DAILY_HIT_LIMIT = 2000  # assumed number of Stooq downloads allowed per day
+
+
+class HitBudget:
+    """
+    Counter of Stooq hits (downloads) used per day. The counter is persisted
+    in JSON file, so it is shared by subsequent runs, and it is reset every
+    day (local time). When Stooq reports that the daily limit is exceeded,
+    the budget is marked as exhausted until the end of day. The file is
+    read on every call and updated under file lock, so the budget is shared
+    by processes using the same storage.
+
+    Attributes
+    ----------
+    daily_limit : int
+        number of hits allowed per day
+    file_path : str or None
+        path to JSON file, the counter is kept in memory only if None
+    """
+
+    def __init__(self, daily_limit: int = DAILY_HIT_LIMIT, file_path=None):
+        self.daily_limit = daily_limit
+        self.file_path = file_path
+        self._state = None
+        self._lock = Lock()
+
+    def _load(self, today):
+        state = self._state
+        if self.file_path and os.path.exists(self.file_path):
+            try:
+                with open(self.file_path, 'r') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = None
+        if state is None or state.get('date') != today:
+            state = dict(date=today, used=0, exhausted=False)
+        self._state = state
+        return state
+
+    def _save(self):
+        if self.file_path:
+            with atomic_open(self.file_path, 'w') as f:
+                json.dump(self._state, f)
+
+    def _file_lock(self):
+        return FileLock(self.file_path + '.lock') if self.file_path else nullcontext()
+
+    def used(self, day=None) -> int:
+        """Returns number of hits used today."""
+        with self._lock:
+            return self._load(str(day or datetime.now().date()))['used']
+
+    def remaining(self, day=None) -> int:
+        """Returns number of hits left today."""
+        with self._lock:
+            state = self._load(str(day or datetime.now().date()))
+            return 0 if state['exhausted'] else max(self.daily_limit - state['used'], 0)
+
+    def record(self, hits: int = 1) -> None:
+        """Records used hits."""
+        with self._lock, self._file_lock():
+            self._load(str(datetime.now().date()))['used'] += hits
+            self._save()
+
+    def exhaust(self) -> None:
+        """Marks budget as exhausted until the end of day (Stooq refused download)."""
+        with self._lock, self._file_lock():
+            self._load(str(datetime.now().date()))['exhausted'] = True
+            self._save()
+
+
+_budgets = dict()
+
+
+def get_hit_budget() -> HitBudget:
+    """
+    Returns hit budget of the storage directory, or in-memory budget if
+    data storage is disabled.
+    """
+    file_path = os.path.join(get_storage_dir(), 'hit_budget.json') if get_storage_status() else None
+    if file_path not in _budgets:
+        _budgets[file_path] = HitBudget(file_path=file_path)
+    return _budgets[file_path]
+
+
+class RefreshPlanner:
+    """
+    Planner of OHLC data refreshes within the Stooq daily hit budget.
+    Tickers are prioritised by staleness (number of sessions missing in
+    stored data) multiplied by user-assigned importance; the remaining
+    budget is spread evenly over the rest of the day. Tickers which are not
+    refreshed keep using stored data. For intraday intervals, staleness is
+    the number of bars elapsed since the last download.
+
+    Attributes
+    ----------
+    tickers : list
+        tickers to keep up to date
+    importance : dict
+        ticker -> importance (default 1), tickers with importance 0 are
+        never refreshed
+    interval : str
+        interval of OHLC data
+    slot : int
+        length of refresh slot in minutes; with pacing, every slot gets equal
+        part of the remaining daily budget
+    """
+
+    def __init__(self, tickers, importance: dict = None, interval: str = 'd', slot: int = 60):
+        self.tickers = list(tickers)
+        self.importance = dict(importance or {})
+        self.interval = interval
+        self.slot = slot
+
+    def allowance(self, time_now: datetime = None, pace: bool = True) -> int:
+        """Returns number of refreshes allowed in the current slot."""
+        time_now = time_now or datetime.now()
+        remaining = get_hit_budget().remaining(time_now.date())
+        if not pace:
+            return remaining
+        midnight = datetime.combine(time_now.date() + timedelta(days=1), datetime.min.time())
+        slots_left = max((midnight - time_now).total_seconds() / (60 * self.slot), 1)
+        return min(remaining, math.ceil(remaining / slots_left))
+
+    def plan(self, time_now: datetime = None, pace: bool = True) -> pd.DataFrame:
+        """
+        Returns refresh plan - DataFrame indexed by ticker (sorted by
+        priority) with columns 'Staleness', 'Importance', 'Priority' and
+        'Action': 'refresh', 'skip' (over budget) or 'fresh' (up to date).
+        """
+        from .stockquotes import StockQuotes  # imported here to avoid circular import
+        from .intraday import INTRADAY_INTERVALS
+
+        time_now = time_now or datetime.now()
+        entries = get_manifest().lookup(self.tickers, interval=self.interval, dataset='ohlc')
+
+        staleness = list()
+        for ticker, last_date, fetch_time in zip(entries.index, entries['Last date'], entries['Fetch time']):
+            calendar = get_calendar(ticker)
+            if pd.isna(fetch_time) or pd.isna(last_date):
+                staleness.append(np.inf)
+            elif self.interval in INTRADAY_INTERVALS:
+                elapsed = datetime.timestamp(time_now) - fetch_time
+                staleness.append(max(math.floor(elapsed / (60 * int(self.interval))), 0))
+            elif StockQuotes._is_up_to_date(last_date, fetch_time, calendar, time_now):
+                staleness.append(0)
+            else:
+                expected = calendar.last_published_session(time_now, StockQuotes.update_hour)
+                missing = len(calendar.sessions(last_date + timedelta(days=1), expected))
+                staleness.append(max(missing, 1))  # missing session retried after update_period
+
+        output = pd.DataFrame(index=entries.index)
+        output['Staleness'] = np.array(staleness, dtype=np.float64)
+        output['Importance'] = [float(self.importance.get(t, 1)) for t in output.index]
+        output['Priority'] = np.where(output['Importance'] > 0,
+                                      output['Staleness'] * output['Importance'], 0.0)
+        output['Priority'] = output['Priority'].fillna(0.0)  # inf * 0
+        output = output.sort_values('Priority', ascending=False, kind='stable')
+
+        candidates = (output['Priority'] > 0).to_numpy()
+        scheduled = candidates & (np.cumsum(candidates) <= self.allowance(time_now, pace))
+        output['Action'] = np.where(scheduled, 'refresh', np.where(candidates, 'skip', 'fresh'))
+        return output
+
+    def refresh(self, time_now: datetime = None, pace: bool = True) -> pd.DataFrame:
+        """
+        Downloads data of tickers planned for refresh. Returns the plan with
+        'Action' updated to 'refreshed' or 'failed'; tickers marked 'skip'
+        were not downloaded and keep using stored data.
+        """
+        from .stockquotes import StockQuotes  # imported here to avoid circular import
+        from .intraday import INTRADAY_INTERVALS
+
+        output = self.plan(time_now, pace)
+        for ticker in output.index[output['Action'] == 'refresh']:
+            if get_hit_budget().remaining() == 0:
+                output.loc[ticker, 'Action'] = 'skip'
+                continue
+            quotes = StockQuotes(ticker)
+            try:
+                data = quotes.download_ohlc_from_stooq(interval=self.interval)
+            except (requests.RequestException, OSError):
+                data = None  # other tickers are refreshed
+            if data is None or data.empty:
+                output.loc[ticker, 'Action'] = 'failed'
+                continue
+            data.sort_index(ascending=True, inplace=True)
+            if get_storage_status():
+                # lock only for writing, not for the download
+                with quotes._storage_lock(self.interval):
+                    if self.interval in INTRADAY_INTERVALS:
+                        quotes._store_intraday(data, interval=self.interval)
+                    else:
+                        quotes._store_ohlc(data, interval=self.interval)
+            ohlc_cache.invalidate(ticker, self.interval)
+            output.loc[ticker, 'Action'] = 'refreshed'
+        return output
+
+
+if __name__ == '__main__':
+    pass
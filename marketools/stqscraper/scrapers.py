@@ -1,8 +1,17 @@
+from .stockquotes import StockQuotes, fetch_url, is_hits_limit_response
+from .planner import get_hit_budget
+from ..profiling import profiled, add_bytes
+from io import BytesIO
 import requests
 import pandas as pd
+import numpy as np
 import re
 
 
+QUOTES_BATCH_SIZE = 50  # tickers per request for last quotes
+
+
+@profiled
 def get_raw_summary_table(ticker):
     """
     Downloads and returns raw summary table from Stooq.
@@ -17,7 +26,9 @@ def get_raw_summary_table(ticker):
     """
 
     url = f'https://stooq.pl/q/g/?s={ticker}'
-    html = requests.get(url).text
+    response = requests.get(url)
+    add_bytes(len(response.content))
+    html = response.text
 
     # extracting table with summary
     raw_table = pd.read_html(html)[0]
@@ -27,6 +38,7 @@ def get_raw_summary_table(ticker):
     return raw_table
 
 
+@profiled
 def scrap_summary_table(ticker):
     """
     Scraps summary table with information about given stock ticker. Returns 
@@ -80,5 +92,59 @@ def scrap_summary_table(ticker):
     return output_dict
 
 
+@profiled
+def get_last_quotes(tickers, batch_size: int = QUOTES_BATCH_SIZE) -> pd.DataFrame:
+    """
+    Downloads the most recent quotes of many tickers from Stooq CSV endpoint
+    for multiple symbols - one request per batch_size tickers instead of one
+    request per ticker. Tickers without quotes (unknown ticker, or daily hits
+    limit exceeded) have NaN values.
+
+    Parameters
+    ----------
+    tickers : list
+        tickers of stocks
+    batch_size : int
+        maximal number of tickers in one request
+
+    Returns
+    -------
+    pandas.DataFrame
+        DataFrame indexed by ticker with columns: 'Date' (date and time of
+        the quote), 'Open', 'High', 'Low', 'Close', 'Volume'
+    """
+
+    tickers = list(dict.fromkeys(tickers))
+    columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    budget = get_hit_budget()
+    batches = list()
+
+    for first in range(0, len(tickers), batch_size):
+        batch = tickers[first:first + batch_size]
+        if budget.remaining() == 0:
+            break
+        url = f'https://stooq.com/q/l/?s={"+".join(batch)}&f=sd2t2ohlcv&h&e=csv'
+        content = fetch_url(url,
+                            timeout=StockQuotes.download_timeout,
+                            retries=StockQuotes.download_retries)
+        budget.record()
+        if is_hits_limit_response(content):
+            budget.exhaust()
+            break
+
+        quotes = pd.read_csv(BytesIO(content), na_values=['N/D'], dtype={'Date': str, 'Time': str})
+        quotes.index = quotes['Symbol'].str.upper()
+        quotes = quotes.reindex([t.upper() for t in batch])
+        quotes.index = batch
+        quotes['Date'] = pd.to_datetime(quotes['Date'] + ' ' + quotes['Time'], errors='coerce')
+        batches.append(quotes)
+
+    output = pd.concat(batches) if batches else pd.DataFrame(columns=['Date'] + columns)
+    output = output.reindex(pd.Index(tickers, name='Ticker'))
+    output['Date'] = pd.to_datetime(output['Date'])
+    output[columns] = output[columns].astype(np.float64)
+    return output[['Date'] + columns]
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,232 @@
+"""
+Point-in-time snapshots of the data storage, for reproducible backtests.
+
+Stored files are split into chunks on line boundaries chosen by content
+(a line closes a chunk if its hash is divisible by average number of lines
+per chunk), and chunks are stored once, addressed by their SHA-1. When
+history gets new sessions, or a few rows change, only chunks around the
+changes are new - unchanged history is shared by all snapshots. Every
+snapshot is a JSON record with list of chunks of every file.
+"""
+from . import get_storage_dir, get_storage_backend
+from .backends import StorageBackend, LocalBackend
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import zlib
+import pandas as pd
+
+
+CHUNK_LINES = 64  # average number of lines in chunk
+
+
+def split_chunks(content: bytes, avg_lines: int = CHUNK_LINES) -> list:
+    """
+    Splits content into chunks on line boundaries defined by content - the
+    same lines give the same boundaries regardless of their position, so
+    appended or changed rows do not shift the other chunks. Chunks have
+    from avg_lines / 4 to 4 * avg_lines lines.
+    """
+    min_lines, max_lines = max(avg_lines // 4, 1), 4 * avg_lines
+    output = list()
+    lines = content.splitlines(keepends=True)
+    first = 0
+    for i, line in enumerate(lines, start=1):
+        count = i - first
+        if count >= max_lines or (count >= min_lines and zlib.crc32(line) % avg_lines == 0):
+            output.append(b''.join(lines[first:i]))
+            first = i
+    if first < len(lines):
+        output.append(b''.join(lines[first:]))
+    return output
+
+
+def _chunk_key(digest: str) -> str:
+    return f'chunks/{digest[:2]}/{digest}'
+
+
+class Snapshot(StorageBackend):
+    """
+    Read-only storage backend with stored data as they were when the
+    snapshot was taken. Can be passed to Stock and StockQuotes (storage
+    argument).
+
+    Attributes
+    ----------
+    name : str
+        name of the snapshot
+    time : datetime
+        time when the snapshot was taken
+    tag : str or None
+        user-defined tag
+    files : dict
+        key -> list of chunk digests
+    """
+
+    def __init__(self, store, record: dict):
+        self.store = store
+        self.name = record['name']
+        self.time = datetime.fromisoformat(record['time'])
+        self.tag = record.get('tag')
+        self.files = record['files']
+
+    def __repr__(self):
+        return f'Snapshot({self.name!r}, tag={self.tag!r})'
+
+    def read(self, key):
+        if key not in self.files:
+            return None
+        return b''.join(self.store.chunk(digest) for digest in self.files[key])
+
+    def write(self, key, content):
+        raise PermissionError(f'snapshot {self.name} is read-only')
+
+    def delete(self, key):
+        raise PermissionError(f'snapshot {self.name} is read-only')
+
+    def modified(self, key):
+        return self.time.timestamp() if key in self.files else None
+
+    def keys(self, prefix=''):
+        return sorted(k for k in self.files if k.startswith(prefix))
+
+
+class SnapshotStore:
+    """
+    Store of snapshots with chunk-level deduplication.
+
+    Attributes
+    ----------
+    backend : StorageBackend
+        where chunks and snapshot records are stored, 'snapshots'
+        subdirectory of the storage directory if None
+    avg_lines : int
+        average number of lines in chunk
+    """
+
+    def __init__(self, backend: StorageBackend = None, avg_lines: int = CHUNK_LINES):
+        self.backend = backend or LocalBackend(os.path.join(get_storage_dir(), 'snapshots'))
+        self.avg_lines = avg_lines
+
+    def chunk(self, digest: str) -> bytes:
+        content = self.backend.read(_chunk_key(digest))
+        if content is None:
+            raise KeyError(f'chunk {digest} is missing')
+        return content
+
+    def take(self, tag: str = None, source: StorageBackend = None, keys=None) -> Snapshot:
+        """
+        Takes snapshot of stored data.
+
+        Parameters
+        ----------
+        tag : str
+            tag of the snapshot, e.g., name of backtest
+        source : StorageBackend
+            storage to take snapshot of, current storage backend if None
+        keys : list
+            keys to include, all stored CSV files (OHLC, fundamentals,
+            Heikin-Ashi) if None
+
+        Returns
+        -------
+        Snapshot
+        """
+        source = source or get_storage_backend()
+        if keys is None:
+            keys = [k for k in source.keys(recursive=False) if k.endswith('.csv')]
+        time = datetime.now()
+        name = time.strftime('%Y%m%d-%H%M%S-%f')
+        written = set()
+        files = dict()
+
+        for key in keys:
+            content = source.read(key)
+            if content is None:
+                continue
+            digests = list()
+            for chunk in split_chunks(content, self.avg_lines):
+                digest = hashlib.sha1(chunk).hexdigest()
+                if digest not in written and not self.backend.exists(_chunk_key(digest)):
+                    self.backend.write(_chunk_key(digest), chunk)
+                written.add(digest)
+                digests.append(digest)
+            files[key] = digests
+
+        record = dict(name=name, time=time.isoformat(), tag=tag, files=files)
+        self.backend.write(f'snapshot_{name}.json', json.dumps(record).encode())
+        return Snapshot(self, record)
+
+    def _records(self):
+        for key in self.backend.keys('snapshot_'):
+            yield json.loads(self.backend.read(key))
+
+    def list(self) -> pd.DataFrame:
+        """Returns DataFrame with columns 'Name', 'Time', 'Tag', 'Files' - one row per snapshot."""
+        rows = [(r['name'], pd.Timestamp(r['time']), r.get('tag'), len(r['files']))
+                for r in self._records()]
+        return pd.DataFrame(rows, columns=['Name', 'Time', 'Tag', 'Files'])
+
+    def open(self, at=None, tag: str = None, name: str = None) -> Snapshot:
+        """
+        Opens the latest snapshot taken at or before given time (for date -
+        until the end of the day) and with given tag.
+
+        Parameters
+        ----------
+        at : datetime, date, str or None
+            point in time, now if None
+        tag : str or None
+            tag of the snapshot, any if None
+        name : str or None
+            name of the snapshot, at and tag are ignored if given
+
+        Returns
+        -------
+        Snapshot
+        """
+        if at is not None:
+            at = pd.Timestamp(at)
+            if at == at.normalize():
+                at += timedelta(days=1) - timedelta(microseconds=1)
+        if name is not None:
+            matching = [r for r in self._records() if r['name'] == name]
+        else:
+            matching = [r for r in self._records()
+                        if (tag is None or r.get('tag') == tag)
+                        and (at is None or pd.Timestamp(r['time']) <= at)]
+        if not matching:
+            raise KeyError(f'no snapshot for name={name}, at={at}, tag={tag}')
+        return Snapshot(self, max(matching, key=lambda r: r['time']))
+
+    def remove(self, name: str) -> None:
+        """Removes snapshot record; chunks are removed with gc."""
+        self.backend.delete(f'snapshot_{name}.json')
+
+    def gc(self) -> int:
+        """Removes chunks not used by any snapshot, returns number of removed chunks."""
+        used = {_chunk_key(d) for r in self._records() for digests in r['files'].values() for d in digests}
+        unused = [k for k in self.backend.keys('chunks/') if k not in used]
+        for key in unused:
+            self.backend.delete(key)
+        return len(unused)
+
+
+def take_snapshot(tag: str = None) -> Snapshot:
+    """Takes snapshot of stored data (see SnapshotStore.take)."""
+    return SnapshotStore().take(tag=tag)
+
+
+def open_snapshot(at=None, tag: str = None, name: str = None) -> Snapshot:
+    """Opens read-only snapshot of stored data by time, tag or name (see SnapshotStore.open)."""
+    return SnapshotStore().open(at=at, tag=tag, name=name)
+
+
+def list_snapshots() -> pd.DataFrame:
+    """Returns DataFrame with all snapshots of stored data."""
+    return SnapshotStore().list()
+
+
+if __name__ == '__main__':
+    pass
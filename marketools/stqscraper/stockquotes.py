@@ -1,55 +1,300 @@
-from . import get_storage_status, get_storage_dir
+from . import get_storage_status, get_storage_dir, get_storage_backend
+from .cache import ohlc_cache
+from .intraday import IntradayStore, INTRADAY_INTERVALS, read_intraday_csv
+from .manifest import get_manifest, checksum
+from .calendars import get_calendar
+from .planner import get_hit_budget
+from .locking import storage_lock
+from .daemon import get_daemon_client, daemon_unreachable, DaemonError
+from ..profiling import profiled, profiling_enabled, add_bytes
+from contextlib import nullcontext
 import pandas as pd
 import numpy as np
-from os import path
-from urllib.request import urlretrieve
-from datetime import datetime, timedelta
+import requests
+from io import BytesIO, SEEK_END
+from os import path, PathLike
+from datetime import datetime
+import time
 import warnings
 
 
-def read_ohlcv_from_csv(file_path):
+STOOQ_HITS_LIMIT_MARKERS = (b'Exceeded the daily hits limit',
+                            b'Przekroczony dzienny limit')
+
+
+def _date_key(day) -> bytes:
+    return pd.Timestamp(day).strftime('%Y-%m-%d').encode()
+
+
+def _next_line_start(f, offset, header_end):
+    """Returns offset of the first line starting at or after given offset."""
+    if offset <= header_end:
+        return header_end
+    f.seek(offset - 1)
+    f.readline()
+    return f.tell()
+
+
+def _bisect_lines(f, key, header_end, size, inclusive):
+    """
+    Returns offset of the first line with date greater than or equal to key
+    (greater than key if inclusive is False). Lines must be sorted by date.
+    """
+    lo, hi = header_end, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line_start = _next_line_start(f, mid, header_end)
+        if line_start >= size:
+            hi = mid
+            continue
+        f.seek(line_start)
+        date = f.readline()[:10]
+        if date >= key if inclusive else date > key:
+            hi = mid
+        else:
+            lo = mid + 1
+    return _next_line_start(f, lo, header_end)
+
+
+def _tail_lines(f, n, header_end, end, block=64 * 1024):
+    """Returns offset of the first of n lines ending at given offset."""
+    buffer = b''
+    position = end
+    while position > header_end and buffer.count(b'\n', 0, max(len(buffer) - 1, 0)) < n:
+        read_from = max(header_end, position - block)
+        f.seek(read_from)
+        buffer = f.read(position - read_from) + buffer
+        position = read_from
+
+    idx = len(buffer) - 1
+    for _ in range(n):
+        idx = buffer.rfind(b'\n', 0, idx)
+        if idx < 0:
+            return header_end
+    return position + idx + 1
+
+
+def read_ohlcv_from_csv(file_path, start=None, end=None, tail=None):
     """
-    Reads and returns OHLCV data from CSV file.
+    Reads and returns OHLCV data from CSV file. If start, end or tail is
+    given (and file_path is a path), only the requested rows are read from
+    disk - the rows are found by binary search over byte offsets in the file,
+    which must be sorted by date.
 
     Parameters
     ----------
-    file_path : str or os.path
-        path to CSV file with OHLCV data
+    file_path : str, os.path or file-like object
+        path to CSV file with OHLCV data, or buffer with CSV content
+    start : date, str or None
+        first date to read (inclusively)
+    end : date, str or None
+        last date to read (inclusively)
+    tail : int or None
+        maximal number of the most recent rows (before end) to read
     Returns
     -------
     pandas.DataFrame
     """
-    
-    output = pd.read_csv(file_path, 
-                         index_col='Date',
-                         parse_dates=['Date'],
-                         date_parser=lambda x: datetime.strptime(x, '%Y-%m-%d'))
+
+    bounded = start is not None or end is not None or tail is not None
+
+    if bounded and isinstance(file_path, (str, PathLike)):
+        with open(file_path, 'rb') as f:
+            header = f.readline()
+            header_end = f.tell()
+            size = f.seek(0, SEEK_END)
+            first = header_end
+            last = size
+            if end is not None:
+                last = _bisect_lines(f, _date_key(end), header_end, size, inclusive=False)
+            if start is not None:
+                first = _bisect_lines(f, _date_key(start), header_end, last, inclusive=True)
+            if tail is not None:
+                first = max(first, _tail_lines(f, tail, header_end, last))
+            f.seek(first)
+            content = f.read(max(last - first, 0))
+        add_bytes(len(header) + len(content))
+        return read_ohlcv_from_csv(BytesIO(header + content))
+
+    if profiling_enabled() and isinstance(file_path, (str, PathLike)):
+        add_bytes(path.getsize(file_path))
+
+    output = pd.read_csv(file_path, index_col='Date')
+    output.index = pd.to_datetime(output.index, format='%Y-%m-%d')
     output['Volume'] = output['Volume'].astype(np.float64)
+    if bounded:
+        output = slice_ohlc(output, start, end, tail)
     return output
 
 
+def slice_ohlc(ohlc, start=None, end=None, tail=None):
+    """
+    Returns rows of OHLC DataFrame (sorted by date) between start and end
+    (inclusively), limited to tail most recent rows.
+    """
+    output = ohlc.loc[start:end]
+    if tail is not None:
+        output = output.tail(tail)
+    return output
+
+
+def read_last_date(file_path):
+    """Returns date of the last row in CSV file with OHLCV data."""
+    last_row = read_ohlcv_from_csv(file_path, tail=1)
+    return last_row.index[-1] if not last_row.empty else None
+
+
+def ohlc_file_name(ticker, interval='d'):
+    """Returns name of CSV file with OHLC data for given ticker and interval."""
+    return f'{ticker}_ohcl_{interval}.csv'
+
+
+def is_hits_limit_response(content: bytes) -> bool:
+    """Returns True if Stooq response says that daily hits limit is exceeded."""
+    head = content[:512]
+    return any(marker in head for marker in STOOQ_HITS_LIMIT_MARKERS)
+
+
+def fetch_url(url, timeout=(5, 30), retries=3, chunk_size=64 * 1024):
+    """
+    Downloads content from given URL into memory. The response is streamed
+    in chunks (compressed transfer is used if the server offers it) and
+    failed requests are retried with exponential backoff.
+
+    Parameters
+    ----------
+    url : str
+        URL to download
+    timeout : float or tuple
+        connect and read timeouts in seconds
+    retries : int
+        number of retries after failed request
+    chunk_size : int
+        size of streamed chunks in bytes
+
+    Returns
+    -------
+    bytes
+    """
+    for attempt in range(retries + 1):
+        try:
+            with requests.get(url, stream=True, timeout=timeout,
+                              headers={'Accept-Encoding': 'gzip, deflate'}) as response:
+                response.raise_for_status()
+                buffer = BytesIO()
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    buffer.write(chunk)
+                add_bytes(buffer.tell())
+                return buffer.getvalue()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            server_error = not isinstance(e, requests.HTTPError) or e.response.status_code >= 500
+            if attempt == retries or not server_error:
+                raise
+            time.sleep(0.5 * 2**attempt)
+
+
 class StockQuotes:
 
     check_for_update = True  # if True OHLC data will be checked for updates
     update_period = 24  # time in hours, how often data are checked for updates
-    update_hour = 20  # full hour after that the data are checked for update
+    update_hour = None  # full hour (exchange time) after that the data are checked for update, from calendar if None
+    download_timeout = (5, 30)  # connect and read timeouts in seconds
+    download_retries = 3  # retries after failed download
+    intraday_partition = 'M'  # intraday data stored in files per day (D) or month (M)
+    use_daemon = True  # if True data are read from data daemon, when it is running
 
-    def __init__(self, ticker):
+    def __init__(self, ticker, storage=None):
         self.ticker = ticker
-        self._historical_ohlc = dict(d=None, w=None, m=None, q=None, y=None)
+        self.storage = storage  # e.g. Snapshot - data read only from it, never updated
+        self._frames = dict()
+
+    @property
+    def calendar(self):
+        """Trading calendar of exchange, inferred from the ticker."""
+        return get_calendar(self.ticker)
 
     @property
     def data(self):
         warnings.warn('data is depracted, use ohlc_d instead',
                       DeprecationWarning)
-        if self._historical_ohlc['d'] is None:
-            self._historical_ohlc['d'] = self._get_data(interval='d')
-        return self._historical_ohlc['d']
+        return self.ohlc(interval='d')
 
-    def ohlc(self, interval='d'):
-        if self._historical_ohlc[interval] is None:
-            self._historical_ohlc[interval] = self._get_data(interval=interval)
-        return self._historical_ohlc[interval]
+    @profiled
+    def ohlc(self, interval='d', start=None, end=None, tail=None):
+        """
+        Returns DataFrame with OHLC data. Data are cached in memory and shared
+        by all StockQuotes instances in the process; cached data are reloaded
+        after update_period if check_for_update is True.
+
+        If start, end or tail is given and the full history is not cached,
+        only the requested rows are read from the storage. When the data
+        daemon is running, data are read from the daemon. If the instance
+        was created with storage (e.g. Snapshot), data are read only from it.
+
+        Parameters
+        ----------
+        interval : str
+            single letter defining the interval for OHLC data:
+            d - day (default), w - weekly, m - monthly, q - quarterly,
+            y - yearly; or intraday interval in minutes: '5', '10', '15',
+            '30', '60'
+        start : date, str or None
+            first date (inclusively)
+        end : date, str or None
+            last date (inclusively)
+        tail : int or None
+            maximal number of the most recent rows (before end)
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        if self.storage is not None:
+            return self._get_snapshot_data(interval=interval, start=start, end=end, tail=tail)
+
+        client = get_daemon_client() if StockQuotes.use_daemon else None
+        if client is not None:
+            try:
+                return client.ohlc(self.ticker, interval, start=start, end=end, tail=tail)
+            except (ConnectionError, OSError):
+                daemon_unreachable()  # daemon stopped - read locally
+            except DaemonError:
+                pass  # daemon failed to handle the request - read locally
+
+        max_age = self._cache_max_age(interval)
+        bounded = start is not None or end is not None or tail is not None
+
+        if bounded:
+            output = ohlc_cache.peek(self.ticker, interval, max_age=max_age)
+            if output is None and get_storage_status() and not self._update_due(interval):
+                # only the requested rows are read; updates go through the
+                # cache, so the downloaded history is shared by all readers
+                return self._get_data(interval=interval, start=start, end=end, tail=tail)
+
+        output = ohlc_cache.get(self.ticker, interval,
+                                lambda: self._get_data(interval=interval),
+                                max_age=max_age)
+        if bounded:
+            output = slice_ohlc(output, start, end, tail)
+        return output
+
+    def _update_due(self, interval='d'):
+        """Returns True if reading OHLC data would download them from Stooq."""
+        if interval in INTRADAY_INTERVALS:
+            return self._intraday_update_required(interval)
+        return self._update_required(interval=interval)
+
+    def _cache_max_age(self, interval='d'):
+        """
+        Returns time in seconds after which cached OHLC data are reloaded:
+        update_period, or length of the bar for intraday data (new bars are
+        published during the session). None if check_for_update is False.
+        """
+        if not self.check_for_update:
+            return None
+        if interval in INTRADAY_INTERVALS:
+            return int(interval) * 60
+        return StockQuotes.update_period * 3600
 
     @property
     def ohlc_d(self):
@@ -74,82 +319,227 @@ class StockQuotes:
     def csv_file_path(self, interval='d'):
         if get_storage_status():
             output = path.join(get_storage_dir(),
-                               f'{self.ticker}_ohcl_{interval}.csv')
+                               ohlc_file_name(self.ticker, interval))
         else:
             output = None
         return output
 
+    @profiled
     def download_ohlc_from_stooq(self, interval='d'):
         """
-        Download CSV file with OHLC data from Stooq.com and reads the data into
-        DataFrame. Returns None if daily hits limit for Stooq is exceeded.
+        Downloads CSV with OHLC data from Stooq.com and reads the data into
+        DataFrame directly from memory. Returns None if daily hits limit for
+        Stooq is exceeded, and empty DataFrame if there are no data for the
+        ticker.
 
         Parameters
         ----------
         interval : str
             single letter defining the interval for OHLC data:
             d - day (default), w - weekly, m - monthly, q - quarterly,
-            y - yearly
+            y - yearly; or intraday interval in minutes
 
         Returns
         -------
         pandas.DataFrame
+            None if the daily hit limit is exceeded (data are not downloaded)
         """
-        url = f'http://stooq.com/q/d/l/?i={interval}&s={self.ticker}'
-        file_path, _ = urlretrieve(url)
-        try:
-            output = read_ohlcv_from_csv(file_path)
-        except ValueError:  # Stooq: Exceeded the daily hits limit
-            output = None
-        return output
+        budget = get_hit_budget()
+        if budget.remaining() == 0:
+            return None
+
+        url = f'https://stooq.com/q/d/l/?i={interval}&s={self.ticker}'
+        content = fetch_url(url,
+                            timeout=StockQuotes.download_timeout,
+                            retries=StockQuotes.download_retries)
+        budget.record()
+
+        if is_hits_limit_response(content):
+            budget.exhaust()
+            return None
+        if not content.lstrip(b'\xef\xbb\xbf').startswith(b'Date'):  # Stooq: No data
+            return pd.DataFrame()
+        if interval in INTRADAY_INTERVALS:
+            return read_intraday_csv(BytesIO(content))
+        return read_ohlcv_from_csv(BytesIO(content))
+
+    @staticmethod
+    def _is_up_to_date(last_date, fetch_time, calendar, time_now=None):
+        """
+        Returns True if data with given last bar date, downloaded at given
+        time (POSIX timestamp), do not need update. Data are up to date if
+        they contain the last session published according to the trading
+        calendar - holidays and early closes are taken into account.
+        """
+        time_now = time_now or datetime.now()
+        expected = calendar.last_published_session(time_now, StockQuotes.update_hour)
+        if last_date is not None and last_date.date() >= expected:
+            return True
+
+        # data for the expected session were missing when downloaded after
+        # their publication - do not retry more often than update_period
+        published = calendar.publication_time(expected, StockQuotes.update_hour)
+        return (fetch_time >= datetime.timestamp(published)
+                and datetime.timestamp(time_now) - fetch_time < StockQuotes.update_period * 3600)
+
+    def _manifest_entry(self, interval='d'):
+        """
+        Returns manifest entry for stored OHLC data. For data stored before
+        the manifest existed, the entry is created from the file (without
+        parsing it).
+        """
+        manifest = get_manifest()
+        entry = manifest.get(self.ticker, interval, 'ohlc')
+
+        if entry is None:
+            backend = get_storage_backend()
+            key = ohlc_file_name(self.ticker, interval)
+            content = backend.read(key)
+            if content is not None:
+                manifest.record(self.ticker, interval, 'ohlc',
+                                last_date=read_last_date(BytesIO(content)),
+                                rows=max(content.count(b'\n') - 1, 0),
+                                checksum=checksum(content),
+                                fetch_time=backend.modified(key))
+                entry = manifest.get(self.ticker, interval, 'ohlc')
 
-    def _get_data(self, interval='d'):
-        update_required = self.check_for_update  # assuming that update will be required
-        output = pd.DataFrame()
+        return entry
 
-        # time info 
+    def _update_required(self, interval='d'):
+        """Returns True if OHLC data should be downloaded from Stooq."""
+        if not self.check_for_update:
+            return False
+        if not get_storage_status():
+            return True
+
+        entry = self._manifest_entry(interval=interval)
+        if entry is None:
+            return True
+        return not StockQuotes._is_up_to_date(entry.last_date, entry.fetch_time, self.calendar)
+
+    @classmethod
+    def stale(cls, tickers, interval='d'):
+        """
+        Returns list of tickers for which stored OHLC data need update. The
+        decision is made with a single manifest lookup, without reading data
+        files.
+        """
+        entries = get_manifest().lookup(tickers, interval=interval, dataset='ohlc')
         time_now = datetime.now()
-        weekday_now = datetime.weekday(time_now)
-        is_weekend = True if weekday_now in (5, 6) else False
-
-        # calculate expected date for last OHLC data, consider only weekdays 
-        # from Mo-Fr, assume that last update was one day earlier 
-        delta_days = (weekday_now - 4) if is_weekend else 0
-        expected_ohlc_time = time_now - timedelta(days=delta_days)
-
-        # file with data for ticker exists
-        if get_storage_status() and path.exists(self.csv_file_path(interval=interval)):
-            timestamp_now = datetime.timestamp(time_now)
-            timestamp_up = path.getatime(self.csv_file_path(interval=interval))  # CSV file modification time
-
-            # CSV updated within last 24 hours or it is weekend (no new data) 
-            if (timestamp_now - timestamp_up < StockQuotes.update_period * 3600) or is_weekend:
-                output = read_ohlcv_from_csv(self.csv_file_path(interval=interval))
-                last_ohlc_time = output.iloc[-1].name
-
-                updated_data = last_ohlc_time.date() == expected_ohlc_time.date()
-                session_time = time_now.hour < StockQuotes.update_hour and not is_weekend
-                if updated_data or session_time:
-                    update_required = False
-
-        if update_required:
-            # update CSV file and read data 
-            new_output = self.download_ohlc_from_stooq(interval=interval)
-
-            if not new_output.empty:
-                # Updated data downloaded - update output
-                output = new_output
-                # save to CSV
-                if get_storage_status():
-                    new_output.to_csv(self.csv_file_path(interval=interval))
-            else:
-                # Update error (Stooq: Exceeded the daily hits limit) 
-                pass
-    
-        if not output.empty:
-            output.sort_index(ascending=True, inplace=True)
-        
-        return output
+        return [t for t, last_date, fetch_time in zip(entries.index, entries['Last date'], entries['Fetch time'])
+                if pd.isna(fetch_time) or not cls._is_up_to_date(last_date, fetch_time, get_calendar(t), time_now)]
+
+    def _storage_lock(self, interval='d'):
+        """
+        Returns lock serializing refreshes of OHLC data of the ticker between
+        processes sharing the storage (no lock if storage is disabled).
+        """
+        return storage_lock(self.ticker, interval, 'ohlc') if get_storage_status() else nullcontext()
+
+    @profiled
+    def _sync(self, interval='d'):
+        """
+        Brings newer OHLC data from shared storage backend, e.g., data
+        downloaded by other machine. Returns True if data were updated.
+        """
+        if not get_storage_status() or not get_storage_backend().sync(ohlc_file_name(self.ticker, interval)):
+            return False
+        get_manifest().remove(self.ticker, interval, 'ohlc')  # recreated from new content
+        return True
+
+    @profiled
+    def _store_ohlc(self, data, interval='d'):
+        """Saves OHLC data in storage backend and records them in the manifest."""
+        content = data.to_csv().encode()
+        get_storage_backend().write(ohlc_file_name(self.ticker, interval), content)
+        get_manifest().record(self.ticker, interval, 'ohlc',
+                              last_date=data.index[-1], rows=len(data),
+                              checksum=checksum(content))
+
+    def _store_intraday(self, data, interval):
+        """Appends intraday OHLC data to IntradayStore and records them in the manifest."""
+        store = IntradayStore(self.ticker, interval, partition=StockQuotes.intraday_partition)
+        store.append(data)
+        get_manifest().record(self.ticker, interval, 'ohlc',
+                              last_date=store.last_timestamp(), rows=store.rows())
+
+    @profiled
+    def _get_snapshot_data(self, interval='d', start=None, end=None, tail=None):
+        """Reads OHLC data from storage given to the instance, without updates."""
+        if interval not in self._frames:
+            content = self.storage.read(ohlc_file_name(self.ticker, interval))
+            self._frames[interval] = pd.DataFrame() if content is None \
+                else read_ohlcv_from_csv(BytesIO(content))
+        output = self._frames[interval]
+        if output.empty:
+            return output
+        return slice_ohlc(output, start, end, tail)
+
+    def _intraday_update_required(self, interval):
+        """Returns True if intraday data were not downloaded within the interval."""
+        entry = get_manifest().get(self.ticker, interval, 'ohlc') if get_storage_status() else None
+        if self.check_for_update and entry is not None:
+            return datetime.timestamp(datetime.now()) - entry.fetch_time > 60 * int(interval)
+        return self.check_for_update
+
+    @profiled
+    def _get_intraday_data(self, interval, start=None, end=None, tail=None):
+        store = IntradayStore(self.ticker, interval, partition=StockQuotes.intraday_partition)
+        use_storage = get_storage_status()
+
+        if self._intraday_update_required(interval):
+            with self._storage_lock(interval):
+                # other process could update data while this one was waiting
+                new_output = self.download_ohlc_from_stooq(interval=interval) \
+                    if self._intraday_update_required(interval) else None
+                if new_output is not None and not new_output.empty:
+                    new_output.sort_index(ascending=True, inplace=True)
+                    if not use_storage:
+                        return slice_ohlc(new_output, start, end, tail)
+                    self._store_intraday(new_output, interval=interval)
+
+        if use_storage:
+            return store.read(start=start, end=end, tail=tail)
+
+        return pd.DataFrame()
+
+    @profiled
+    def _get_data(self, interval='d', start=None, end=None, tail=None):
+        if interval in INTRADAY_INTERVALS:
+            return self._get_intraday_data(interval, start=start, end=end, tail=tail)
+
+        if self._update_required(interval=interval):
+            with self._storage_lock(interval):
+                # other process (or machine sharing the storage backend)
+                # could update the data while this one was waiting for the
+                # lock - then the stored data are used
+                if self._update_required(interval=interval):
+                    self._sync(interval=interval)
+                if self._update_required(interval=interval):
+                    # update CSV file and read data 
+                    new_output = self.download_ohlc_from_stooq(interval=interval)
+
+                    if new_output is not None and not new_output.empty:
+                        # Updated data downloaded - save to CSV
+                        new_output.sort_index(ascending=True, inplace=True)
+                        if get_storage_status():
+                            self._store_ohlc(new_output, interval=interval)
+                        return slice_ohlc(new_output, start, end, tail)
+                    else:
+                        # Update error (Stooq: Exceeded the daily hits limit) - use stored data
+                        pass
+
+        if get_storage_status():
+            backend = get_storage_backend()
+            key = ohlc_file_name(self.ticker, interval)
+            file_path = backend.local_path(key)
+            if file_path is not None:
+                return read_ohlcv_from_csv(file_path, start=start, end=end, tail=tail)
+            content = backend.read(key)
+            if content is not None:
+                return read_ohlcv_from_csv(BytesIO(content), start=start, end=end, tail=tail)
+
+        return pd.DataFrame()
 
 
 if __name__ == '__main__':
@@ -1,24 +1,102 @@
 import pandas as pd
+import numpy as np
 from datetime import date
+from marketools.journal import Journal, replay
 
 
 class Commission:
-    def __init__(self, rate: float, minimum: float):
+    """
+    Broker commission model.
+
+    The fee for a trade of value V is ``fixed + rate(V) * V``, rounded to
+    0.01, but never less than ``minimum``. Without tiers ``rate(V)`` is simply
+    ``rate``. With tiers, the rate of the highest tier whose threshold does
+    not exceed V applies to the whole trade value.
+
+    Attributes
+    ----------
+    rate : float
+        commission rate (fraction of trade value) below the first tier
+    minimum : float
+        minimal fee for a single trade
+    fixed : float
+        fixed part of the fee charged on every trade (0 by default)
+    tiers : tuple
+        tuple of (threshold, rate) pairs sorted by threshold
+    """
+
+    def __init__(self, rate: float, minimum: float, fixed: float = 0.0,
+                 tiers=None):
         if minimum < 0:
             raise ValueError('minimum has to be non-negative value')
         if rate <= 0:
             raise ValueError('rate has to be positive value')
+        if fixed < 0:
+            raise ValueError('fixed has to be non-negative value')
+
+        tiers = tuple(sorted((float(t), float(r)) for t, r in (tiers or ())))
+        for threshold, tier_rate in tiers:
+            if threshold <= 0:
+                raise ValueError('tier threshold has to be positive value')
+            if tier_rate <= 0:
+                raise ValueError('tier rate has to be positive value')
 
         self.rate = rate
         self.minimum = minimum
+        self.fixed = fixed
+        self.tiers = tiers
+        self._thresholds = np.array([t for t, _ in tiers], dtype=np.float64)
+        self._rates = np.array([rate] + [r for _, r in tiers], dtype=np.float64)
+
+    def rates(self, trade):
+        """
+        Returns commission rate applied to given trade value(s).
+
+        Parameters
+        ----------
+        trade : float, numpy.ndarray or pandas.Series
+            trade value(s)
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        values = np.asarray(trade, dtype=np.float64)
+        if not self.tiers:
+            return np.full_like(values, self.rate)
+        tier = np.searchsorted(self._thresholds, values, side='right')
+        return self._rates[tier]
+
+    def __call__(self, trade, *args, **kwargs):
+        """
+        Returns fee for given trade value. Accepts a single value, NumPy array
+        or pandas Series - for arrays all the fees are calculated in one call
+        and returned in the same container type.
+        """
+        values = np.asarray(trade, dtype=np.float64)
+        fee = np.round(self.fixed + values * self.rates(values), 2)
+        fee = np.maximum(fee, self.minimum)
 
-    def __call__(self, trade: float, *args, **kwargs) -> float:
-        fee = trade * self.rate
-        fee = round(fee, 2)
-        return max(fee, self.minimum)
+        if isinstance(trade, pd.Series):
+            return pd.Series(fee, index=trade.index, name=trade.name)
+        if fee.ndim == 0:
+            return float(fee)
+        return fee
 
     def minimal_recommended_investment(self):
-        return self.minimum / self.rate
+        """
+        Returns the lowest trade value for which the fee is not set by the
+        minimal commission, i.e., the proportional part of the fee covers
+        the minimum.
+        """
+        needed = max(self.minimum - self.fixed, 0)
+        lower_bounds = np.concatenate(([0.0], self._thresholds))
+        upper_bounds = np.concatenate((self._thresholds, [np.inf]))
+
+        for low, high, rate in zip(lower_bounds, upper_bounds, self._rates):
+            value = max(low, needed / rate)
+            if value < high:  # always true for the last, unbounded tier
+                return value
 
 
 class Wallet(Commission):
@@ -36,12 +114,17 @@ class Wallet(Commission):
         'Purchase price' - purchase price
         'Purchase date' - date of first purchase (position opening date)
         'Price' - latest stock price
+    journal : Journal
+        append-only journal of all executed transactions
     """
 
-    def __init__(self, commission_rate: float, min_commission):
-        super().__init__(commission_rate, min_commission)
+    def __init__(self, commission_rate: float, min_commission,
+                 fixed_commission: float = 0.0, commission_tiers=None):
+        super().__init__(commission_rate, min_commission,
+                         fixed=fixed_commission, tiers=commission_tiers)
         self.money = 0
         self.stocks = pd.DataFrame(columns=['Name', 'Volume', 'Purchase price', 'Purchase date', 'Price'])
+        self.journal = Journal()
 
     @property
     def stocks(self) -> pd.DataFrame:
@@ -84,13 +167,14 @@ class Wallet(Commission):
 
         """ calculate cost """
         cost = bought * price
-        cost += self(cost)
+        fee = self(cost)
+        cost += fee
 
         """ enough money in wallet to buy? """
         if cost <= self.money:
             if not in_wallet:
                 """ stocks not in wallet - append them """
-                self.stocks = self.stocks.append(other, ignore_index=True)
+                self.stocks = pd.concat([self.stocks, other], ignore_index=True)
             else:
                 """ stocks in wallet - increase volume and calculate average purchase price """
                 idx = self.__get_stocks_index(name)
@@ -100,6 +184,8 @@ class Wallet(Commission):
                 self.stocks.loc[idx, 'Purchase price'] = avg_price
 
             self.money -= cost
+            purchase_date = other.loc[0, 'Purchase date'] if 'Purchase date' in other else None
+            self.journal.append(name, 'buy', bought, price, fee, purchase_date)
 
         return self
 
@@ -129,8 +215,11 @@ class Wallet(Commission):
 
             """ calculate gain """
             gain = sold * price
-            gain -= self(gain)
+            fee = self(gain)
+            gain -= fee
             self.money += gain
+            sale_date = other.loc[0, 'Sale date'] if 'Sale date' in other else None
+            self.journal.append(name, 'sell', sold, price, fee, sale_date)
 
         return self
 
@@ -166,18 +255,23 @@ class Wallet(Commission):
         else:
             return None
 
-    def buy(self, name: str, volume: int, price: float, purchase_date: date = date.today()) -> None:
+    def buy(self, name: str, volume: int, price: float, purchase_date: date = None) -> None:
+        if purchase_date is None:
+            purchase_date = date.today()
         stock = pd.DataFrame({'Name': [name],
                               'Volume': [volume],
                               'Purchase price': [price],
-                              'Purchase date': [date],
+                              'Purchase date': [purchase_date],
                               'Price': [price]})
         self.__add__(stock)
 
-    def sell(self, name: str, volume: int, price: float) -> None:
+    def sell(self, name: str, volume: int, price: float, sale_date: date = None) -> None:
+        if sale_date is None:
+            sale_date = date.today()
         stock = pd.DataFrame({'Name': [name],
                               'Volume': [volume],
-                              'Price': [price]})
+                              'Price': [price],
+                              'Sale date': [sale_date]})
         self.__sub__(stock)
 
     def sell_all(self, name: str, price: float) -> float:
@@ -185,6 +279,111 @@ class Wallet(Commission):
         self.sell(name, volume, price)
         return volume
 
+    def execute(self, names, volumes, prices, timestamp=None) -> np.ndarray:
+        """
+        Executes many orders in one call - fees of all orders are calculated
+        in one commission call and stocks are updated once. Sales are
+        executed before purchases (money from sales can be used for
+        purchases), otherwise in order of the lists. As in buy and sell,
+        orders are skipped if there is not enough money or stocks.
+
+        Parameters
+        ----------
+        names : list
+            tickers
+        volumes : list or numpy.ndarray
+            number of shares, positive - buy, negative - sell
+        prices : list or numpy.ndarray
+            prices of a single share
+        timestamp : datetime, date or None
+            time of transactions (purchase date of new positions), today if
+            None
+
+        Returns
+        -------
+        numpy.ndarray
+            boolean mask of executed orders
+        """
+        volumes = np.asarray(volumes)
+        prices = np.asarray(prices, dtype=np.float64)
+        executed = np.zeros(len(volumes), dtype=bool)
+        if not len(volumes):
+            return executed
+        if timestamp is None:
+            timestamp = date.today()
+
+        values = np.abs(volumes) * prices
+        fees = np.asarray(self(values))
+        columns = list(self.stocks.columns)
+        rows = zip(*(self.stocks[c].tolist() for c in columns))
+        positions = {row[0]: dict(zip(columns, row)) for row in rows}
+
+        for i in np.flatnonzero(volumes < 0):
+            name, sold = names[i], -volumes[i]
+            position = positions.get(name)
+            if position is None or position['Volume'] < sold:
+                continue
+            if position['Volume'] == sold:
+                del positions[name]
+            else:
+                position['Volume'] -= sold
+                position['Price'] = prices[i]
+            self.money += values[i] - fees[i]
+            self.journal.append(name, 'sell', sold, prices[i], fees[i], timestamp)
+            executed[i] = True
+
+        for i in np.flatnonzero(volumes > 0):
+            name, bought, price = names[i], volumes[i], prices[i]
+            cost = values[i] + fees[i]
+            if cost > self.money:
+                continue
+            position = positions.get(name)
+            if position is None:
+                positions[name] = {'Name': name, 'Volume': bought, 'Purchase price': price,
+                                   'Purchase date': timestamp, 'Price': price}
+            else:
+                in_wallet = position['Volume']
+                position['Purchase price'] = (price * bought + position['Purchase price'] * in_wallet) \
+                    / (bought + in_wallet)
+                position['Volume'] = in_wallet + bought
+                position['Price'] = price
+            self.money -= cost
+            self.journal.append(name, 'buy', bought, price, fees[i], timestamp)
+            executed[i] = True
+
+        if executed.any():
+            # built from column arrays - much faster than from records
+            output = dict()
+            for column, dtype in self.stocks.dtypes.items():
+                column_values = [p[column] for p in positions.values()]
+                if dtype.kind in 'iuf':
+                    output[column] = np.array(column_values, dtype=np.float64)
+                else:
+                    output[column] = np.empty(len(column_values), dtype=object)
+                    output[column][:] = column_values
+            self.stocks = pd.DataFrame(output, copy=False)
+        return executed
+
+    def replay(self, journal: Journal, until=None, money: float = 0) -> None:
+        """
+        Restores wallet state (stocks and money) from the journal of
+        transactions, e.g., after restart or for auditing.
+
+        Parameters
+        ----------
+        journal : Journal
+            journal with transactions
+        until : datetime, date or None
+            if given, the wallet state at this time is restored
+        money : float
+            money in the wallet before the first transaction in the journal
+        """
+        # the wallet appends to its own copy of the journal
+        journal = journal.copy() if until is None else journal.until(until)
+        self.stocks, cash = replay(journal)
+        self.money = money + cash
+        self.journal = journal
+
     def list_stocks(self) -> list:
         return self.stocks.loc[:, 'Name'].to_list()
 
@@ -193,6 +392,24 @@ class Wallet(Commission):
         if idx is not None:
             self.stocks.loc[idx, 'Price'] = price
 
+    def update_prices(self, prices=None) -> None:
+        """
+        Updates prices of all owned stocks in one call. Stocks without new
+        price keep the previous one.
+
+        Parameters
+        ----------
+        prices : dict or pandas.Series
+            ticker -> price; if None, the last prices of all owned stocks
+            are downloaded from Stooq in batch (get_last_quotes)
+        """
+        if prices is None:
+            from marketools.stqscraper.scrapers import get_last_quotes
+            prices = get_last_quotes(self.list_stocks())['Close']
+        prices = pd.Series(prices, dtype=np.float64)
+        new_prices = self.stocks['Name'].map(prices)
+        self.stocks['Price'] = new_prices.fillna(self.stocks['Price'])
+
     def change(self, name: str) -> float:
         idx = self.__get_stocks_index(name)
         purchase_price = self.stocks.loc[idx, 'Purchase price']
@@ -19,10 +19,21 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     python_requires='>=3.8',
+    entry_points={
+        'console_scripts': [
+            'marketools-ingest=marketools.stqscraper.bulk:main',
+            'marketools-daemon=marketools.stqscraper.daemon:main',
+        ],
+    },
     install_requires=[
         'pandas>=1.1.4',
         'requests>=2.25.0',
         'numpy>=1.19.4',
         'lxml>=4.6.2'
     ],
+    extras_require={
+        'dask': ['dask[distributed]'],
+        'ray': ['ray'],
+        'query': ['polars'],
+    },
 )
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.wallet import Wallet
+from marketools.allocation import RollingMoments, ledoit_wolf, mean_variance_weights, \
+    risk_parity_weights, optimize_weights, target_volumes
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    factor = rng.normal(0, 0.01, (400, 1))
+    values = factor * rng.uniform(0.5, 1.5, 8) + rng.normal(0.0005, 0.01, (400, 8)) * np.arange(1, 9) / 4
+    return pd.DataFrame(values, index=pd.bdate_range('2019-01-01', periods=400),
+                        columns=[f'T{i}' for i in range(8)])
+
+
+def test_ledoit_wolf():
+    rng = np.random.default_rng(0)
+    x = rng.normal(0, 1, (30, 20))
+    cov, shrinkage = ledoit_wolf(x)
+    assert 0 < shrinkage < 1
+    sample = np.cov(x, rowvar=False, bias=True)
+    mu = np.trace(sample) / 20
+    np.testing.assert_allclose((1 - shrinkage) * sample + shrinkage * mu * np.eye(20), cov)
+    # smallest eigenvalue pulled away from zero
+    assert np.linalg.eigvalsh(cov)[0] > np.linalg.eigvalsh(sample)[0]
+
+
+def test_ledoit_wolf__sklearn():
+    covariance = pytest.importorskip('sklearn.covariance')
+    x = np.random.default_rng(0).normal(0, 1, (60, 10))
+    expected, expected_shrinkage = covariance.ledoit_wolf(x)
+    cov, shrinkage = ledoit_wolf(x)
+    assert expected_shrinkage == pytest.approx(shrinkage)
+    np.testing.assert_allclose(expected, cov)
+
+
+def test_rolling_moments(returns):
+    moments = RollingMoments(returns, window=100)
+    moments.refresh = 3
+    for end in [100, 101, 103, 150, 151, 152, 153, 154, 300, 120, 400]:
+        cov, shrinkage = moments.covariance(end)
+        expected, expected_shrinkage = ledoit_wolf(returns.iloc[end - 100:end])
+        np.testing.assert_allclose(expected, cov, rtol=1e-9, atol=1e-15)
+        assert expected_shrinkage == pytest.approx(shrinkage, rel=1e-9)
+
+
+def test_mean_variance_weights__unconstrained():
+    cov = np.array([[0.04, 0.01], [0.01, 0.09]])
+    mu = np.array([0.08, 0.10])
+    weights, _ = mean_variance_weights(cov, mu, risk_aversion=4.0, tol=1e-12)
+    # interior solution: w = inv(cov) @ (mu - lambda) / risk_aversion, sum(w) = 1
+    inverse = np.linalg.inv(cov)
+    lam = (np.ones(2) @ inverse @ mu - 4.0) / (np.ones(2) @ inverse @ np.ones(2))
+    np.testing.assert_allclose(inverse @ (mu - lam) / 4.0, weights, atol=1e-8)
+
+
+def test_mean_variance_weights__bounds():
+    cov = np.diag([0.01, 0.04, 0.09])
+    weights, _ = mean_variance_weights(cov, np.array([0.5, 0.0, 0.0]), max_weight=0.6)
+    np.testing.assert_allclose([0.6, 0.4 * 0.09 / 0.13, 0.4 * 0.04 / 0.13], weights, atol=1e-6)
+    with pytest.raises(ValueError):
+        mean_variance_weights(cov, np.zeros(3), max_weight=0.3)
+
+
+def test_risk_parity_weights(returns):
+    cov, _ = ledoit_wolf(returns)
+    weights, _ = risk_parity_weights(cov)
+    contributions = weights * (cov @ weights)
+    np.testing.assert_allclose(contributions, contributions.mean(), rtol=1e-8)
+    assert 1 == pytest.approx(weights.sum())
+
+
+@pytest.mark.parametrize("method", ['risk_parity', 'mean_variance'])
+def test_optimize_weights(returns, method):
+    output = optimize_weights(returns, method=method, window=250, rebalance=10, max_weight=0.5)
+    assert list(returns.index[249::10]) == list(output.index)
+    np.testing.assert_allclose(1, output.sum(axis=1))
+    assert (output >= 0).all().all()
+
+    date = output.index[5]
+    cov, _ = ledoit_wolf(returns.loc[:date].tail(250))
+    if 'risk_parity' == method:
+        expected, _ = risk_parity_weights(cov)
+    else:
+        expected, _ = mean_variance_weights(cov, returns.loc[:date].tail(250).mean().to_numpy(),
+                                            max_weight=0.5, tol=1e-12)
+    np.testing.assert_allclose(expected, output.loc[date], atol=1e-6)
+
+    dates = optimize_weights(returns, method=method, window=250, rebalance=output.index[[2, 7]], max_weight=0.5)
+    np.testing.assert_allclose(output.iloc[[2, 7]], dates, atol=1e-6)
+
+
+def test_target_volumes():
+    wallet = Wallet(0.0038, 3.0)  # minimal recommended investment ~789
+    wallet.money = 8000
+    wallet.buy('OLD', 10, 100)  # to be sold
+    wallet.buy('AAA', 20, 50)
+    prices = pd.Series({'AAA': 50.0, 'BBB': 20.0, 'CCC': 10.0, 'OLD': 100.0})
+    weights = pd.Series({'AAA': 0.5, 'BBB': 0.45, 'CCC': 0.05})
+
+    output = target_volumes(wallet, weights, prices)
+
+    assert ['AAA', 'BBB', 'CCC', 'OLD'] == list(output.index)
+    assert 0 == output['OLD'] and 0 == output['CCC']  # CCC below minimal investment
+    volume = wallet.stocks.groupby('Name')['Volume'].sum().reindex(output.index, fill_value=0)
+    trades = (output - volume) * prices
+    cash = wallet.money - trades.sum() - sum(wallet(abs(v)) for v in trades if v)
+    assert cash >= 0
+    assert cash < 2 * 50  # almost everything invested
+    assert output['AAA'] * 50 == pytest.approx(output['BBB'] * 20 * 0.5 / 0.45, rel=0.05)
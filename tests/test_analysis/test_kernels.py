@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+from marketools.analysis import kernels, ema, rsi, heikinashi
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (4, 2000)), axis=1))
+
+
+@pytest.mark.parametrize("alpha,adjust", [(0.1, False), (0.1, True), (2 / 27, True), (1.0, False)])
+def test_ewm(prices, alpha, adjust):
+    output = kernels.ewm(prices, alpha, adjust=adjust)
+    for row, out_row in zip(prices, output):
+        expected = pd.Series(row).ewm(alpha=alpha, adjust=adjust).mean()
+        assert expected.to_numpy() == pytest.approx(out_row, rel=1e-10)
+
+
+@pytest.mark.parametrize("window", [1, 5, 20])
+def test_sma(prices, window):
+    output = kernels.sma(prices, window)
+    for row, out_row in zip(prices, output):
+        expected = pd.Series(row).rolling(window).mean().to_numpy()
+        np.testing.assert_allclose(expected, out_row, rtol=1e-10)
+
+
+@pytest.mark.parametrize("window", [1, 5, 20])
+def test_wma(prices, window):
+    weights = np.arange(1, window + 1)
+    output = kernels.wma(prices, window)
+    for row, out_row in zip(prices, output):
+        expected = pd.Series(row).rolling(window).apply(lambda p: np.dot(p, weights) / weights.sum(), raw=True)
+        np.testing.assert_allclose(expected.to_numpy(), out_row, rtol=1e-10)
+
+
+def test_sma__nan():
+    x = np.array([1.0, 2.0, np.nan, 4.0, 5.0, 6.0])
+    expected = pd.Series(x).rolling(2).mean().to_numpy()
+    np.testing.assert_allclose(expected, kernels.sma(x, 2))
+
+
+def test_ewm__nan_gap(prices):
+    x = prices[:2, :40].copy()
+    x[0, 20] = np.nan
+    x[1, :3] = np.nan
+    for adjust in (False, True):
+        output = kernels.ewm(x, 0.2, adjust=adjust)
+        for row, out_row in zip(x, output):
+            expected = pd.Series(row).ewm(alpha=0.2, adjust=adjust).mean().to_numpy()
+            np.testing.assert_allclose(expected, out_row, rtol=1e-10)
+    assert not np.isnan(output[0, 20:]).any()
+
+
+def test_ema_rsi__nan_gap(prices):
+    close = prices[0, :40].copy()
+    close[30] = np.nan
+    df = pd.DataFrame({'Close': close})
+    expected = df['Close'].ewm(span=5, adjust=False).mean()
+    pd.testing.assert_series_equal(expected.iloc[-3:], ema(df, window=5).iloc[-3:], check_names=False)
+    assert np.isfinite(rsi(df).iloc[-3:]).all()
+
+
+@pytest.fixture
+def long_prices():
+    rng = np.random.default_rng(1)
+    return 1e4 * np.exp(np.cumsum(rng.normal(0, 0.001, 100_000)))
+
+
+@pytest.mark.parametrize("window", [20, 200])
+def test_sma_wma__long_series(long_prices, window):
+    windows = sliding_window_view(long_prices, window)
+    weights = np.arange(1, window + 1)
+    np.testing.assert_allclose(windows.mean(axis=-1), kernels.sma(long_prices, window)[window - 1:], rtol=1e-13)
+    np.testing.assert_allclose(windows @ weights / weights.sum(), kernels.wma(long_prices, window)[window - 1:],
+                               rtol=1e-13)
+
+
+@pytest.mark.parametrize("window", [20, 200])
+def test_rolling_std__long_series(long_prices, window):
+    expected = sliding_window_view(long_prices, window).std(axis=-1, ddof=1)
+    output = kernels.rolling_std(long_prices, window, ddof=1)[window - 1:]
+    np.testing.assert_allclose(expected, output, rtol=1e-10)
+    pandas = pd.Series(long_prices).rolling(window).std().to_numpy()[window - 1:]
+    np.testing.assert_allclose(pandas, output, rtol=1e-6)
+
+
+def test_sma__window_longer_than_data():
+    assert np.isnan(kernels.sma(np.ones(3), 5)).all()
+
+
+def test_rsi__out_buffer(prices):
+    out = np.empty_like(prices)
+    result = kernels.rsi(prices, 14, out=out)
+    assert result is out
+    assert ((out >= 0) & (out <= 100)).all()
+
+
+def test_out_buffer__wrong_shape(prices):
+    with pytest.raises(ValueError):
+        kernels.macd(prices, out=np.empty_like(prices))
+
+
+def test_heikinashi__rows_independent(prices):
+    high, low = prices * 1.01, prices * 0.99
+    output = kernels.heikinashi(prices, high, low, prices)
+    single = kernels.heikinashi(prices[2], high[2], low[2], prices[2])
+    np.testing.assert_allclose(output[:, 2], single)
+
+    prices = prices.copy()
+    prices[1, 10:20] = np.nan
+    output = kernels.heikinashi(prices, high, low, prices)
+    np.testing.assert_allclose(output[:, 2], single)
+
+
+def test_heikinashi__nan(prices):
+    ohlc = pd.DataFrame({'Open': prices[0, :500], 'High': prices[0, :500] * 1.01,
+                         'Low': prices[0, :500] * 0.99, 'Close': prices[0, :500]})
+    ohlc.iloc[3, 3] = np.nan  # missing close
+    ohlc.iloc[100:103] = np.nan  # missing bars
+    ohlc.iloc[499] = np.nan
+
+    # pandas: mean and max/min skip NaN, open is carried over bars without prices
+    close = ohlc.mean(axis=1).to_numpy()
+    open_ = np.empty(len(ohlc))
+    open_[0] = ohlc['Open'].iloc[0]
+    for t in range(1, len(ohlc)):
+        open_[t] = open_[t - 1] if np.isnan(close[t - 1]) else (open_[t - 1] + close[t - 1]) / 2
+
+    output = heikinashi(ohlc)
+    np.testing.assert_allclose(open_, output['Open'].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(close, output['Close'].to_numpy(), rtol=1e-12)
+    assert 4 == output['Close'].isna().sum()  # only bars without prices
+    assert not output['Open'].isna().any()
+    assert not output.iloc[:499]['High'].isna().any()
+
+
+@pytest.mark.parametrize("window", [1, 3, 20, 2000])
+def test_rolling_max_min(prices, window):
+    prices = prices.copy()
+    prices[1, 50] = np.nan
+    maxima = kernels.rolling_max(prices, window)
+    minima = kernels.rolling_min(prices, window)
+    for row, max_row, min_row in zip(prices, maxima, minima):
+        np.testing.assert_allclose(pd.Series(row).rolling(window).max().to_numpy(), max_row)
+        np.testing.assert_allclose(pd.Series(row).rolling(window).min().to_numpy(), min_row)
+
+
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_rolling_var(prices, ddof):
+    output = kernels.rolling_var(prices, [2, 20], ddof=ddof)
+    assert (2,) + prices.shape == output.shape
+    for i, window in enumerate([2, 20]):
+        for row, out_row in zip(prices, output[i]):
+            expected = pd.Series(row).rolling(window).var(ddof=ddof).to_numpy()
+            # cumulative sums lose relative precision for nearly constant windows
+            np.testing.assert_allclose(expected, out_row, rtol=1e-8, atol=1e-8)
+
+
+def test_windows_batch_matches_single(prices):
+    batched = kernels.bollinger(prices, [10, 20])
+    np.testing.assert_array_equal(kernels.bollinger(prices, 20), batched[1])
+    batched = kernels.atr(prices * 1.01, prices * 0.99, prices, (5, 14))
+    np.testing.assert_array_equal(kernels.atr(prices * 1.01, prices * 0.99, prices, 5), batched[0])
+
+
+def test_max_drawdown():
+    x = np.array([10.0, 12.0, 9.0, 11.0, 6.0, 13.0])
+    np.testing.assert_allclose([0, 0, -0.25, -0.25, -0.5, -0.5], kernels.max_drawdown(x))
+    np.testing.assert_allclose([np.nan, 0, -0.25, 0, -5 / 11, 0], kernels.max_drawdown(x, 2))
+    np.testing.assert_allclose([np.nan, np.nan, -0.25, -0.25, -5 / 11, -5 / 11], kernels.max_drawdown(x, 3))
+
+
+@pytest.mark.parametrize("window", [1, 3, 7, 20])
+def test_max_drawdown__window(prices, window):
+    x = prices[:2, :200].copy()
+    x[0, 50] = np.nan
+    output = kernels.max_drawdown(x, window)
+    for row, out_row in zip(x, output):
+        expected = np.full(len(row), np.nan)
+        for t in range(window - 1, len(row)):
+            values = row[t - window + 1:t + 1]
+            expected[t] = np.min(values / np.maximum.accumulate(values)) - 1
+        np.testing.assert_allclose(expected, out_row, rtol=1e-12, atol=1e-15)
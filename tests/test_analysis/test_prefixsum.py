@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.analysis import PrefixSumIndex, mean_volume_on_date
+
+
+@pytest.fixture
+def ohlc():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2015-01-01', periods=1500)
+    volume = rng.integers(1000, 100000, len(dates)).astype(float)
+    volume[[10, 500]] = np.nan
+    return pd.DataFrame({'Close': rng.normal(100, 5, len(dates)), 'Volume': volume},
+                        index=pd.Index(dates, name='Date'))
+
+
+@pytest.mark.parametrize("day,window", [
+    ('2016-06-15', 90),
+    ('2016-06-18', 20),  # weekend
+    ('2015-01-05', 90),  # shorter history than window
+    ('2014-01-01', 10),  # before history
+    ('2030-01-01', 5),
+])
+def test_prefix_sum_index__mean_volume(ohlc, day, window):
+    index = PrefixSumIndex.from_ohlc(ohlc)
+    expected = mean_volume_on_date(ohlc, day, window)
+    result = mean_volume_on_date(index, day, window)
+    if np.isnan(expected):
+        assert np.isnan(result)
+    else:
+        assert expected == pytest.approx(result)
+
+
+def test_prefix_sum_index__batch(ohlc):
+    index = PrefixSumIndex.from_ohlc(ohlc)
+    days = ohlc.index[::50]
+    windows = np.arange(1, len(days) + 1) * 3
+
+    result = index.mean('Close', days, windows)
+    expected = [ohlc[:d].tail(w)['Close'].mean() for d, w in zip(days, windows)]
+
+    assert expected == pytest.approx(result)
+    assert [ohlc[:d].tail(w)['Close'].sum() for d, w in zip(days, windows)] \
+        == pytest.approx(index.sum('Close', days, windows))
+
+
+def test_prefix_sum_index__extend(ohlc):
+    index = PrefixSumIndex.from_ohlc(ohlc.iloc[:1000])
+    assert 500 == index.extend(ohlc.iloc[900:])
+
+    full = PrefixSumIndex.from_ohlc(ohlc)
+    assert full.dates.tolist() == index.dates.tolist()
+    assert full.mean('Volume', ohlc.index, 30) == pytest.approx(index.mean('Volume', ohlc.index, 30), nan_ok=True)
+
+
+def test_prefix_sum_index__save_load(tmp_path, ohlc):
+    file_path = tmp_path / 'AAA_cumsum_d.npz'
+    index = PrefixSumIndex.from_ohlc(ohlc)
+    index.save(file_path)
+
+    loaded = PrefixSumIndex.load(file_path)
+
+    assert index.columns == loaded.columns
+    assert index.last_date == loaded.last_date
+    assert index.mean('Close', '2018-01-01', 90) == loaded.mean('Close', '2018-01-01', 90)
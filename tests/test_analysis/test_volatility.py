@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.analysis import atr, bollinger_bands, stochastic_oscillator, donchian_channels, max_drawdown
+
+
+@pytest.fixture
+def ohlc():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 300)))
+    open_ = close * np.exp(rng.normal(0, 0.01, 300))
+    high = np.maximum(open_, close) * 1.01
+    low = np.minimum(open_, close) * 0.99
+    index = pd.date_range('2020-01-01', periods=300, freq='B', name='Date')
+    return pd.DataFrame(dict(Open=open_, High=high, Low=low, Close=close,
+                             Volume=1000.0), index=index)
+
+
+def test_atr(ohlc):
+    previous = ohlc['Close'].shift(1)
+    tr = pd.concat([ohlc['High'] - ohlc['Low'], (ohlc['High'] - previous).abs(),
+                    (ohlc['Low'] - previous).abs()], axis=1).max(axis=1)
+    expected = tr.ewm(alpha=1 / 14, adjust=False).mean()
+    output = atr(ohlc)
+    assert 'ATR14' == output.name
+    np.testing.assert_allclose(expected.to_numpy(), output.to_numpy(), rtol=1e-10)
+
+
+def test_atr__windows(ohlc):
+    output = atr(ohlc, window=[5, 14])
+    assert ['ATR5', 'ATR14'] == list(output.columns)
+    pd.testing.assert_series_equal(atr(ohlc, 14), output['ATR14'])
+
+
+def test_bollinger_bands(ohlc):
+    output = bollinger_bands(ohlc, window=20)
+    middle = ohlc['Close'].rolling(20).mean()
+    std = ohlc['Close'].rolling(20).std(ddof=0)
+    np.testing.assert_allclose(middle.to_numpy(), output['Middle'].to_numpy(), rtol=1e-10)
+    np.testing.assert_allclose((middle + 2 * std).to_numpy(), output['Upper'].to_numpy(), rtol=1e-10)
+    np.testing.assert_allclose((middle - 2 * std).to_numpy(), output['Lower'].to_numpy(), rtol=1e-10)
+
+
+def test_stochastic_oscillator(ohlc):
+    output = stochastic_oscillator(ohlc, window=14, smooth=3)
+    highest = ohlc['High'].rolling(14).max()
+    lowest = ohlc['Low'].rolling(14).min()
+    k = 100 * (ohlc['Close'] - lowest) / (highest - lowest)
+    np.testing.assert_allclose(k.to_numpy(), output['%K'].to_numpy(), rtol=1e-10)
+    np.testing.assert_allclose(k.rolling(3).mean().to_numpy(), output['%D'].to_numpy(), rtol=1e-10)
+
+
+def test_donchian_channels__windows(ohlc):
+    output = donchian_channels(ohlc, window=[10, 20])
+    assert ['Middle10', 'Upper10', 'Lower10', 'Middle20', 'Upper20', 'Lower20'] == list(output.columns)
+    np.testing.assert_allclose(ohlc['High'].rolling(20).max().to_numpy(), output['Upper20'].to_numpy())
+
+
+def test_max_drawdown(ohlc):
+    expected = (ohlc['Close'] / ohlc['Close'].cummax() - 1).cummin()
+    np.testing.assert_allclose(expected.to_numpy(), max_drawdown(ohlc).to_numpy())
+
+
+@pytest.mark.parametrize("indicator,params", [
+    (atr, dict(window=14)),
+    (bollinger_bands, dict(window=20)),
+    (stochastic_oscillator, dict(window=14, smooth=3)),
+    (donchian_channels, dict(window=[10, 20])),
+    (max_drawdown, dict(window=20)),
+])
+def test_lookback(ohlc, indicator, params):
+    full = indicator(ohlc, **params)
+    tail = indicator(ohlc.tail(indicator.lookback(**params)), **params)
+    np.testing.assert_allclose(np.asarray(full)[-1], np.asarray(tail)[-1], rtol=1e-7)
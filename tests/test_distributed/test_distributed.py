@@ -0,0 +1,121 @@
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import marketools.stqscraper as stqscraper
+from marketools.analysis import rsi, sma
+from marketools.distributed import Cluster, balance_shards, history_lengths, _configure, _storage_settings
+from marketools.scanner import Scanner, Above
+from marketools.stqscraper.backends import CachedBackend, LocalBackend, S3Backend, SQLiteBackend
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.manifest import get_manifest
+from marketools.stqscraper.stockquotes import StockQuotes, read_ohlcv_from_csv
+
+LENGTHS = {'AAA': 300, 'BBB': 200, 'CCC': 120, 'DDD': 60}
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+    monkeypatch.setattr(StockQuotes, 'use_daemon', False)
+    rng = np.random.default_rng(0)
+    for i, (ticker, length) in enumerate(LENGTHS.items()):
+        close = 100 * np.exp(np.cumsum(rng.normal(0.002 * (1 - i), 0.02, length)))
+        ohlc = pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                             'Close': close, 'Volume': 1000.0},
+                            index=pd.Index(pd.bdate_range(end='2021-06-30', periods=length), name='Date'))
+        ohlc.to_csv(tmp_path / f'{ticker}_ohcl_d.csv')
+        get_manifest().record(ticker, 'd', 'ohlc', last_date=ohlc.index[-1], rows=length)
+    yield tmp_path
+    ohlc_cache.clear()
+
+
+def test_balance_shards():
+    shards = balance_shards({'A': 7, 'B': 5, 'C': 4, 'D': 3, 'E': 1}, 2)
+    assert [['A', 'D'], ['B', 'C', 'E']] == shards
+    assert [['A'], ['B']] == balance_shards({'A': 1, 'B': 1}, 4)
+
+
+def test_history_lengths(storage):
+    output = history_lengths(['AAA', 'DDD', 'XYZ'])
+    assert [300, 60, 180] == list(output)
+
+
+@pytest.mark.parametrize("backend", ['serial', 'processes'])
+def test_map(storage, backend):
+    cluster = Cluster(backend=backend, workers=2)
+    output = cluster.map(sma, LENGTHS, params=dict(window=10))
+    for ticker in LENGTHS:
+        expected = sma(read_ohlcv_from_csv(storage / f'{ticker}_ohcl_d.csv'), window=10)
+        pd.testing.assert_series_equal(expected, output[ticker])
+
+
+def test_map__last(storage):
+    output = Cluster(backend='processes', workers=2).map(
+        rsi, list(LENGTHS) + ['XYZ'], tail=rsi.lookback(), last=True)
+    assert list(LENGTHS) + ['XYZ'] == list(output.index)
+    expected = rsi(read_ohlcv_from_csv(storage / 'CCC_ohcl_d.csv'))
+    assert expected.iloc[-1] == pytest.approx(output['CCC'], rel=1e-6)
+    assert np.isnan(output['XYZ'])
+
+
+def test_scan(storage):
+    cluster = Cluster(backend='processes', workers=3)
+    scanner = Scanner([Above(rsi, 50, params=dict(window=14))])
+    assert scanner.scan(LENGTHS) == cluster.scan(scanner, LENGTHS)
+
+
+def test_map__dask(storage):
+    distributed = pytest.importorskip('dask.distributed')
+    with distributed.Client(processes=False, n_workers=2) as client:
+        output = Cluster(backend='dask', client=client).map(sma, LENGTHS, tail=5, last=True)
+    assert 4 == output.notna().sum()
+
+
+class UnpicklableClient:
+    """S3 client stand-in which, like boto3 client, cannot be pickled."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+def make_client():
+    return UnpicklableClient()
+
+
+def test_storage_settings__picklable(monkeypatch, tmp_path):
+    remote = S3Backend(None, 'bucket', prefix='marketools/', client_factory=make_client)
+    monkeypatch.setattr(stqscraper, 'STORAGE_BACKEND', CachedBackend(remote, LocalBackend(str(tmp_path))))
+    settings = pickle.loads(pickle.dumps(_storage_settings()))
+    monkeypatch.setattr(stqscraper, 'STORAGE_BACKEND', None)
+    _configure(settings)
+    backend = stqscraper.STORAGE_BACKEND
+    assert isinstance(backend, CachedBackend)
+    assert isinstance(backend.remote.client, UnpicklableClient)
+    assert ('bucket', 'marketools/') == (backend.remote.bucket, backend.remote.prefix)
+    assert str(tmp_path) == backend.local.directory
+
+    monkeypatch.setattr(stqscraper, 'STORAGE_BACKEND', S3Backend(make_client(), 'bucket'))
+    with pytest.raises(ValueError):
+        _storage_settings()
+
+
+def test_map__sqlite_backend(storage):
+    backend = SQLiteBackend(str(storage / 'storage.sqlite'))
+    for ticker in LENGTHS:
+        backend.write(f'{ticker}_ohcl_d.csv', (storage / f'{ticker}_ohcl_d.csv').read_bytes())
+        (storage / f'{ticker}_ohcl_d.csv').unlink()
+    stqscraper.set_storage_backend(backend)
+    try:
+        output = Cluster(backend='processes', workers=2).map(sma, LENGTHS, params=dict(window=10), last=True)
+    finally:
+        stqscraper.set_storage_backend(None)
+    assert 4 == output.notna().sum()
+
+
+def test_wrong_backend():
+    with pytest.raises(ValueError):
+        Cluster(backend='mpi')
@@ -0,0 +1,123 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from marketools import Wallet
+from marketools.papertrading import PaperTradingEngine, replay_bars, Tick
+
+
+def make_ohlc(close, start='2021-06-01 09:00', freq='5min'):
+    close = np.asarray(close, dtype=np.float64)
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 100.0},
+                        index=pd.date_range(start, periods=len(close), freq=freq, name='Datetime'))
+
+
+def make_wallet(money=10000):
+    wallet = Wallet(0.01, 3)
+    wallet.money = money
+    return wallet
+
+
+async def collect(feed):
+    return [tick async for tick in feed]
+
+
+def test_replay_bars__aligned():
+    ohlc = {'AAA': make_ohlc([10, 11, 12]), 'BBB': make_ohlc([20, 21], start='2021-06-01 09:05')}
+    ticks = asyncio.run(collect(replay_bars(['AAA', 'BBB'], ohlc=ohlc)))
+    assert 3 == len(ticks)
+    assert pd.Timestamp('2021-06-01 09:00') == ticks[0].time
+    assert 10 == ticks[0].price('AAA') and np.isnan(ticks[0].price('BBB'))
+    assert [12, 21] == list(ticks[2].close)
+    assert ['AAA'] == list(ticks[0].bars().index)
+
+    ticks = asyncio.run(collect(replay_bars(['AAA'], ohlc=ohlc, start='2021-06-01 09:05')))
+    assert [11, 12] == [t.price('AAA') for t in ticks]
+
+
+def test_replay_bars__speed():
+    ohlc = {'AAA': make_ohlc([10, 11, 12], freq='1s')}
+    started = time.monotonic()
+    asyncio.run(collect(replay_bars(['AAA'], ohlc=ohlc, speed=10)))
+    assert time.monotonic() - started >= 0.2
+
+
+def test_engine():
+    ohlc = {'AAA': make_ohlc([10, 11, 12, 13]), 'BBB': make_ohlc([50, 40, 30, 20])}
+
+    async def buy_and_hold(tick, account):
+        if account.volume('AAA') == 0:
+            account.buy('AAA', 100)
+
+    def rotate(tick, account):  # plain function
+        if tick.price('BBB') == 40:
+            account.buy('BBB', 10)
+        elif tick.price('BBB') == 20:
+            account.sell_all('BBB')
+            account.buy('AAA', 10, price=12.5)
+
+    engine = PaperTradingEngine(queue_size=2)
+    engine.add_strategy('hold', buy_and_hold, make_wallet())
+    engine.add_strategy('rotate', rotate, make_wallet())
+    equity = asyncio.run(engine.run(replay_bars(['AAA', 'BBB'], ohlc=ohlc)))
+
+    assert ['hold', 'rotate'] == list(equity.columns)
+    assert 4 == len(equity)
+    hold = engine.accounts['hold'].wallet
+    assert 10000 - 1000 - 10 == hold.money
+    assert [100, 13] == list(hold.stocks.loc[0, ['Volume', 'Price']])
+    assert 10000 - 10 + 300 == equity['hold'].iloc[-1] == hold.total_value
+
+    rotate_wallet = engine.accounts['rotate'].wallet
+    journal = rotate_wallet.journal.to_frame()
+    assert ['buy', 'sell', 'buy'] == list(journal['Side'])
+    assert [40, 20, 12.5] == list(journal['Price'])
+    assert pd.Timestamp('2021-06-01 09:15') == journal['Timestamp'].iloc[-1]
+    assert 10000 - 404 + 197 - 128 + 130 == pytest.approx(equity['rotate'].iloc[-1])
+    with pytest.raises(ValueError):
+        engine.add_strategy('hold', buy_and_hold, make_wallet())
+
+
+def test_engine__backpressure():
+    ohlc = {'AAA': make_ohlc(np.arange(1, 51))}
+    produced, lags = list(), list()
+
+    async def feed():
+        async for tick in replay_bars(['AAA'], ohlc=ohlc):
+            produced.append(tick.time)
+            yield tick
+
+    async def slow(tick, account):
+        lags.append(len(produced) - produced.index(tick.time))
+        await asyncio.sleep(0.001)
+
+    engine = PaperTradingEngine(queue_size=3)
+    engine.add_strategy('fast', lambda tick, account: None, make_wallet())
+    engine.add_strategy('slow', slow, make_wallet())
+    equity = asyncio.run(engine.run(feed()))
+    assert 50 == len(equity)
+    assert max(lags) <= 3 + 2  # queue, tick being put and tick being processed
+
+
+def test_engine__strategy_error():
+    ohlc = {'AAA': make_ohlc(np.arange(1, 1001))}
+
+    def failing(tick, account):
+        if tick.price('AAA') == 10:
+            raise RuntimeError('strategy failed')
+
+    engine = PaperTradingEngine(queue_size=4)
+    engine.add_strategy('ok', lambda tick, account: None, make_wallet())
+    engine.add_strategy('failing', failing, make_wallet())
+    with pytest.raises(RuntimeError, match='strategy failed'):
+        asyncio.run(engine.run(replay_bars(['AAA'], ohlc=ohlc)))
+    assert len(engine.accounts['ok'].equity) < 1000
+
+
+def test_engine__unknown_ticker():
+    engine = PaperTradingEngine()
+    engine.add_strategy('bad', lambda tick, account: account.buy('XYZ', 1), make_wallet())
+    with pytest.raises(KeyError):
+        asyncio.run(engine.run(replay_bars(['AAA'], ohlc={'AAA': make_ohlc([1, 2])})))
+    assert isinstance(Tick(None, [], {}, *np.empty((5, 0))).bars(), pd.DataFrame)
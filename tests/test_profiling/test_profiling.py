@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import marketools
+from marketools.analysis import rsi, sma
+from marketools.profiling import profile, profiled, tag, profiling_enabled
+from marketools.scanner import Scanner, Above
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.stockquotes import StockQuotes
+
+LENGTHS = {'AAA': 300, 'BBB': 40}
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+    monkeypatch.setattr(StockQuotes, 'use_daemon', False)
+    rng = np.random.default_rng(0)
+    for ticker, length in LENGTHS.items():
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+        ohlc = pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                             'Close': close, 'Volume': 1000.0},
+                            index=pd.Index(pd.bdate_range(end='2021-06-30', periods=length), name='Date'))
+        ohlc.to_csv(tmp_path / f'{ticker}_ohcl_d.csv')
+    yield tmp_path
+    ohlc_cache.clear()
+
+
+def test_disabled():
+    assert not profiling_enabled()
+    with profile():
+        assert profiling_enabled()
+    assert not profiling_enabled()
+    assert 'relative_strength_index' == rsi.__name__
+    assert rsi.lookback() > 14
+
+
+def test_calls_tagged_by_ticker(storage):
+    with marketools.profile() as p:
+        for ticker in LENGTHS:
+            marketools.Stock(ticker).heikinashi
+    sma(StockQuotes('AAA').ohlc())  # after the profile - not recorded
+
+    records = p.records()
+    ha = records[records['Function'] == 'stock.Stock.heikinashi'].set_index('Ticker')
+    assert ['AAA', 'BBB'] == list(ha.index)
+    assert 300 == ha.loc['AAA', 'Rows']
+
+    # analysis function inherits ticker of the caller
+    nested = records[records['Function'] == 'analysis.heikinashi.heikinashi']
+    assert {'AAA', 'BBB'} == set(nested['Ticker'])
+    assert all('stock.Stock.heikinashi [' in stack[0] for stack in nested['Stack'])
+    assert not (records['Function'] == 'analysis.moving_average.simple_moving_average').any()
+
+    # data read from CSV files
+    data = records[records['Function'] == 'stqscraper.stockquotes.StockQuotes._get_data'].set_index('Ticker')
+    assert os.path.getsize(storage / 'AAA_ohcl_d.csv') == data.loc['AAA', 'Bytes']
+    assert data.loc['AAA', 'Bytes'] == ha.loc['AAA', 'Bytes']  # inclusive
+    assert 0 == ha.loc['AAA', 'Self bytes']
+    assert (records['Self time'] <= records['Time']).all()
+
+
+def test_report(storage):
+    with profile() as p:
+        for _ in range(3):
+            for ticker in LENGTHS:
+                with tag(ticker):
+                    rsi(StockQuotes(ticker).ohlc(tail=50))
+
+    report = p.report()
+    assert ['Function', 'Ticker', 'Calls', 'Time', 'Self time', 'Rows', 'Bytes', 'Mean time', 'Relative'] \
+        == list(report.columns)
+    assert report['Time'].is_monotonic_decreasing
+    rows = report[report['Function'] == 'analysis.rsi.relative_strength_index'].set_index('Ticker')
+    assert [3, 3] == list(rows['Calls'])
+    assert 150 == rows.loc['AAA', 'Rows'] and 120 == rows.loc['BBB', 'Rows']
+    assert 2 == pytest.approx(rows['Relative'].sum())  # median of two is their mean
+
+    by_rows = p.report(sort='Rows', ascending=True, per_ticker=False)
+    assert by_rows['Rows'].is_monotonic_increasing
+    assert 'Ticker' not in by_rows and 'Relative' not in by_rows
+
+
+def test_folded():
+    @profiled
+    def outer(ticker):
+        with tag('ignored'):  # explicit ticker of the caller is used
+            return inner(np.zeros(5))
+
+    @profiled
+    def inner(values):
+        return values
+
+    with profile() as p:
+        outer('AAA')
+        outer('AAA')
+        with tag('BBB'):
+            inner(np.zeros(3))
+
+    lines = p.folded(value='calls').splitlines()
+    outer_label = 'test_profiling.test_folded.<locals>.outer [AAA]'
+    inner_label = 'test_profiling.test_folded.<locals>.inner'
+    assert [f'{inner_label} [BBB] 1', f'{outer_label} 2', f'{outer_label};{inner_label} [AAA] 2'] \
+        == sorted(lines)
+    for line in p.folded().splitlines():
+        assert int(line.rsplit(' ', 1)[1]) >= 0
+    with pytest.raises(ValueError):
+        p.folded(value='rows')
+
+
+def test_scanner_tags(storage):
+    scanner = Scanner([Above(rsi, 0)])
+    with profile() as p:
+        assert ['AAA', 'BBB'] == scanner.scan(LENGTHS, workers=2)
+    records = p.records()
+    tickers = records.loc[records['Function'] == 'analysis.rsi.relative_strength_index', 'Ticker']
+    assert ['AAA', 'BBB'] == sorted(tickers)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools import analysis
+from marketools.stqscraper.cache import ohlc_cache
+
+pl = pytest.importorskip('polars')
+from marketools import query as q  # noqa: E402
+
+TICKERS = ['AAA', 'BBB', 'CCC']
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    rng = np.random.default_rng(0)
+    output = dict()
+    for i, ticker in enumerate(TICKERS):
+        length = 200 + 50 * i
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+        ohlc = pd.DataFrame({'Open': close * (1 + rng.normal(0, 0.01, length)),
+                             'High': close * 1.02, 'Low': close * 0.98, 'Close': close,
+                             'Volume': rng.integers(1000, 5000, length).astype(np.float64)},
+                            index=pd.Index(pd.bdate_range(end='2021-06-30', periods=length), name='Date'))
+        ohlc.to_csv(tmp_path / f'{ticker}_ohcl_d.csv')
+        output[ticker] = ohlc
+    yield output
+    ohlc_cache.clear()
+
+
+@pytest.mark.parametrize("expression,function,params", [
+    (q.sma(20), analysis.sma, dict(window=20)),
+    (q.ema(10), analysis.ema, dict(window=10)),
+    (q.rsi(14), analysis.rsi, dict(window=14)),
+    (q.price_change(), analysis.price_change, dict()),
+    (q.price_change(5, relative=True, percent=True), analysis.price_change,
+     dict(shift=5, relative=True, percent=True)),
+])
+def test_expressions_match_analysis(storage, expression, function, params):
+    output = q.to_pandas(q.scan_store().with_columns(expression))
+    assert TICKERS == list(output['Ticker'].unique())
+    for ticker, ohlc in storage.items():
+        expected = function(ohlc, **params)
+        values = output.loc[output['Ticker'] == ticker, expected.name].to_numpy()
+        np.testing.assert_allclose(expected.to_numpy(), values, rtol=1e-9, equal_nan=True)
+
+
+def test_mean_volume(storage):
+    output = q.to_pandas(q.scan_store(['BBB']).with_columns(q.mean_volume(90)).pipe(q.last_bar))
+    assert analysis.mean_volume_on_date(storage['BBB'], '2021-06-30', 90) == pytest.approx(output['VolumeMean90'][0])
+
+
+def test_screen(storage):
+    query = (q.scan_store(start='2020-01-01')
+             .with_columns(q.rsi(14), q.sma(5), q.sma(50))
+             .pipe(q.last_bar)
+             .filter(pl.col('SMA5') > pl.col('SMA50'))
+             .select('Ticker', 'Date', 'RSI'))
+    output = q.to_pandas(query)
+
+    expected = [t for t, ohlc in storage.items()
+                if (analysis.sma(ohlc, window=5) > analysis.sma(ohlc, window=50)).iloc[-1]]
+    assert expected == list(output['Ticker'])
+    assert (output['Date'] == pd.Timestamp('2021-06-30')).all()
+
+
+def test_start_end(storage):
+    output = q.to_pandas(q.scan_store(['AAA'], start='2021-06-01', end='2021-06-10'))
+    assert pd.Timestamp('2021-06-01') == output['Date'].iloc[0]
+    assert 8 == len(output)
+
+
+@pytest.mark.parametrize("direction", ['rise', 'fall'])
+def test_crossed(storage, direction):
+    output = q.to_pandas(q.scan_store().with_columns(q.rsi(14))
+                         .with_columns(q.crossed('RSI', 50, direction)))
+    for ticker, ohlc in storage.items():
+        expected = analysis.rsi_cross_signals(analysis.rsi(ohlc), 50, direction)
+        values = output.loc[output['Ticker'] == ticker, 'RSI crossed 50']
+        assert list(expected) == list(values)
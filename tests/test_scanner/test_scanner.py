@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.analysis import rsi, macd, ema, sma, price_change
+from marketools.scanner import Scanner, Above, Below, Crosses
+
+
+@pytest.fixture
+def ohlc():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, 3000)))
+    dates = pd.bdate_range('2008-01-01', periods=len(close))
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                         'Close': close, 'Volume': 1000.0},
+                        index=pd.Index(dates, name='Date'))
+
+
+@pytest.mark.parametrize("indicator,params,column", [
+    (rsi, dict(window=14), None),
+    (macd, dict(), 'MACD'),
+    (macd, dict(), 'Signal'),
+    (ema, dict(window=20), None),
+    (sma, dict(window=50), None),
+    (price_change, dict(shift=5, relative=True), None),
+])
+def test_lookback__consistent_with_full_history(ohlc, indicator, params, column):
+    full = indicator(ohlc, **params)
+    tail = indicator(ohlc.tail(indicator.lookback(**params)), **params)
+    if column:
+        full, tail = full[column], tail[column]
+    assert full.iloc[-1] == pytest.approx(tail.iloc[-1], rel=1e-6)
+
+
+def test_scanner__matches_full_history(ohlc):
+    scanner = Scanner([Crosses(rsi, 50, direction='rise', params=dict(window=14))])
+    signals = rsi(ohlc).pipe(lambda s: (s >= 50) & (s.shift(1) < 50))
+
+    for end in ohlc.index[-300:]:
+        history = ohlc[:end]
+        assert signals[end] == scanner.evaluate(history)
+
+
+def test_scanner__macd_crossover(ohlc):
+    scanner = Scanner([Crosses(macd, 'Signal', column='MACD', direction='fall')])
+    values = macd(ohlc)
+    diff = values['MACD'] - values['Signal']
+    signals = (diff <= 0) & (diff.shift(1) > 0)
+
+    for end in ohlc.index[-300:]:
+        assert signals[end] == scanner.evaluate(ohlc[:end])
+
+
+def test_scanner__scan(monkeypatch, ohlc):
+    frames = {'UP': ohlc.assign(Close=np.arange(len(ohlc), dtype=float)),
+              'DOWN': ohlc.assign(Close=-np.arange(len(ohlc), dtype=float))}
+    monkeypatch.setattr(Scanner, 'load', lambda self, ticker, end=None: frames[ticker].tail(self.lookback))
+
+    rising = Scanner([Above(price_change, 0, params=dict(shift=1))])
+    falling = Scanner([Below(price_change, 0, params=dict(shift=1))])
+
+    assert ['UP'] == rising.scan(['UP', 'DOWN'])
+    assert ['DOWN'] == falling.scan(['UP', 'DOWN'])
+
+
+def test_scanner__require_any(ohlc):
+    scanner = Scanner([Above(sma, 1e9, params=dict(window=5)),
+                       Below(sma, 1e9, params=dict(window=5))], require='any')
+    assert scanner.evaluate(ohlc)
+
+
+def test_condition__no_lookback():
+    with pytest.raises(ValueError):
+        Above(lambda ohlc: ohlc['Close'], 0)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.wallet import Wallet
+from marketools.simulation import bootstrap_returns, investment_value, simulate_wallet
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2018-01-01', periods=500, freq='B', name='Date')
+    values = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.015, (500, 3)), axis=0))
+    return pd.DataFrame(values, index=index, columns=['AAA', 'BBB', 'CCC'])
+
+
+@pytest.fixture
+def wallet():
+    output = Wallet(0.0038, 5.0)
+    output.money = 10000
+    return output
+
+
+def test_bootstrap_returns__blocks():
+    returns = np.arange(20, dtype=np.float64).reshape(10, 2)
+    chunks = list(bootstrap_returns(returns, n_paths=5, horizon=6, block=3,
+                                    chunk_paths=2, rng=np.random.default_rng(0)))
+    assert [(2, 6, 2), (2, 6, 2), (1, 6, 2)] == [c.shape for c in chunks]
+    rows = (chunks[0] - 1)[..., 0] / 2  # resampled dates
+    assert (np.diff(rows[:, :3], axis=1) == 1).all()  # consecutive dates in block
+    assert ((chunks[0] - 1)[..., 1] == (chunks[0] - 1)[..., 0] + 1).all()  # whole rows
+
+
+def test_investment_value(wallet):
+    output = investment_value(np.array([10000, 10000, 1000]), np.array([10000, 2000, 1000]),
+                              4, wallet.minimal_recommended_investment())
+    expected = [wallet.total_value / 4, 2000, 0]  # money below minimal recommended investment
+    np.testing.assert_allclose(expected, output)
+
+
+def test_simulate_wallet__chunks_do_not_change_result(prices, wallet):
+    kwargs = dict(horizon=50, n_paths=200, rebalance=10, prices=prices, seed=3)
+    one_chunk = simulate_wallet(wallet, ['AAA', 'BBB', 'CCC'], **kwargs)
+    many_chunks = simulate_wallet(wallet, ['AAA', 'BBB', 'CCC'], max_bytes=2**14, **kwargs)
+    np.testing.assert_allclose(one_chunk.terminal_values, many_chunks.terminal_values)
+    np.testing.assert_allclose(one_chunk.max_drawdowns, many_chunks.max_drawdowns)
+
+
+def test_simulate_wallet__constant_prices(wallet):
+    index = pd.date_range('2018-01-01', periods=10, freq='B')
+    prices = pd.DataFrame({'AAA': 100.0, 'BBB': 50.0}, index=index)
+    result = simulate_wallet(wallet, ['AAA', 'BBB'], horizon=20, n_paths=10,
+                             max_positions=2, prices=prices, seed=0)
+    # 49 x 100 and 99 x 50 bought (5000 per position including commission), then sold
+    fees = 2 * (wallet(4900) + wallet(4950))
+    np.testing.assert_allclose(10000 - fees, result.terminal_values)
+    assert (result.max_drawdowns < 0).all()
+    assert 1.0 == result.probability_of_loss
+
+
+def test_summary(prices, wallet):
+    result = simulate_wallet(wallet, ['AAA', 'BBB'], horizon=20, n_paths=100,
+                             prices=prices, seed=0)
+    output = result.summary(percentiles=(5, 95))
+    assert ['Terminal value', 'Return', 'Max drawdown'] == list(output.index)
+    assert ['Mean', '5%', '95%'] == list(output.columns)
+    assert (output.loc['Max drawdown'] <= 0).all()
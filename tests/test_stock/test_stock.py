@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools import Stock
+from marketools.analysis import heikinashi
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+def make_ohlc(length, end='2021-06-30'):
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                         'Close': close, 'Volume': 1000.0},
+                        index=pd.Index(pd.bdate_range(end=end, periods=length), name='Date'))
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+    monkeypatch.setattr(StockQuotes, 'use_daemon', False)
+    yield tmp_path
+    ohlc_cache.clear()
+
+
+def test_heikinashi__bounded(storage):
+    ohlc = make_ohlc(100)
+    ohlc.to_csv(storage / 'AAA_ohcl_d.csv')
+    expected = heikinashi(ohlc)
+
+    bounded = Stock('AAA', start='2021-05-01', end='2021-05-31').heikinashi
+    pd.testing.assert_frame_equal(expected.loc['2021-05-01':'2021-05-31'], bounded, check_freq=False)
+
+    # stored candles cover the full history
+    stored = pd.read_csv(storage / 'AAA_heikinashi_d.csv', index_col='Date', parse_dates=['Date'])
+    assert 100 == len(stored)
+    pd.testing.assert_frame_equal(expected, Stock('AAA').heikinashi, check_freq=False)
+
+
+def test_heikinashi__update(storage):
+    ohlc = make_ohlc(100)
+    ohlc.iloc[:90].to_csv(storage / 'AAA_ohcl_d.csv')
+    Stock('AAA').heikinashi
+    ohlc_cache.clear()
+
+    ohlc.to_csv(storage / 'AAA_ohcl_d.csv')
+    output = Stock('AAA', start='2021-06-01').heikinashi
+    np.testing.assert_allclose(heikinashi(ohlc).loc['2021-06-01':].to_numpy(), output.to_numpy())
+
+
+def test_heikinashi__intraday_not_stored(storage, monkeypatch):
+    index = pd.date_range('2021-06-01 09:00', periods=10, freq='5min', name='Datetime')
+    ohlc = make_ohlc(10).set_axis(index)
+    monkeypatch.setattr(StockQuotes, 'ohlc', lambda self, interval='d', start=None, end=None, tail=None: ohlc)
+    output = Stock('AAA', interval='5').heikinashi
+    pd.testing.assert_frame_equal(heikinashi(ohlc), output)
+    assert not (storage / 'AAA_heikinashi_5.csv').exists()
@@ -0,0 +1,192 @@
+from datetime import datetime, timezone
+import os
+import pytest
+from marketools.stqscraper import stockquotes, set_storage_backend, get_storage_backend
+from marketools.stqscraper.backends import LocalBackend, SQLiteBackend, S3Backend, CachedBackend
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.fundamentals import Fundamentals
+from marketools.stqscraper.manifest import get_manifest
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+CSV = b'Date,Open,High,Low,Close,Volume\n' \
+      b'2024-04-02,10,11,9,10.5,1000\n' \
+      b'2024-04-03,10.5,12,10,11.5,2000\n'
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class Body:
+    def __init__(self, content):
+        self.content = content
+
+    def read(self):
+        return self.content
+
+
+class FakeS3Client:
+    """In-memory stand-in for S3 client of MinIO-like object store."""
+
+    def __init__(self):
+        self.objects = dict()
+        self.calls = 0
+
+    def _object(self, Bucket, Key):
+        self.calls += 1
+        try:
+            return self.objects[Bucket, Key]
+        except KeyError:
+            raise ClientError('NoSuchKey')
+
+    def get_object(self, Bucket, Key):
+        return {'Body': Body(self._object(Bucket, Key)[0])}
+
+    def head_object(self, Bucket, Key):
+        return {'LastModified': self._object(Bucket, Key)[1]}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Bucket, Key] = (bytes(Body), datetime.now(timezone.utc))
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=0, Delimiter=None):
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix)
+                      and (Delimiter is None or Delimiter not in k[len(Prefix):]))
+        page = keys[ContinuationToken:ContinuationToken + 2]
+        truncated = ContinuationToken + 2 < len(keys)
+        return {'Contents': [{'Key': k} for k in page], 'IsTruncated': truncated,
+                'NextContinuationToken': ContinuationToken + 2}
+
+
+@pytest.fixture(params=['local', 'sqlite', 's3', 'cached'])
+def backend(request, tmp_path):
+    if request.param == 'local':
+        return LocalBackend(str(tmp_path))
+    if request.param == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'storage.sqlite'))
+    if request.param == 's3':
+        return S3Backend(FakeS3Client(), 'bucket', prefix='marketools/')
+    return CachedBackend(S3Backend(FakeS3Client(), 'bucket'), LocalBackend(str(tmp_path)))
+
+
+def test_backend(backend):
+    assert backend.read('AAA_ohcl_d.csv') is None
+    assert backend.modified('AAA_ohcl_d.csv') is None
+    for ticker in ('CCC', 'AAA', 'BBB'):
+        backend.write(f'{ticker}_ohcl_d.csv', CSV)
+    backend.write('AAA_ohcl_d.csv', CSV + b'2024-04-04,11,12,10,11,100\n')
+
+    assert CSV + b'2024-04-04,11,12,10,11,100\n' == backend.read('AAA_ohcl_d.csv')
+    assert backend.exists('AAA_ohcl_d.csv')
+    assert abs(backend.modified('AAA_ohcl_d.csv') - datetime.now().timestamp()) < 60
+    assert ['AAA_ohcl_d.csv', 'BBB_ohcl_d.csv', 'CCC_ohcl_d.csv'] == backend.keys()
+    assert ['BBB_ohcl_d.csv'] == backend.keys('B')
+
+    backend.delete('AAA_ohcl_d.csv')
+    assert not backend.exists('AAA_ohcl_d.csv')
+    backend.delete('AAA_ohcl_d.csv')
+
+
+def test_backend__keys_in_subdirectories(backend):
+    backend.write('AAA_ohcl_d.csv', CSV)
+    backend.write('snapshots/chunks/ab/abcd', CSV)
+    backend.write('snapshots/snapshot_1.json', CSV)
+
+    assert ['AAA_ohcl_d.csv', 'snapshots/chunks/ab/abcd', 'snapshots/snapshot_1.json'] == backend.keys()
+    assert ['AAA_ohcl_d.csv'] == backend.keys(recursive=False)
+    assert ['snapshots/chunks/ab/abcd', 'snapshots/snapshot_1.json'] == backend.keys('snapshots/')
+    assert ['snapshots/snapshot_1.json'] == backend.keys('snapshots/', recursive=False)
+    assert ['snapshots/chunks/ab/abcd'] == backend.keys('snapshots/c')
+
+
+def test_cached_backend(tmp_path):
+    client = FakeS3Client()
+    remote = S3Backend(client, 'bucket')
+    remote.write('AAA_ohcl_d.csv', CSV)
+    backend = CachedBackend(remote, LocalBackend(str(tmp_path)))
+
+    file_path = backend.local_path('AAA_ohcl_d.csv')
+    assert CSV == open(file_path, 'rb').read()
+    calls = client.calls
+    assert CSV == backend.read('AAA_ohcl_d.csv')
+    assert calls == client.calls  # read from local copy
+    assert not backend.sync('AAA_ohcl_d.csv')
+
+    os.utime(file_path, (0, 0))  # local copy older than remote
+    assert backend.sync('AAA_ohcl_d.csv')
+    assert backend.local_path('XYZ_ohcl_d.csv') is None
+
+
+@pytest.fixture
+def nodes(monkeypatch, tmp_path):
+    """Two machines with own storage directories and shared object store."""
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr('marketools.stqscraper.planner._budgets', dict())
+    remote = S3Backend(FakeS3Client(), 'bucket')
+    downloads = list()
+
+    def fetch_url(url, **kwargs):
+        downloads.append(url)
+        return CSV
+
+    monkeypatch.setattr(stockquotes, 'fetch_url', fetch_url)
+
+    def switch(node):
+        monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path / node))
+        monkeypatch.setattr('marketools.stqscraper.STORAGE_BACKEND', None)
+        set_storage_backend(CachedBackend(remote))
+        ohlc_cache.clear()
+
+    yield switch, remote, downloads
+    ohlc_cache.clear()
+
+
+def test_shared_ohlc(nodes):
+    switch, remote, downloads = nodes
+    switch('a')
+    StockQuotes('AAA').ohlc()
+    assert 1 == len(downloads)
+    assert remote.exists('AAA_ohcl_d.csv')
+
+    switch('b')
+    output = StockQuotes('AAA').ohlc()
+    assert 1 == len(downloads)  # downloaded by the other machine
+    assert 2 == len(output)
+    assert 2 == get_manifest().get('AAA', 'd', 'ohlc').rows
+
+
+def test_shared_ohlc__sync_stale_copy(nodes):
+    switch, remote, downloads = nodes
+    switch('b')
+    get_storage_backend().local.write('AAA_ohcl_d.csv', CSV[:CSV.rindex(b'2024')])
+    os.utime(get_storage_backend().local.local_path('AAA_ohcl_d.csv'), (0, 0))
+    get_manifest().record('AAA', 'd', 'ohlc', last_date=datetime(2024, 4, 2), rows=1, fetch_time=0)
+    remote.write('AAA_ohcl_d.csv', CSV)
+
+    output = StockQuotes('AAA').ohlc()
+    assert 0 == len(downloads)
+    assert 2 == len(output)
+
+
+def test_shared_fundamentals(monkeypatch, nodes):
+    switch, remote, downloads = nodes
+    scraped = list()
+
+    def scrap_summary_table(ticker):
+        scraped.append(ticker)
+        return {'Last': 10.0, 'EPS': 1.5}
+
+    monkeypatch.setattr('marketools.stqscraper.fundamentals.scrap_summary_table', scrap_summary_table)
+    monkeypatch.setattr(StockQuotes, 'use_daemon', False)
+    switch('a')
+    Fundamentals('AAA').get_fundamentals()
+    switch('b')
+    output = Fundamentals('AAA')
+    output.get_fundamentals()
+    assert 1 == len(scraped)
+    assert 1.5 == output['EPS']
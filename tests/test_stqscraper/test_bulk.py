@@ -0,0 +1,83 @@
+import zipfile
+from io import BytesIO
+import pandas as pd
+from marketools.stqscraper.backends import SQLiteBackend
+from marketools.stqscraper.bulk import ingest_stooq_archive, parse_stooq_bulk_file
+from marketools.stqscraper.intraday import IntradayStore
+from marketools.stqscraper.stockquotes import read_ohlcv_from_csv
+
+
+HEADER = '<TICKER>,<PER>,<DATE>,<TIME>,<OPEN>,<HIGH>,<LOW>,<CLOSE>,<VOL>,<OPENINT>\n'
+PKN = HEADER + \
+      'PKN,D,20200103,000000,10,11,9,10.5,1000,0\n' \
+      'PKN,D,20200102,000000,9,10,8,9.5,2000,0\n'
+AAPL = HEADER + \
+       'AAPL.US,D,20200102,000000,300,301,299,300.5,50000,0\n'
+
+
+def test_parse_stooq_bulk_file():
+    ticker, data = parse_stooq_bulk_file(PKN.encode())
+
+    assert 'PKN' == ticker
+    assert ['d'] == list(data)
+    assert ['Open', 'High', 'Low', 'Close', 'Volume'] == data['d'].columns.tolist()
+    assert data['d'].index.is_monotonic_increasing
+
+
+def test_ingest_stooq_archive(tmp_path):
+    archive_path = tmp_path / 'd_pl_txt.zip'
+    with zipfile.ZipFile(archive_path, 'w') as archive:
+        archive.writestr('data/daily/pl/wse stocks/pkn.txt', PKN)
+        archive.writestr('data/daily/us/nasdaq stocks/aapl.us.txt', AAPL)
+        archive.writestr('data/readme.html', '<html></html>')
+    storage_dir = tmp_path / 'data'
+
+    summary = ingest_stooq_archive(archive_path, workers=2, storage_dir=storage_dir)
+
+    assert ['AAPL.US', 'PKN'] == sorted(summary['Ticker'])
+    ohlc = read_ohlcv_from_csv(storage_dir / 'PKN_ohcl_d.csv')
+    assert [9.5, 10.5] == ohlc['Close'].tolist()
+    assert 2 == len(ohlc)
+
+
+def test_parse_stooq_bulk_file__intraday():
+    content = HEADER + \
+        'PKN,5,20200102,091000,9,10,8,9.5,200,0\n' \
+        'PKN,5,20200102,090500,9,10,8,9.0,100,0\n' \
+        'PKN,5,20200103,090500,9,10,8,9.8,100,0\n'
+    _, data = parse_stooq_bulk_file(content.encode())
+
+    assert ['5'] == list(data)
+    assert 'Datetime' == data['5'].index.name
+    assert [pd.Timestamp('2020-01-02 09:05'), pd.Timestamp('2020-01-02 09:10'),
+            pd.Timestamp('2020-01-03 09:05')] == list(data['5'].index)
+
+
+def test_ingest_stooq_archive__intraday(tmp_path):
+    archive_path = tmp_path / '5_pl_txt.zip'
+    with zipfile.ZipFile(archive_path, 'w') as archive:
+        archive.writestr('data/5 min/pl/wse stocks/pkn.txt',
+                         HEADER + 'PKN,5,20200102,090500,9,10,8,9.0,100,0\n'
+                                  'PKN,5,20200102,091000,9,10,8,9.5,200,0\n')
+    storage_dir = tmp_path / 'data'
+
+    summary = ingest_stooq_archive(archive_path, workers=1, storage_dir=storage_dir)
+
+    assert [('PKN', '5', 2)] == list(summary.itertuples(index=False, name=None))
+    output = IntradayStore('PKN', '5', storage_dir=str(storage_dir)).read()
+    assert [9.0, 9.5] == output['Close'].tolist()
+    assert not (storage_dir / 'PKN_ohcl_5.csv').exists()
+
+
+def test_ingest_stooq_archive__storage_backend(monkeypatch, tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'store.sqlite'))
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setattr('marketools.stqscraper.STORAGE_BACKEND', backend)
+    archive_path = tmp_path / 'd_pl_txt.zip'
+    with zipfile.ZipFile(archive_path, 'w') as archive:
+        archive.writestr('data/daily/pl/wse stocks/pkn.txt', PKN)
+
+    ingest_stooq_archive(archive_path, workers=1)
+
+    assert [9.5, 10.5] == read_ohlcv_from_csv(BytesIO(backend.read('PKN_ohcl_d.csv')))['Close'].tolist()
+    assert not (tmp_path / 'data' / 'PKN_ohcl_d.csv').exists()
@@ -0,0 +1,122 @@
+import threading
+import time
+import pandas as pd
+import pytest
+from marketools.stqscraper import stockquotes
+from marketools.stqscraper.cache import OHLCCache, ohlc_cache
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+def frame(rows=10):
+    return pd.DataFrame({'Close': range(rows)}, dtype=float)
+
+
+def test_cache__loads_once():
+    cache = OHLCCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return frame()
+
+    first = cache.get('AAA', 'd', loader)
+    second = cache.get('AAA', 'd', loader)
+
+    assert first is second
+    assert 1 == len(calls)
+
+
+def test_cache__lru_eviction():
+    size = int(frame().memory_usage(index=True, deep=True).sum())
+    cache = OHLCCache(max_bytes=2 * size)
+
+    cache.get('AAA', 'd', frame)
+    cache.get('BBB', 'd', frame)
+    cache.get('AAA', 'd', frame)  # AAA is now the most recently used
+    cache.get('CCC', 'd', frame)
+
+    assert ('AAA', 'd') in cache
+    assert ('BBB', 'd') not in cache
+    assert ('CCC', 'd') in cache
+    assert cache.size <= cache.max_bytes
+
+
+def test_cache__empty_not_cached():
+    cache = OHLCCache()
+    cache.get('AAA', 'd', pd.DataFrame)
+    assert 0 == len(cache)
+
+
+def test_cache__max_age():
+    cache = OHLCCache()
+    first = cache.get('AAA', 'd', frame)
+    time.sleep(0.01)
+    second = cache.get('AAA', 'd', frame, max_age=0)
+    assert first is not second
+
+
+def test_stockquotes__cache_max_age(monkeypatch):
+    monkeypatch.setattr(StockQuotes, 'check_for_update', True)
+    quotes = StockQuotes('AAA')
+    assert StockQuotes.update_period * 3600 == quotes._cache_max_age('d')
+    assert 5 * 60 == quotes._cache_max_age('5')
+    assert 3600 == quotes._cache_max_age('60')
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+    assert quotes._cache_max_age('5') is None
+
+
+def test_cache__single_flight():
+    cache = OHLCCache()
+    calls = []
+    results = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return frame()
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get('AAA', 'd', loader)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert 1 == len(calls)
+    assert 8 == len(results)
+    assert all(r is results[0] for r in results)
+
+
+def test_cache__loader_error():
+    cache = OHLCCache()
+
+    def loader():
+        raise IOError('no data')
+
+    with pytest.raises(IOError):
+        cache.get('AAA', 'd', loader)
+    assert cache.get('AAA', 'd', frame) is not None
+
+
+def test_stockquotes__bounded_update_through_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr('marketools.stqscraper.planner._budgets', dict())
+    monkeypatch.setattr(StockQuotes, 'check_for_update', True)
+    monkeypatch.setattr(StockQuotes, 'use_daemon', False)
+    downloads = list()
+
+    def fetch_url(url, **kwargs):
+        downloads.append(url)
+        return b'Date,Open,High,Low,Close,Volume\n' + b''.join(
+            f'2024-04-{d:02d},10,11,9,{d},1000\n'.encode() for d in range(1, 11))
+
+    monkeypatch.setattr(stockquotes, 'fetch_url', fetch_url)
+    try:
+        assert [10.0] == StockQuotes('AAA').ohlc(tail=1)['Close'].tolist()
+        assert ('AAA', 'd') in ohlc_cache  # downloaded history is cached
+        assert [6.0, 7.0] == StockQuotes('AAA').ohlc(start='2024-04-06', end='2024-04-07')['Close'].tolist()
+        assert 10 == len(StockQuotes('AAA').ohlc())
+        assert 1 == len(downloads)
+    finally:
+        ohlc_cache.clear()
@@ -0,0 +1,118 @@
+from datetime import date, datetime
+import time
+import pandas as pd
+import pytest
+from marketools.stqscraper.calendars import easter_sunday, get_calendar, \
+    register_calendar, GPW, NYSE, WEEKDAYS, TradingCalendar, fixed
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+def warsaw(*args):
+    """Returns time in Europe/Warsaw time zone."""
+    return pd.Timestamp(datetime(*args)).tz_localize('Europe/Warsaw')
+
+
+@pytest.mark.parametrize("year,expected", [
+    (2019, date(2019, 4, 21)),
+    (2024, date(2024, 3, 31)),
+    (2025, date(2025, 4, 20)),
+])
+def test_easter_sunday(year, expected):
+    assert expected == easter_sunday(year)
+
+
+@pytest.mark.parametrize("ticker,expected", [
+    ('PKN', GPW),
+    ('aapl.us', NYSE),
+    ('VOD.UK', WEEKDAYS),
+])
+def test_get_calendar(ticker, expected):
+    assert expected is get_calendar(ticker)
+
+
+def test_register_calendar(monkeypatch):
+    monkeypatch.setattr('marketools.stqscraper.calendars.CALENDARS', dict())
+    calendar = TradingCalendar('LSE', holiday_rules=[fixed(12, 25)])
+    register_calendar('.uk', calendar)
+    assert calendar is get_calendar('VOD.UK')
+
+
+def test_gpw_holidays():
+    assert [date(2024, 1, 1), date(2024, 3, 29), date(2024, 4, 1), date(2024, 5, 1),
+            date(2024, 5, 3), date(2024, 5, 30), date(2024, 8, 15), date(2024, 11, 1),
+            date(2024, 11, 11), date(2024, 12, 24), date(2024, 12, 25), date(2024, 12, 26),
+            date(2024, 12, 31)] == [d for d in GPW.holidays(2024) if d.weekday() < 5]
+
+
+@pytest.mark.parametrize("day,expected", [
+    (date(2021, 12, 31), True),  # New Year's Day on Saturday is not observed
+    (date(2021, 7, 5), False),  # Independence Day on Sunday, observed on Monday
+    (date(2024, 6, 19), False),  # Juneteenth
+    (date(2024, 11, 28), False),  # Thanksgiving
+    (date(2024, 11, 29), True),
+])
+def test_nyse_is_session(day, expected):
+    assert expected == NYSE.is_session(day)
+
+
+def test_nyse_early_close():
+    assert NYSE.is_early_close(date(2024, 11, 29))
+    assert NYSE.is_early_close(date(2024, 7, 3))
+    assert not NYSE.is_early_close(date(2024, 7, 2))
+    assert warsaw(2024, 12, 24, 20) == NYSE.publication_time(date(2024, 12, 24))
+
+
+def test_sessions():
+    output = GPW.sessions('2024-12-20', date(2025, 1, 3))
+    expected = pd.to_datetime(['2024-12-20', '2024-12-23', '2024-12-27', '2024-12-30',
+                               '2025-01-02', '2025-01-03']).to_numpy(dtype='datetime64[D]')
+    assert (expected == output).all()
+
+
+@pytest.mark.parametrize("time_now,expected", [
+    (warsaw(2024, 4, 1, 21), date(2024, 3, 28)),  # Easter Monday
+    (warsaw(2024, 4, 2, 12), date(2024, 3, 28)),  # before update hour
+    (warsaw(2024, 4, 2, 20), date(2024, 4, 2)),
+    (warsaw(2024, 4, 6, 10), date(2024, 4, 5)),  # weekend
+    (pd.Timestamp('2024-04-02 18:30', tz='UTC'), date(2024, 4, 2)),  # 20:30 in Warsaw
+])
+def test_last_published_session(time_now, expected):
+    assert expected == GPW.last_published_session(time_now)
+
+
+@pytest.mark.parametrize("time_now,expected", [
+    (warsaw(2024, 3, 12, 22, 30), date(2024, 3, 12)),  # US on summer time, Europe not yet
+    (warsaw(2024, 4, 2, 22, 30), date(2024, 4, 1)),
+    (warsaw(2024, 4, 3, 0, 30), date(2024, 4, 2)),  # still 2 April in New York
+])
+def test_last_published_session__nyse(time_now, expected):
+    assert expected == NYSE.last_published_session(time_now)
+
+
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason='time zone of the process cannot be changed')
+def test_last_published_session__naive_local(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')  # naive time is local time of the machine
+    time.tzset()
+    try:
+        assert date(2024, 4, 2) == GPW.last_published_session(datetime(2024, 4, 2, 14))  # 20:00 in Warsaw
+        assert date(2024, 3, 28) == GPW.last_published_session(datetime(2024, 4, 2, 13))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_is_up_to_date__holiday():
+    time_now = warsaw(2024, 4, 1, 21)  # Easter Monday, no session at GPW
+    fetch_time = warsaw(2024, 3, 28, 21).timestamp()  # fetched long ago
+    assert StockQuotes._is_up_to_date(pd.Timestamp('2024-03-28'), fetch_time, GPW, time_now)
+    assert not StockQuotes._is_up_to_date(pd.Timestamp('2024-03-28'), fetch_time, NYSE,
+                                          warsaw(2024, 4, 1, 23))
+
+
+def test_is_up_to_date__missing_session():
+    time_now = warsaw(2024, 4, 3, 21)
+    # downloaded after publication, but the session is missing - wait update_period
+    fetch_time = warsaw(2024, 4, 3, 20, 30).timestamp()
+    assert StockQuotes._is_up_to_date(pd.Timestamp('2024-04-02'), fetch_time, GPW, time_now)
+    fetch_time = warsaw(2024, 4, 3, 19).timestamp()
+    assert not StockQuotes._is_up_to_date(pd.Timestamp('2024-04-02'), fetch_time, GPW, time_now)
@@ -0,0 +1,198 @@
+import socket
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.stqscraper import daemon
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.daemon import DataDaemon, DaemonClient, DaemonError, get_daemon_client, \
+    pack_frame, unpack_frame, release_frame, send_message, recv_message, shared_memory
+from marketools.stqscraper.stockquotes import StockQuotes
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='Unix sockets required')
+
+
+CSV = 'Date,Open,High,Low,Close,Volume\n' + ''.join(
+    f'{d:%Y-%m-%d},{10 + i},{11 + i},{9 + i},{10.5 + i},{1000 + i}\n'
+    for i, d in enumerate(pd.date_range('2020-01-01', periods=50, freq='B')))
+
+
+@pytest.fixture
+def running_daemon(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+    monkeypatch.setattr(daemon, '_clients', dict())
+    monkeypatch.setattr(daemon, '_unreachable', dict())
+    (tmp_path / 'AAA_ohcl_d.csv').write_text(CSV)
+
+    server = DataDaemon(['AAA'], refresh_every=None)
+    server.load()
+    server.start()
+    yield server
+    server.stop()
+    ohlc_cache.clear()
+
+
+@pytest.mark.parametrize("threshold", [10**9, 0])
+def test_pack_frame(monkeypatch, threshold):
+    monkeypatch.setattr(daemon, 'SHM_THRESHOLD', threshold)
+    frame = pd.DataFrame({'A': [1.0, np.nan], 'B': [3.0, 4.0]},
+                         index=pd.DatetimeIndex(['2020-01-01', '2020-01-02'], name='Date'))
+    packed = pack_frame(frame)
+    assert ('shm' in packed) == (threshold == 0)
+    pd.testing.assert_frame_equal(frame, unpack_frame(packed))
+    release_frame(packed)
+    series = frame['B'].rename('SMA2')
+    packed = pack_frame(series)
+    pd.testing.assert_series_equal(series, unpack_frame(packed))
+    release_frame(packed)
+
+
+@pytest.fixture
+def shared_blocks(monkeypatch):
+    """Names of shared memory blocks created by the daemon."""
+    monkeypatch.setattr(daemon, 'SHM_THRESHOLD', 0)
+    output = list()
+
+    def spy(data):
+        packed = pack_frame(data)
+        output.append(packed['shm'])
+        return packed
+
+    monkeypatch.setattr(daemon, 'pack_frame', spy)
+    return output
+
+
+def is_unlinked(name, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            shared_memory.SharedMemory(name=name).close()
+        except FileNotFoundError:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_shm_released_after_ack(running_daemon, shared_blocks):
+    client = DaemonClient()
+    assert 5 == len(client.ohlc('AAA', tail=5))
+    assert is_unlinked(shared_blocks[-1])
+    assert 50 == len(client.ohlc('AAA'))  # connection is still usable
+
+
+def test_shm_released_on_client_failure(monkeypatch, running_daemon, shared_blocks):
+    def failing(packed):
+        raise ValueError('client failed')
+
+    monkeypatch.setattr(daemon, 'unpack_frame', failing)
+    with pytest.raises(ValueError):
+        DaemonClient().ohlc('AAA')
+    assert is_unlinked(shared_blocks[-1])
+
+
+def test_shm_released_after_timeout(monkeypatch, running_daemon, shared_blocks):
+    monkeypatch.setattr(daemon, 'SHM_ACK_TIMEOUT', 0.1)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(running_daemon.socket_path)
+    send_message(sock, dict(op='ohlc', ticker='AAA'))
+    assert 'shm' in recv_message(sock)['data']  # no acknowledgement
+    assert is_unlinked(shared_blocks[-1])
+    sock.close()
+
+
+def test_client_ohlc(running_daemon):
+    client = DaemonClient()
+    output = client.ohlc('AAA', tail=5)
+    assert 5 == len(output)
+    assert 59.5 == output['Close'].iloc[-1]
+    assert ['AAA'] == client.tickers()
+
+
+def test_client_indicator(running_daemon):
+    output = DaemonClient().indicator('AAA', 'sma', params=dict(window=3))
+    assert 'SMA3' == output.name
+    assert 58.5 == output.iloc[-1]
+
+
+def test_client_error(running_daemon):
+    with pytest.raises(DaemonError):
+        DaemonClient().indicator('AAA', 'no_such_indicator')
+
+
+def test_stockquotes_daemon_error(monkeypatch, running_daemon):
+    def failing(self, request):
+        raise ValueError('daemon failed')
+
+    monkeypatch.setattr(DataDaemon, 'handle', failing)
+    assert 50 == len(StockQuotes('AAA').ohlc())  # read locally
+    assert get_daemon_client() is not None  # daemon is still used
+
+
+def test_stockquotes_reads_from_daemon(monkeypatch, running_daemon):
+    assert get_daemon_client() is not None
+    requests = list()
+    client_ohlc = DaemonClient.ohlc
+
+    def spy(self, *args, **kwargs):
+        requests.append(args)
+        return client_ohlc(self, *args, **kwargs)
+
+    monkeypatch.setattr(DaemonClient, 'ohlc', spy)
+    output = StockQuotes('AAA').ohlc(start='2020-01-06', end='2020-01-08')
+    assert 3 == len(output)
+    assert 1 == len(requests)
+
+    monkeypatch.setattr(StockQuotes, 'use_daemon', False)
+    StockQuotes('AAA').ohlc()
+    assert 1 == len(requests)
+
+
+def test_no_daemon(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    assert get_daemon_client() is None
+
+
+def test_refresh_loop_survives_errors(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    calls = list()
+
+    def failing(self):
+        calls.append(1)
+        raise ConnectionError('network is down')
+
+    monkeypatch.setattr(DataDaemon, 'refresh', failing)
+    server = DataDaemon(['AAA'], refresh_every=0.01)
+    server.start()
+    try:
+        deadline = time.monotonic() + 2
+        while len(calls) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        server.stop()
+    assert len(calls) >= 2
+    assert 'scheduled refresh failed' in caplog.text
+
+
+def test_hung_daemon(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+    monkeypatch.setattr(daemon, '_clients', dict())
+    monkeypatch.setattr(daemon, '_unreachable', dict())
+    monkeypatch.setattr(daemon, 'CLIENT_TIMEOUT', 0.1)
+    (tmp_path / 'AAA_ohcl_d.csv').write_text(CSV)
+
+    # accepts connections, never responds
+    hung = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    hung.bind(daemon.get_socket_path())
+    hung.listen()
+    try:
+        with pytest.raises(OSError):
+            DaemonClient().tickers()
+        assert 50 == len(StockQuotes('AAA').ohlc())  # read locally
+        assert get_daemon_client() is None  # daemon marked unreachable
+    finally:
+        hung.close()
+        ohlc_cache.clear()
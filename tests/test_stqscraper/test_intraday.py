@@ -0,0 +1,93 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.stqscraper.intraday import IntradayStore
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    return tmp_path
+
+
+def bars(start, periods):
+    index = pd.date_range(start, periods=periods, freq='5min', name='Datetime')
+    return pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5,
+                         'Close': np.arange(periods, dtype=float), 'Volume': 10.0},
+                        index=index)
+
+
+@pytest.mark.parametrize("partition,expected", [
+    ('M', ['2020-01', '2020-02']),
+    ('D', ['2020-01-31', '2020-02-01']),
+])
+def test_intraday_store__partitions(storage, partition, expected):
+    store = IntradayStore('AAA', '5', partition=partition)
+    store.append(bars('2020-01-31 22:00', 48))
+    assert expected == store.partitions()
+
+
+def test_intraday_store__append_only_new_partitions(storage):
+    store = IntradayStore('AAA', '5', partition='D')
+    store.append(bars('2020-01-01 09:00', 10))
+    store.append(bars('2020-01-02 09:00', 10))
+
+    written = store.append(bars('2020-01-02 09:30', 10).assign(Close=100.0))
+
+    assert ['2020-01-02'] == written
+    output = store.read()
+    assert 10 + 16 == len(output)
+    assert output.index.is_monotonic_increasing
+    assert 100.0 == output.loc['2020-01-02 09:30', 'Close']
+
+
+def test_intraday_store__append_overlapping_download(storage):
+    store = IntradayStore('AAA', '5', partition='D')
+    store.append(bars('2020-01-01 09:00', 3 * 288))
+    modified = {k: os.path.getmtime(store._path(k)) for k in store.partitions()}
+
+    # download of the full history with two new bars
+    written = store.append(bars('2020-01-01 09:00', 3 * 288 + 2))
+
+    assert ['2020-01-04'] == written
+    assert all(modified[k] == os.path.getmtime(store._path(k)) for k in modified if k != '2020-01-04')
+    assert 3 * 288 + 2 == len(store.read())
+
+
+def test_intraday_store__append_revised_bar(storage):
+    store = IntradayStore('AAA', '5', partition='D')
+    store.append(bars('2020-01-01 09:00', 10))
+    data = bars('2020-01-01 09:00', 10)
+    data.iloc[-1, data.columns.get_loc('Close')] = 100.0  # last bar revised after download
+    data.iloc[-1, data.columns.get_loc('Volume')] = 25.0
+
+    assert ['2020-01-01'] == store.append(data)
+    output = store.read()
+    assert 10 == len(output)
+    assert [100.0, 25.0] == list(output.iloc[-1][['Close', 'Volume']])
+    assert [] == store.append(data)  # the same content is not written again
+
+
+def test_intraday_store__read_range(storage):
+    store = IntradayStore('AAA', '5', partition='D')
+    data = bars('2020-01-01 00:00', 3 * 288)
+    store.append(data)
+
+    output = store.read(start='2020-01-02 12:00', end='2020-01-03 01:00')
+
+    assert data.loc['2020-01-02 12:00':'2020-01-03 01:00'].equals(output)
+
+
+def test_intraday_store__read_tail(storage):
+    store = IntradayStore('AAA', '5', partition='D')
+    data = bars('2020-01-01 00:00', 3 * 288)
+    store.append(data)
+
+    assert data.tail(300).equals(store.read(tail=300))
+    assert data.loc[:'2020-01-02 00:00'].tail(5).equals(store.read(end='2020-01-02 00:00', tail=5))
+
+
+def test_intraday_store__wrong_interval():
+    with pytest.raises(ValueError):
+        IntradayStore('AAA', 'd')
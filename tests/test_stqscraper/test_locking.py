@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+import pytest
+from marketools.stqscraper import stockquotes
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.locking import atomic_open, atomic_write, FileLock, storage_lock
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+CSV = b'Date,Open,High,Low,Close,Volume\n' \
+      b'2020-01-02,10,11,9,10.5,1000\n' \
+      b'2020-01-03,10.5,12,10,11.5,2000\n'
+
+
+def test_atomic_write(tmp_path):
+    file_path = tmp_path / 'data.csv'
+    file_path.write_bytes(b'old')
+    atomic_write(str(file_path), b'new')
+    assert b'new' == file_path.read_bytes()
+    assert ['data.csv'] == [p.name for p in tmp_path.iterdir()]
+
+
+def test_atomic_open__error_keeps_file(tmp_path):
+    file_path = tmp_path / 'data.csv'
+    file_path.write_bytes(b'old')
+    with pytest.raises(RuntimeError):
+        with atomic_open(str(file_path), 'w') as f:
+            f.write('partial')
+            raise RuntimeError
+    assert b'old' == file_path.read_bytes()
+    assert ['data.csv'] == [p.name for p in tmp_path.iterdir()]
+
+
+def test_file_lock__exclusive(tmp_path):
+    file_path = str(tmp_path / 'key.lock')
+    with FileLock(file_path):
+        with pytest.raises(TimeoutError):
+            FileLock(file_path, timeout=0.1).acquire()
+    with FileLock(file_path, timeout=0.1) as lock:
+        assert lock.locked
+
+
+def test_file_lock__shared(tmp_path):
+    pytest.importorskip('fcntl')
+    file_path = str(tmp_path / 'key.lock')
+    with FileLock(file_path, shared=True), FileLock(file_path, shared=True, timeout=0.1):
+        with pytest.raises(TimeoutError):
+            FileLock(file_path, timeout=0.1).acquire()
+
+
+def test_storage_lock_path(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    assert str(tmp_path / '.locks' / 'AAA_d_ohlc.lock') == storage_lock('AAA', 'd', 'ohlc').file_path
+
+
+def test_concurrent_refresh_downloads_once(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr('marketools.stqscraper.planner._budgets', dict())
+    downloads = list()
+
+    def fetch_url(url, **kwargs):
+        downloads.append(url)
+        time.sleep(0.2)
+        return CSV
+
+    monkeypatch.setattr(stockquotes, 'fetch_url', fetch_url)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(lambda _: StockQuotes('AAA')._get_data(), range(4)))
+
+    assert 1 == len(downloads)
+    assert all(2 == len(output) for output in outputs)
+    ohlc_cache.clear()
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from marketools.stqscraper import stockquotes
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.manifest import Manifest, get_manifest
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+CSV = b'Date,Open,High,Low,Close,Volume\n' \
+      b'2020-01-02,10,11,9,10.5,1000\n' \
+      b'2020-01-03,10.5,12,10,11.5,2000\n'
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    yield tmp_path
+    ohlc_cache.clear()
+
+
+def test_manifest_record_and_get(tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.sqlite'))
+    manifest.record('AAA', 'd', 'ohlc', last_date='2020-01-03', rows=2,
+                    checksum='abc', fetch_time=100.0)
+    entry = manifest.get('AAA', 'd', 'ohlc')
+    assert pd.Timestamp('2020-01-03') == entry.last_date
+    assert (100.0, 2, 'abc') == (entry.fetch_time, entry.rows, entry.checksum)
+    assert manifest.get('AAA', 'w', 'ohlc') is None
+
+    manifest.remove('AAA', 'd', 'ohlc')
+    assert manifest.get('AAA', 'd', 'ohlc') is None
+
+
+def test_manifest_lookup(tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.sqlite'))
+    manifest.record_many([('AAA', 'd', 'ohlc', '2020-01-03', 2, None, 1.0),
+                          ('BBB', 'd', 'ohlc', '2020-01-02', 1, None, 2.0)])
+    output = manifest.lookup(['BBB', 'CCC'])
+    assert ['BBB', 'CCC'] == list(output.index)
+    assert 1 == output.loc['BBB', 'Rows']
+    assert pd.isna(output.loc['CCC', 'Fetch time'])
+
+
+def test_stockquotes_records_manifest(monkeypatch, storage):
+    monkeypatch.setattr(stockquotes, 'fetch_url', lambda url, **kwargs: CSV)
+    StockQuotes('AAA').ohlc()
+    entry = get_manifest().get('AAA', 'd', 'ohlc')
+    assert 2 == entry.rows
+    assert pd.Timestamp('2020-01-03') == entry.last_date
+
+
+def test_update_required__uses_manifest(monkeypatch, storage):
+    (storage / 'AAA_ohcl_d.csv').write_bytes(CSV)
+    # manifest says data are up to date, file is not read
+    monkeypatch.setattr(StockQuotes, '_is_up_to_date', staticmethod(lambda *args: True))
+    get_manifest().record('AAA', 'd', 'ohlc', last_date='2020-01-03', rows=2)
+    monkeypatch.setattr(stockquotes, 'read_last_date', None)
+    assert not StockQuotes('AAA')._update_required()
+
+
+def test_update_required__bootstraps_manifest(storage):
+    (storage / 'AAA_ohcl_d.csv').write_bytes(CSV)
+    StockQuotes('AAA')._update_required()
+    entry = get_manifest().get('AAA', 'd', 'ohlc')
+    assert 2 == entry.rows
+    assert pd.Timestamp('2020-01-03') == entry.last_date
+
+
+def test_stale(storage):
+    now = datetime.now()
+    last_session = StockQuotes('AAA').calendar.last_published_session(now)
+    get_manifest().record_many([
+        ('AAA', 'd', 'ohlc', last_session, 1, None, now.timestamp()),
+        ('BBB', 'd', 'ohlc', now - timedelta(days=30), 1, None, now.timestamp() - 30 * 86400),
+    ])
+    assert ['BBB', 'CCC'] == StockQuotes.stale(['AAA', 'BBB', 'CCC'])
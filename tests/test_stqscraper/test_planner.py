@@ -0,0 +1,116 @@
+from datetime import datetime
+import pytest
+import requests
+from marketools.stqscraper import stockquotes
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.intraday import IntradayStore
+from marketools.stqscraper.locking import storage_lock
+from marketools.stqscraper.manifest import get_manifest
+from marketools.stqscraper.planner import HitBudget, RefreshPlanner, get_hit_budget
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+CSV = b'Date,Open,High,Low,Close,Volume\n' \
+      b'2024-04-02,10,11,9,10.5,1000\n' \
+      b'2024-04-03,10.5,12,10,11.5,2000\n'
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr('marketools.stqscraper.planner._budgets', dict())
+    yield tmp_path
+    ohlc_cache.clear()
+
+
+def test_hit_budget(tmp_path):
+    file_path = str(tmp_path / 'hits.json')
+    budget = HitBudget(daily_limit=3, file_path=file_path)
+    budget.record(2)
+    assert 1 == HitBudget(daily_limit=3, file_path=file_path).remaining()
+    budget.exhaust()
+    assert 0 == HitBudget(daily_limit=3, file_path=file_path).remaining()
+    assert 3 == HitBudget(daily_limit=3, file_path=file_path).remaining(day='2000-01-01')
+
+
+def test_download_counts_hits(monkeypatch, storage):
+    monkeypatch.setattr(stockquotes, 'fetch_url', lambda url, **kwargs: CSV)
+    StockQuotes('AAA').download_ohlc_from_stooq()
+    assert 1 == get_hit_budget().used()
+
+
+def test_download_stops_when_exhausted(monkeypatch, storage):
+    monkeypatch.setattr(stockquotes, 'fetch_url',
+                        lambda url, **kwargs: b'Exceeded the daily hits limit')
+    assert StockQuotes('AAA').download_ohlc_from_stooq() is None
+
+    def fail(url, **kwargs):
+        raise AssertionError('Stooq should not be requested')
+
+    monkeypatch.setattr(stockquotes, 'fetch_url', fail)
+    assert StockQuotes('AAA').download_ohlc_from_stooq() is None
+
+
+def test_plan(storage):
+    get_manifest().record_many([
+        ('AAA', 'd', 'ohlc', '2024-04-04', 2, None, datetime(2024, 4, 4, 21).timestamp()),
+        ('BBB', 'd', 'ohlc', '2024-03-28', 2, None, datetime(2024, 3, 28, 21).timestamp()),
+        ('CCC', 'd', 'ohlc', '2024-04-02', 2, None, datetime(2024, 4, 2, 21).timestamp()),
+    ])
+    planner = RefreshPlanner(['AAA', 'BBB', 'CCC', 'DDD', 'EEE'],
+                             importance=dict(CCC=5, EEE=0))
+    output = planner.plan(time_now=datetime(2024, 4, 4, 21), pace=False)
+
+    assert ['DDD', 'CCC', 'BBB', 'AAA', 'EEE'] == list(output.index)
+    assert 0 == output.loc['AAA', 'Staleness']
+    assert 3 == output.loc['BBB', 'Staleness']  # Good Friday and Easter Monday are not sessions
+    assert 10 == output.loc['CCC', 'Priority']
+    assert ['refresh', 'refresh', 'refresh', 'fresh', 'fresh'] == list(output['Action'])
+
+
+def test_plan__pacing(storage):
+    planner = RefreshPlanner(['AAA', 'BBB', 'CCC'], slot=60)
+    get_hit_budget().record(get_hit_budget().daily_limit - 4)
+    # 4 hits left, 2 hours to midnight - 2 hits in this slot
+    output = planner.plan(time_now=datetime.combine(datetime.now().date(), datetime.min.time()).replace(hour=22))
+    assert ['refresh', 'refresh', 'skip'] == list(output['Action'])
+
+
+def test_refresh(monkeypatch, storage):
+    monkeypatch.setattr(stockquotes, 'fetch_url', lambda url, **kwargs: CSV)
+    output = RefreshPlanner(['AAA']).refresh(pace=False)
+    assert ['refreshed'] == list(output['Action'])
+    assert 2 == get_manifest().get('AAA', 'd', 'ohlc').rows
+
+
+def test_refresh__failed_ticker(monkeypatch, storage):
+    locked = list()
+
+    def fetch_url(url, **kwargs):
+        with storage_lock(url[-3:].upper(), 'd', 'ohlc', timeout=0):  # not held during download
+            locked.append(url[-3:])
+        if url.endswith('aaa'):
+            raise requests.ConnectionError('connection reset')
+        return CSV
+
+    monkeypatch.setattr(stockquotes, 'fetch_url', fetch_url)
+    output = RefreshPlanner(['aaa', 'bbb']).refresh(pace=False)
+    assert {'aaa': 'failed', 'bbb': 'refreshed'} == output['Action'].to_dict()
+    assert ['aaa', 'bbb'] == locked
+    assert 2 == get_manifest().get('bbb', 'd', 'ohlc').rows
+
+
+def test_refresh__intraday(monkeypatch, storage):
+    content = b'Date,Time,Open,High,Low,Close,Volume\n' \
+              b'2024-04-03,09:05:00,10,11,9,10.5,100\n' \
+              b'2024-04-03,09:10:00,10.5,12,10,11.5,200\n'
+    monkeypatch.setattr(stockquotes, 'fetch_url', lambda url, **kwargs: content)
+    planner = RefreshPlanner(['AAA'], interval='5')
+    assert ['refreshed'] == list(planner.refresh(pace=False)['Action'])
+
+    store = IntradayStore('AAA', '5', partition=StockQuotes.intraday_partition)
+    assert [10.5, 11.5] == store.read()['Close'].tolist()
+    assert not (storage / 'AAA_ohcl_5.csv').exists()
+    assert 2 == get_manifest().get('AAA', '5', 'ohlc').rows
+    assert ['fresh'] == list(planner.plan(pace=False)['Action'])  # downloaded within the bar
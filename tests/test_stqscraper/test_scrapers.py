@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.stqscraper import scrapers
+from marketools.stqscraper.scrapers import get_last_quotes
+
+
+QUOTES = b'Symbol,Date,Time,Open,High,Low,Close,Volume\n' \
+         b'PKN,2021-03-05,17:05:00,61.5,62.8,60.9,62.4,1523412\n' \
+         b'XYZ,N/D,N/D,N/D,N/D,N/D,N/D,N/D\n' \
+         b'PKO,2021-03-05,17:05:00,30.1,30.9,29.8,30.5,3125000\n'
+
+
+@pytest.fixture
+def urls(monkeypatch):
+    monkeypatch.setattr('marketools.stqscraper.planner._budgets', dict())
+    output = list()
+
+    def fetch_url(url, **kwargs):
+        output.append(url)
+        return QUOTES
+
+    monkeypatch.setattr(scrapers, 'fetch_url', fetch_url)
+    return output
+
+
+def test_get_last_quotes(urls):
+    output = get_last_quotes(['pkn', 'xyz', 'pko'])
+    assert 1 == len(urls)
+    assert 's=pkn+xyz+pko&' in urls[0]
+    assert ['pkn', 'xyz', 'pko'] == list(output.index)
+    assert [62.4, 30.5] == list(output.loc[['pkn', 'pko'], 'Close'])
+    assert pd.Timestamp('2021-03-05 17:05') == output.loc['pkn', 'Date']
+    assert output.loc['xyz'].isna().all()
+
+
+def test_get_last_quotes__batches(urls):
+    output = get_last_quotes(['pkn', 'pko', 'abc'], batch_size=2)
+    assert 2 == len(urls)
+    assert np.isnan(output.loc['abc', 'Close'])
+
+
+def test_get_last_quotes__no_quotes_in_batch(monkeypatch, urls):
+    content = b'Symbol,Date,Time,Open,High,Low,Close,Volume\n' \
+              b'XYZ,N/D,N/D,N/D,N/D,N/D,N/D,N/D\n'
+    monkeypatch.setattr(scrapers, 'fetch_url', lambda url, **kwargs: content if 'xyz' in url else QUOTES)
+    output = get_last_quotes(['xyz', 'pkn'], batch_size=1)
+    assert pd.isna(output.loc['xyz', 'Date'])
+    assert output.loc['xyz'].isna().all()
+    assert pd.Timestamp('2021-03-05 17:05') == output.loc['pkn', 'Date']
+
+
+def test_get_last_quotes__hits_limit(monkeypatch, urls):
+    monkeypatch.setattr(scrapers, 'fetch_url', lambda url, **kwargs: b'Exceeded the daily hits limit')
+    output = get_last_quotes(['pkn', 'pko'], batch_size=1)
+    assert output['Close'].isna().all()
+    assert 0 == scrapers.get_hit_budget().remaining()
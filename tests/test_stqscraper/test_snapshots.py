@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools import Stock
+from marketools.stqscraper import stockquotes
+from marketools.stqscraper.backends import LocalBackend
+from marketools.stqscraper.cache import ohlc_cache
+from marketools.stqscraper.snapshots import SnapshotStore, split_chunks, take_snapshot, open_snapshot
+from marketools.stqscraper.stockquotes import StockQuotes
+
+
+def history(periods, end='2021-06-30', seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.02, periods))), 2)
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 1000.0},
+                        index=pd.Index(pd.bdate_range(end=end, periods=periods), name='Date'))
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path):
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+    monkeypatch.setattr(StockQuotes, 'use_daemon', False)
+    yield tmp_path
+    ohlc_cache.clear()
+
+
+def test_split_chunks():
+    content = history(1000).to_csv().encode()
+    chunks = split_chunks(content, avg_lines=16)
+    assert content == b''.join(chunks)
+    assert all(4 <= c.count(b'\n') <= 64 for c in chunks[:-1])
+
+    # new rows change only the last chunks
+    appended = split_chunks(history(1000).to_csv().encode() + b'2021-07-01,1,1,1,1,1.0\n', avg_lines=16)
+    assert chunks[:-1] == appended[:len(chunks) - 1]
+
+
+def test_snapshot_deduplication(tmp_path):
+    source = LocalBackend(str(tmp_path / 'data'))
+    store = SnapshotStore(LocalBackend(str(tmp_path / 'snapshots')))
+    data = history(2000)
+    source.write('AAA_ohcl_d.csv', data.iloc[:-1].to_csv().encode())
+    first = store.take(tag='v1', source=source)
+    chunks = len(store.backend.keys('chunks/'))
+
+    source.write('AAA_ohcl_d.csv', data.to_csv().encode())
+    second = store.take(source=source)
+    assert len(store.backend.keys('chunks/')) - chunks <= 2
+    assert data.iloc[:-1].to_csv().encode() == first.read('AAA_ohcl_d.csv')
+    assert data.to_csv().encode() == second.read('AAA_ohcl_d.csv')
+
+    assert 'v1' == store.open(tag='v1').tag
+    assert second.name == store.open().name
+    assert ['v1', None] == list(store.list()['Tag'])
+    with pytest.raises(KeyError):
+        store.open(at='2000-01-01')
+    with pytest.raises(PermissionError):
+        first.write('AAA_ohcl_d.csv', b'')
+
+    store.remove(second.name)
+    assert 0 < store.gc()
+    assert data.iloc[:-1].to_csv().encode() == store.open().read('AAA_ohcl_d.csv')
+
+
+def test_stock_reads_snapshot(monkeypatch, storage):
+    old = history(300, end='2021-06-30')
+    old.to_csv(storage / 'AAA_ohcl_d.csv')
+    snapshot = take_snapshot(tag='backtest')
+    history(300, end='2021-09-30').to_csv(storage / 'AAA_ohcl_d.csv')
+    monkeypatch.setattr(stockquotes, 'fetch_url', None)  # no downloads from snapshot
+
+    stock = Stock('AAA', storage=open_snapshot(tag='backtest'))
+    assert snapshot.name == stock.storage.name
+    pd.testing.assert_frame_equal(old, stock.ohlc, check_freq=False)
+    assert old.index[-1] == stock.last_ohlc.name
+    assert 10 == len(stock.heikinashi.tail(10))
+    assert pd.Timestamp('2021-09-30') == Stock('AAA').ohlc.index[-1]
+    assert StockQuotes('XYZ', storage=snapshot).ohlc(tail=5).empty
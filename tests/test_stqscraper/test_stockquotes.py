@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from marketools.stqscraper import stockquotes
+from marketools.stqscraper.stockquotes import StockQuotes, is_hits_limit_response, \
+    read_ohlcv_from_csv, read_last_date, slice_ohlc
+
+
+CSV = b'Date,Open,High,Low,Close,Volume\n' \
+      b'2020-01-02,10,11,9,10.5,1000\n' \
+      b'2020-01-03,10.5,12,10,11.5,2000\n'
+
+
+@pytest.mark.parametrize("content,expected", [
+    (b'Exceeded the daily hits limit', True),
+    (b'Przekroczony dzienny limit wywolan', True),
+    (CSV, False),
+])
+def test_is_hits_limit_response(content, expected):
+    assert expected == is_hits_limit_response(content)
+
+
+@pytest.mark.parametrize("content,expected", [
+    (CSV, 2),
+    (b'\xef\xbb\xbf' + CSV, 2),
+    (b'No data', 0),
+])
+def test_download_ohlc_from_stooq(monkeypatch, content, expected):
+    monkeypatch.setattr(stockquotes, 'fetch_url', lambda url, **kwargs: content)
+    output = StockQuotes('AAA').download_ohlc_from_stooq()
+    assert expected == len(output)
+
+
+def test_download_ohlc_from_stooq__hits_limit(monkeypatch):
+    monkeypatch.setattr('marketools.stqscraper.planner._budgets', dict())
+    monkeypatch.setattr(stockquotes, 'fetch_url',
+                        lambda url, **kwargs: b'Exceeded the daily hits limit')
+    assert StockQuotes('AAA').download_ohlc_from_stooq() is None
+
+
+@pytest.fixture
+def ohlc_file(tmp_path):
+    dates = pd.bdate_range('1990-01-01', '2020-12-31')
+    ohlc = pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5,
+                         'Close': np.arange(len(dates), dtype=float),
+                         'Volume': 100.0},
+                        index=pd.Index(dates, name='Date'))
+    file_path = tmp_path / 'AAA_ohcl_d.csv'
+    ohlc.to_csv(file_path)
+    return file_path, ohlc
+
+
+@pytest.mark.parametrize("start,end,tail", [
+    ('2020-06-01', None, None),
+    (None, '1990-01-10', None),
+    ('2005-03-05', '2005-03-20', None),
+    (None, None, 90),
+    (None, '2010-01-01', 5),
+    ('2020-12-30', None, 90),
+    ('2030-01-01', None, None),
+    (None, '1980-01-01', None),
+])
+def test_read_ohlcv_from_csv__bounded(ohlc_file, start, end, tail):
+    file_path, ohlc = ohlc_file
+
+    output = read_ohlcv_from_csv(file_path, start=start, end=end, tail=tail)
+
+    expected = slice_ohlc(ohlc, start, end, tail)
+    assert expected.index.equals(output.index)
+    assert expected['Close'].tolist() == output['Close'].tolist()
+
+
+def test_read_last_date(ohlc_file):
+    file_path, _ = ohlc_file
+    assert pd.Timestamp('2020-12-31') == read_last_date(file_path)
+
+
+def test_stockquotes_ohlc__bounded_from_storage(monkeypatch, ohlc_file):
+    file_path, ohlc = ohlc_file
+    monkeypatch.setattr('marketools.stqscraper.STORE_DWL_DATA', True)
+    monkeypatch.setattr('marketools.stqscraper.DWL_DATA_DIR', str(file_path.parent))
+    monkeypatch.setattr(StockQuotes, 'check_for_update', False)
+
+    output = StockQuotes('AAA').ohlc(start='2020-12-01', tail=3)
+
+    assert ohlc.index[-3:].equals(output.index)
@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+import pytest
 from marketools.wallet import Commission
 
 
@@ -24,3 +27,47 @@ def test_commission__minimal_recommended_investment():
 def test_commission__minimal_recommended_investment__zero_minimum():
     com = Commission(0.01, 0.0)
     assert 0 == com.minimal_recommended_investment()
+
+
+def test_commission__array():
+    com = Commission(0.01, 3)
+    result = com(np.array([250, 300, 550]))
+    assert isinstance(result, np.ndarray)
+    assert [3, 3, 5.5] == result.tolist()
+
+
+def test_commission__series():
+    com = Commission(0.01, 3)
+    trades = pd.Series([250, 550], index=['AAA', 'BBB'])
+    result = com(trades)
+    assert isinstance(result, pd.Series)
+    assert ['AAA', 'BBB'] == result.index.tolist()
+    assert [3, 5.5] == result.tolist()
+
+
+def test_commission__fixed():
+    com = Commission(0.001, 5, fixed=2)
+    assert 5 == com(1000)
+    assert 12 == com(10000)
+
+
+def test_commission__tiers():
+    com = Commission(0.01, 3, tiers=[(1000, 0.005), (10000, 0.002)])
+    assert [5, 5, 50, 20, 40] == com(np.array([500, 1000, 9999.99, 10000, 20000])).round(2).tolist()
+
+
+def test_commission__minimal_recommended_investment__fixed():
+    com = Commission(0.001, 5, fixed=2)
+    assert 3000 == pytest.approx(com.minimal_recommended_investment())
+
+
+def test_commission__minimal_recommended_investment__tiers():
+    # 0.01 * 1000 < 20, 0.005 * 4000 == 20
+    com = Commission(0.01, 20, tiers=[(1000, 0.005)])
+    assert 4000 == pytest.approx(com.minimal_recommended_investment())
+
+
+def test_commission__minimal_recommended_investment__tier_threshold():
+    # 0.01 * 999 < 15 but 0.02 * 1000 >= 15 - threshold is the answer
+    com = Commission(0.01, 15, tiers=[(1000, 0.02)])
+    assert 1000 == pytest.approx(com.minimal_recommended_investment())
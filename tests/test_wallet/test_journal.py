@@ -0,0 +1,85 @@
+import pytest
+from datetime import date
+from marketools import Wallet
+from marketools.journal import Journal, replay
+
+
+@pytest.fixture
+def traded_wallet():
+    wallet = Wallet(0.01, 3)
+    wallet.money = 10000
+    wallet.buy('AAA', 10, 10, date(2020, 1, 2))
+    wallet.buy('BBB', 20, 50, date(2020, 1, 3))
+    wallet.sell('AAA', 5, 12, date(2020, 1, 6))
+    wallet.buy('AAA', 5, 20, date(2020, 1, 7))
+    wallet.sell('BBB', 20, 55, date(2020, 1, 8))
+    wallet.buy('BBB', 10, 40, date(2020, 1, 9))
+    return wallet
+
+
+def test_journal__append_and_frame():
+    journal = Journal(capacity=1)
+    for i in range(5):
+        journal.append('AAA', 'buy', 10, 1.5, 3, date(2020, 1, i + 1))
+    journal.append('BBB', 'sell', 1, 2, 3, date(2020, 2, 1))
+
+    frame = journal.to_frame()
+
+    assert 6 == len(journal)
+    assert ['AAA'] * 5 + ['BBB'] == frame['Ticker'].tolist()
+    assert ['buy'] * 5 + ['sell'] == frame['Side'].tolist()
+
+
+def test_journal__wrong_side():
+    with pytest.raises(ValueError):
+        Journal().append('AAA', 'hold', 1, 1, 0)
+
+
+def test_journal__save_load(tmp_path, traded_wallet):
+    file_path = tmp_path / 'journal.npz'
+    traded_wallet.journal.save(file_path)
+
+    loaded = Journal.load(file_path)
+
+    assert traded_wallet.journal.to_frame().equals(loaded.to_frame())
+
+
+def test_wallet__purchase_date(traded_wallet):
+    assert date(2020, 1, 2) == traded_wallet.get_position_opening_date_for_stock('AAA')
+
+
+def test_replay__matches_wallet(traded_wallet):
+    restored = Wallet(0.01, 3)
+    restored.replay(traded_wallet.journal, money=10000)
+
+    expected = traded_wallet.stocks.reset_index(drop=True)
+    assert expected['Name'].tolist() == restored.stocks['Name'].tolist()
+    assert expected['Volume'].tolist() == restored.stocks['Volume'].tolist()
+    assert expected['Purchase price'].tolist() == pytest.approx(restored.stocks['Purchase price'].tolist())
+    assert expected['Price'].tolist() == restored.stocks['Price'].tolist()
+    assert traded_wallet.money == pytest.approx(restored.money)
+
+
+def test_replay__journal_copied(traded_wallet):
+    transactions = len(traded_wallet.journal)
+    restored = Wallet(0.01, 3)
+    restored.replay(traded_wallet.journal, money=10000)
+    restored.buy('AAA', 1, 12)
+
+    assert transactions == len(traded_wallet.journal)
+    assert transactions + 1 == len(restored.journal)
+
+
+def test_replay__until(traded_wallet):
+    stocks, cash = replay(traded_wallet.journal, until=date(2020, 1, 6))
+
+    assert ['AAA', 'BBB'] == stocks['Name'].tolist()
+    assert [5, 20] == stocks['Volume'].tolist()
+    assert [10, 50] == pytest.approx(stocks['Purchase price'].tolist())
+    assert -(103 + 1010) + (60 - 3) == pytest.approx(cash)
+
+
+def test_replay__empty():
+    stocks, cash = replay(Journal())
+    assert stocks.empty
+    assert 0 == cash
@@ -1,3 +1,4 @@
+import pytest
 from marketools import Wallet
 from marketools.wallet import calculate_investment_value
 
@@ -57,4 +58,46 @@ def test_calculate_investment_value__no_money():
     result = calculate_investment_value(wallet, max_fraction)
 
     assert expected_result == result
-    
\ No newline at end of file
+    
+
+def test_update_prices():
+    wallet = Wallet(0.01, 3)
+    wallet.money = 10000
+    wallet.buy('AAA', 10, 100)
+    wallet.buy('BBB', 10, 50)
+
+    wallet.update_prices({'AAA': 110, 'CCC': 20})
+
+    assert [110, 50] == list(wallet.stocks['Price'])
+    assert 1600 == wallet.stocks_value
+
+
+def test_execute__matches_buy_and_sell():
+    expected = Wallet(0.01, 3)
+    expected.money = 10000
+    expected.buy('AAA', 10, 100)
+    expected.buy('BBB', 10, 50)
+    expected.sell('AAA', 4, 120)
+    expected.buy('BBB', 10, 60)
+    expected.sell('BBB', 20, 70)
+
+    wallet = Wallet(0.01, 3)
+    wallet.money = 10000
+    wallet.execute(['AAA', 'BBB'], [10, 10], [100, 50])
+    executed = wallet.execute(['AAA', 'BBB', 'CCC'], [-4, 10, -1], [120, 60, 10])
+    wallet.execute(['BBB'], [-20], [70])
+
+    assert [True, True, False] == list(executed)  # CCC not in the wallet
+    assert expected.money == pytest.approx(wallet.money)
+    assert ['AAA'] == wallet.list_stocks()
+    assert [6, 100] == list(wallet.stocks.loc[0, ['Volume', 'Purchase price']])
+    assert list(expected.journal['fee']) == list(wallet.journal['fee'])
+
+
+def test_execute__sales_before_purchases():
+    wallet = Wallet(0.01, 0)
+    wallet.money = 100
+    wallet.buy('AAA', 1, 99)
+    executed = wallet.execute(['BBB', 'AAA'], [1, -1], [99, 101])
+    assert [True, True] == list(executed)
+    assert ['BBB'] == wallet.list_stocks()